@@ -0,0 +1,234 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# Las tres clases replican la aritmetica de talib (TA_SMA y TA_EMA con la compatibilidad por defecto)
+# para que los valores coincidan con los calculados sobre el mismo historial. Las builds de talib compiladas
+# con FMA pueden diferir en el ultimo bit de la EMA.
+class StreamingSMA:
+    def __init__(self, period):
+        self.period = period
+        self.window = [0.0] * period
+        self.count = 0
+        self.total = 0.0
+        self.value = math.nan
+
+    def update(self, x):
+        slot = self.count % self.period
+        self.count += 1
+        if self.count < self.period:
+            self.total += x
+            self.window[slot] = x
+            return self.value
+        temp = self.total + x
+        self.value = temp / self.period
+        # El valor que sale de la ventana es el mas antiguo; si period == 1 es el propio x
+        oldest = x if self.period == 1 else self.window[self.count % self.period]
+        self.window[slot] = x
+        self.total = temp - oldest
+        return self.value
+
+
+class StreamingEMA:
+    def __init__(self, period):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.count = 0
+        self.seed_total = 0.0
+        self.value = math.nan
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.period:
+            self.seed_total += x
+        elif self.count == self.period:
+            self.seed_total += x
+            self.value = self.seed_total / self.period
+        else:
+            self.value = ((x - self.value) * self.k) + self.value
+        return self.value
+
+
+class BMSBEngine:
+    # Banda BMSB (max/min de SMA y EMA) y estado del cruce sobre las dos ultimas velas cerradas.
+    # Cada update es O(1) y no crea objetos de pandas.
+    def __init__(self, sma_periodo, ema_periodo):
+        self.sma_periodo = sma_periodo
+        self.ema_periodo = ema_periodo
+        self.reset()
+
+    def reset(self):
+        self.sma = StreamingSMA(self.sma_periodo)
+        self.ema = StreamingEMA(self.ema_periodo)
+        self.last_time = None
+        self.close = math.nan
+        self.bmsb_mayor = math.nan
+        self.bmsb_menor = math.nan
+        self.close_anterior = math.nan
+        self.bmsb_mayor_anterior = math.nan
+        self.bmsb_menor_anterior = math.nan
+        self.signal = None
+
+    def update(self, close, candle_time=None):
+        sma = self.sma.update(close)
+        ema = self.ema.update(close)
+
+        self.close_anterior = self.close
+        self.bmsb_mayor_anterior = self.bmsb_mayor
+        self.bmsb_menor_anterior = self.bmsb_menor
+
+        # Igual que pd.concat(...).max(axis=1): si solo una media esta disponible se usa esa
+        if math.isnan(sma):
+            self.bmsb_mayor = self.bmsb_menor = ema
+        elif math.isnan(ema):
+            self.bmsb_mayor = self.bmsb_menor = sma
+        else:
+            self.bmsb_mayor = max(sma, ema)
+            self.bmsb_menor = min(sma, ema)
+        self.close = close
+        self.last_time = candle_time
+
+        if (self.close > self.bmsb_mayor) and (self.close_anterior < self.bmsb_mayor_anterior):
+            self.signal = "compra"
+        elif (self.close < self.bmsb_menor) and (self.close_anterior > self.bmsb_menor_anterior):
+            self.signal = "venta"
+        else:
+            self.signal = None
+        return self.signal
+
+    def update_closed(self, rows):
+        # rows: velas (time, entry, high, low, close, ...) en orden ascendente; la ultima es la vela en
+        # formacion y se ignora. Solo se procesan las velas cerradas posteriores a la ultima vista.
+        closed = rows[:-1]
+        if not closed:
+            return self.signal
+        if self.last_time is not None and closed[0][0] > self.last_time:
+            # Se han perdido velas intermedias, hay que recalcular desde el historial disponible
+            self.reset()
+        # Las velas nuevas estan al final: se buscan desde atras en lugar de recorrer todo el historial
+        inicio = len(closed)
+        while inicio > 0 and (self.last_time is None or closed[inicio - 1][0] > self.last_time):
+            inicio -= 1
+        for row in closed[inicio:]:
+            self.update(row[4], row[0])
+        return self.signal
+
+
+# Versiones vectorizadas para series completas (backtests, optimizador). Devuelven arrays de NumPy con NaN
+# donde talib tambien devolveria NaN.
+def sma_array(close, period):
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(close.shape[0], np.nan)
+    if close.shape[0] < period:
+        return out
+    acumulado = np.cumsum(close)
+    out[period - 1] = acumulado[period - 1]
+    out[period:] = acumulado[period:] - acumulado[:-period]
+    out[period - 1:] /= period
+    return out
+
+
+def ema_array(close, period):
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(close.shape[0], np.nan)
+    if close.shape[0] < period:
+        return out
+    # Semilla igual que talib (media simple de las primeras `period` velas) y despues la recursion
+    # y = y + k * (x - y), que es exactamente ewm(adjust=False) con alpha = 2 / (period + 1)
+    x = close[period - 1:].copy()
+    x[0] = close[:period].sum() / period
+    out[period - 1:] = pd.Series(x).ewm(span=period, adjust=False).mean().to_numpy()
+    return out
+
+
+# Versiones por matriz para evaluar muchos simbolos a la vez: `cierres` tiene una fila por vela y una columna por
+# simbolo, alineadas por abajo (la ultima fila es la ultima vela cerrada de cada simbolo). Las columnas con menos
+# historial llevan NaN al principio. Cada columna da lo mismo que la serie suelta.
+def _primera_valida(cierres):
+    validos = ~np.isnan(cierres)
+    return np.where(validos.any(axis=0), validos.argmax(axis=0), cierres.shape[0])
+
+
+def sma_matrix(cierres, period):
+    cierres = np.ascontiguousarray(cierres, dtype=np.float64)
+    out = np.full(cierres.shape, np.nan)
+    if cierres.shape[0] < period:
+        return out
+    primeras = _primera_valida(cierres)
+    rellenas = np.flatnonzero(primeras)
+    if len(rellenas):
+        cierres = cierres.copy()
+        for columna, primera in zip(rellenas.tolist(), primeras[rellenas].tolist()):
+            cierres[:primera, columna] = 0.0
+    acumulado = np.cumsum(cierres, axis=0)
+    out[period - 1] = acumulado[period - 1]
+    np.subtract(acumulado[period:], acumulado[:-period], out=out[period:])
+    out[period - 1:] /= period
+    # Las ventanas que incluyen el relleno no tienen media
+    for columna, primera in zip(rellenas.tolist(), primeras[rellenas].tolist()):
+        out[:primera + period - 1, columna] = np.nan
+    return out
+
+
+def ema_matrix(cierres, period):
+    cierres = np.ascontiguousarray(cierres, dtype=np.float64)
+    filas, columnas = cierres.shape
+    out = np.full((filas, columnas), np.nan)
+    semillas = _primera_valida(cierres) + period - 1
+    sembradas = np.flatnonzero(semillas < filas)
+    if not len(sembradas):
+        return out
+    # Semilla igual que talib, la media simple de las primeras `period` velas sumadas en orden, y despues la
+    # recursion con la misma aritmetica que StreamingEMA, fila a fila sobre todas las columnas
+    ventanas = cierres[semillas[sembradas] - np.arange(period - 1, -1, -1)[:, None], sembradas]
+    valores_semilla = np.cumsum(ventanas, axis=0)[-1] / period
+    siembras = {}
+    for fila, columna, valor in zip(semillas[sembradas].tolist(), sembradas.tolist(), valores_semilla.tolist()):
+        siembras.setdefault(fila, ([], []))
+        siembras[fila][0].append(columna)
+        siembras[fila][1].append(valor)
+    k = 2.0 / (period + 1)
+    primera = min(siembras)
+    out[primera, siembras[primera][0]] = siembras[primera][1]
+    for fila in range(primera + 1, filas):
+        anterior = out[fila - 1]
+        actual = out[fila]
+        np.subtract(cierres[fila], anterior, out=actual)
+        actual *= k
+        actual += anterior
+        if fila in siembras:
+            # Columnas que empiezan aqui; su valor anterior era NaN
+            actual[siembras[fila][0]] = siembras[fila][1]
+    return out
+
+
+def bmsb_band_arrays(close, sma_periodo, ema_periodo):
+    # close puede ser una serie o una matriz de cierres (velas x simbolos)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    if close.ndim == 2:
+        sma = sma_matrix(close, sma_periodo)
+        ema = ema_matrix(close, ema_periodo)
+    else:
+        sma = sma_array(close, sma_periodo)
+        ema = ema_array(close, ema_periodo)
+    # fmax/fmin ignoran los NaN igual que pd.concat(...).max(axis=1)
+    return np.fmax(sma, ema), np.fmin(sma, ema)
+
+
+def bmsb_cross_from_band(close, mayor, menor):
+    # Mascaras de compra/venta sobre el eje de las velas a partir de la banda ya calculada
+    compra = np.zeros(close.shape, dtype=bool)
+    venta = np.zeros(close.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        compra[1:] = (close[1:] > mayor[1:]) & (close[:-1] < mayor[:-1])
+        venta[1:] = (close[1:] < menor[1:]) & (close[:-1] > menor[:-1])
+    return compra, venta
+
+
+def bmsb_cross_arrays(close, sma_periodo, ema_periodo):
+    # Mascaras de compra/venta evaluadas sobre cada vela cerrada, con las mismas reglas que el bot
+    close = np.asarray(close, dtype=np.float64)
+    mayor, menor = bmsb_band_arrays(close, sma_periodo, ema_periodo)
+    return bmsb_cross_from_band(close, mayor, menor)
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+from BMSBIndicators import bmsb_cross_arrays
+
+# Comision taker de Bitget en futuros USDT-M
+TAKER_FEE = 0.0006
+
+APERTURA_LONG, APERTURA_SHORT, CIERRE_LONG, CIERRE_SHORT = 0, 1, 2, 3
+
+
+class BacktestResult:
+    def __init__(self, capital, equity, trades, compra, venta):
+        self.capital = capital
+        self.equity = equity
+        self.trades = trades
+        self.compra = compra
+        self.venta = venta
+
+        self.final_equity = float(equity[-1]) if equity.size else capital
+        self.pnl = self.final_equity - capital
+        self.retorno = self.pnl / capital * 100
+        if equity.size:
+            picos = np.maximum.accumulate(equity)
+            self.drawdown = (equity - picos) / picos
+            self.max_drawdown = float(-self.drawdown.min() * 100)
+        else:
+            self.drawdown = equity
+            self.max_drawdown = 0.0
+
+        cierres = trades[trades["tipo"] == "cierre"] if len(trades) else trades
+        self.num_operaciones = len(cierres)
+        self.aciertos = float((cierres["pnl"] > 0).mean() * 100) if len(cierres) else 0.0
+
+    def resumen(self):
+        return {
+            "pnl": self.pnl,
+            "retorno_%": self.retorno,
+            "max_drawdown_%": self.max_drawdown,
+            "operaciones": self.num_operaciones,
+            "aciertos_%": self.aciertos,
+            "equity_final": self.final_equity,
+        }
+
+
+def backtest(close, entry=None, time=None, sma_periodo=20, ema_periodo=21, ordersize=50, pyramiding=1, leverage=1,
+             capital=1000.0, fee=TAKER_FEE, senales=None):
+    # Reproduce las reglas de iniciar_bot sobre un historial completo:
+    # - la senal se evalua sobre la vela cerrada i y se ejecuta al precio de apertura de la vela i+1
+    # - una senal contraria cierra primero la posicion abierta (cerrarOperaciones) y reinicia el contador
+    # - se abren entradas en el sentido de la senal hasta `pyramiding`; como en el bot en vivo, cada entrada
+    #   usa ordersize % del capital inicial limitado al margen disponible, y el apalancamiento solo reduce
+    #   el margen bloqueado por cada entrada
+    # Las senales se calculan vectorizadas; solo se recorren en Python las velas con cruce. Se pueden pasar
+    # ya calculadas en `senales` (compra, venta) para reutilizarlas entre varias ejecuciones.
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    n = close.shape[0]
+    entry = close if entry is None else np.ascontiguousarray(entry, dtype=np.float64)
+    time = np.arange(n) if time is None else np.asarray(time)
+    ordersize = float(ordersize)
+    pyramiding = int(pyramiding)
+    leverage = float(leverage)
+
+    compra, venta = senales if senales is not None else bmsb_cross_arrays(close, sma_periodo, ema_periodo)
+    senales = np.flatnonzero(compra | venta)
+    senales = senales[senales + 1 < n]
+
+    balance = float(capital)
+    cantidad = 0.0
+    precio_medio = 0.0
+    margen = 0.0
+    entradas = 0
+
+    # Listas de Python para que el bucle sobre los cruces no pague el coste de los escalares de NumPy
+    indices = (senales + 1).tolist()
+    precios = entry[senales + 1].tolist()
+    lados = np.where(compra[senales], 1.0, -1.0).tolist()
+    nocional_entrada = ordersize / 100 * capital
+
+    # Eventos (cambios de posicion) y operaciones se guardan por columnas: convertir listas planas a arrays
+    # es mucho mas barato que convertir listas de tuplas. Las operaciones guardan el indice de la vela y un
+    # codigo (tipo, lado); tiempo y precio se recuperan despues con indexado vectorizado.
+    ev_idx, ev_balance, ev_cantidad, ev_precio = [], [], [], []
+    tr_idx, tr_codigo, tr_cantidad, tr_pnl = [], [], [], []
+    for j, precio, lado in zip(indices, precios, lados):
+        if cantidad != 0.0 and (cantidad > 0) != (lado > 0):
+            tamano = abs(cantidad)
+            pnl = cantidad * (precio - precio_medio) - fee * tamano * precio
+            balance += pnl
+            tr_idx.append(j)
+            tr_codigo.append(CIERRE_LONG if cantidad > 0 else CIERRE_SHORT)
+            tr_cantidad.append(tamano)
+            tr_pnl.append(pnl)
+            cantidad = 0.0
+            precio_medio = 0.0
+            margen = 0.0
+            entradas = 0
+
+        codigo = APERTURA_LONG if lado > 0 else APERTURA_SHORT
+        while entradas < pyramiding:
+            nocional = min(nocional_entrada, balance - margen)
+            if nocional <= 0:
+                break
+            q = nocional / precio
+            comision = fee * nocional
+            balance -= comision
+            tamano = abs(cantidad)
+            precio_medio = (tamano * precio_medio + q * precio) / (tamano + q)
+            cantidad += lado * q
+            margen += nocional / leverage
+            entradas += 1
+            tr_idx.append(j)
+            tr_codigo.append(codigo)
+            tr_cantidad.append(q)
+            tr_pnl.append(-comision)
+
+        ev_idx.append(j)
+        ev_balance.append(balance)
+        ev_cantidad.append(cantidad)
+        ev_precio.append(precio_medio)
+
+    # Curva de equity: la posicion es constante entre eventos, asi que basta con propagar el ultimo evento
+    equity = np.full(n, float(capital))
+    if ev_idx:
+        marcas = np.zeros(n, dtype=np.int64)
+        marcas[ev_idx] = np.arange(1, len(ev_idx) + 1)
+        pos = np.maximum.accumulate(marcas) - 1
+        activo = pos >= 0
+        p = pos[activo]
+        equity[activo] = np.array(ev_balance)[p] + np.array(ev_cantidad)[p] * (close[activo] - np.array(ev_precio)[p])
+
+    tr_idx = np.array(tr_idx, dtype=np.int64)
+    tr_codigo = np.array(tr_codigo, dtype=np.int8)
+    trades = pd.DataFrame({
+        "time": time[tr_idx],
+        "tipo": pd.Categorical.from_codes(tr_codigo // 2, ["apertura", "cierre"]),
+        "lado": pd.Categorical.from_codes(tr_codigo % 2, ["long", "short"]),
+        "precio": entry[tr_idx],
+        "cantidad": np.array(tr_cantidad, dtype=np.float64),
+        "pnl": np.array(tr_pnl, dtype=np.float64),
+    })
+    return BacktestResult(float(capital), equity, trades, compra, venta)
+
+
+def backtest_df(df, **kwargs):
+    # df con las columnas de get_history_candlestick_data ('entry', 'close', ...) indexado por tiempo
+    return backtest(df["close"].to_numpy(), entry=df["entry"].to_numpy(), time=df.index.to_numpy(), **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+    from ObtenerDatosVelas import cargar_velas, DIRECTORIO_DATOS
+
+    parser = argparse.ArgumentParser(description="Backtest de la BMSB sobre velas descargadas con ObtenerDatosVelas")
+    parser.add_argument("simbolo")
+    parser.add_argument("--granularidad", default="1m")
+    parser.add_argument("--product-type", default="usdt-futures")
+    parser.add_argument("--raiz", default=DIRECTORIO_DATOS)
+    parser.add_argument("--sma", type=int, default=20)
+    parser.add_argument("--ema", type=int, default=21)
+    parser.add_argument("--ordersize", type=float, default=50)
+    parser.add_argument("--pyramiding", type=int, default=1)
+    parser.add_argument("--apalancamiento", type=float, default=1)
+    parser.add_argument("--capital", type=float, default=1000)
+    args = parser.parse_args()
+
+    velas = cargar_velas(args.simbolo, args.granularidad, args.product_type, args.raiz)
+    if velas is None:
+        raise SystemExit(f"No hay velas en disco para {args.simbolo} {args.granularidad}")
+    resultado = backtest(velas["close"], entry=velas["entry"], time=velas["time"], sma_periodo=args.sma,
+                         ema_periodo=args.ema, ordersize=args.ordersize, pyramiding=args.pyramiding,
+                         leverage=args.apalancamiento, capital=args.capital)
+    for clave, valor in resultado.resumen().items():
+        print(f"{clave}: {valor}")
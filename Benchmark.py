@@ -0,0 +1,141 @@
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from BitgetClient import BitgetClient, RATE_LIMITS, get_candle_columns
+from CandleCache import CandleCache
+from ContractCache import ContractCache
+from LogSinks import StreamSink
+from Metrics import metricas
+from MockBitget import MockBitget
+from TradingBot import TradingBot
+
+# Metricas en las que un valor mayor es peor; el resto (ticks_por_segundo) empeora al bajar
+MENOR_ES_MEJOR = ("ciclo_p50_ms", "ciclo_p99_ms", "senal_a_orden_ms", "orden_latencia_ms", "memoria_pico_mb")
+# Contra el mock los limites de peticiones del cliente no protegen nada y, con los de produccion, el benchmark
+# mediria el TokenBucket (20 peticiones/s de mercado = ~10 ciclos/s) en lugar del bucle del bot
+SIN_LIMITES = {familia: 1_000_000 for familia in RATE_LIMITS}
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def _resumen_ms(nombre, **etiquetas):
+    with metricas.lock:
+        for (n, e), histograma in metricas.histogramas.items():
+            if n == nombre and all((k, str(v)) in e for k, v in etiquetas.items()):
+                return histograma.suma / histograma.total * 1000 if histograma.total else None
+    return None
+
+
+def medir_bot(mock, ciclos=2000, duracion=None, simbolo="BTCUSDT", granularidad="1m", pyramiding="2",
+              rate_limits=SIN_LIMITES):
+    # Ejecuta el ciclo completo de TradingBot (velas, BMSB, senal, ordenes) contra el mock tan rapido como se
+    # pueda, sin las esperas del scheduler. Devuelve ticks/s, percentiles del ciclo, latencia senal -> orden
+    # y memoria.
+    client = BitgetClient(base_url=mock.url, rate_limits=rate_limits)
+    cache = CandleCache(functools.partial(get_candle_columns, client=client))
+    nulo = StreamSink(open(os.devnull, "w"))
+    bot = TradingBot(20, 21, granularidad, "usdt-futures", simbolo, "clave", "secreto", "frase", "10", pyramiding,
+                     "1", 60, log_text=nulo, order_log_text=nulo, client=client,
+                     contratos=ContractCache(client, raiz=None))
+    metricas.reiniciar()
+    bot.preparar()
+
+    tracemalloc.start()
+    tiempos = []
+    inicio = time.perf_counter()
+    limite = inicio + duracion if duracion else None
+    hechos = 0
+    while (limite is None and hechos < ciclos) or (limite is not None and time.perf_counter() < limite):
+        t0 = time.perf_counter()
+        bot.ejecutar_ciclo(cache.get_rows(simbolo, granularidad, "usdt-futures"))
+        tiempos.append(time.perf_counter() - t0)
+        hechos += 1
+    total = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    bot.running = False
+    bot.finalizar()
+
+    resultado = {
+        "ticks_por_segundo": hechos / total,
+        "ciclo_p50_ms": _percentil(tiempos, 50) * 1000,
+        "ciclo_p99_ms": _percentil(tiempos, 99) * 1000,
+        "senal_a_orden_ms": _resumen_ms("voltear", paso="total"),
+        "orden_latencia_ms": _resumen_ms("orden_latencia", estado="ejecutada"),
+        "ordenes": bot.pipeline.ejecutadas,
+        "memoria_pico_mb": pico / 2**20,
+        "peticiones_mock": mock.peticiones,
+    }
+    if resource is not None:
+        # ru_maxrss esta en KiB en Linux y en bytes en macOS
+        escala = 2**20 if sys.platform == "darwin" else 2**10
+        resultado["rss_max_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / escala
+    return resultado
+
+
+def comparar(resultado, referencia, tolerancia=0.2):
+    # Lista de regresiones respecto a una ejecucion de referencia guardada con --guardar
+    regresiones = []
+    for clave, base in referencia.items():
+        actual = resultado.get(clave)
+        if not isinstance(base, (int, float)) or not isinstance(actual, (int, float)) or not base:
+            continue
+        if clave in MENOR_ES_MEJOR:
+            empeora = actual > base * (1 + tolerancia)
+        elif clave == "ticks_por_segundo":
+            empeora = actual < base * (1 - tolerancia)
+        else:
+            continue
+        if empeora:
+            regresiones.append(f"{clave}: {actual:.3f} frente a {base:.3f}")
+    return regresiones
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark del bucle de TradingBot contra un Bitget simulado")
+    parser.add_argument("--ciclos", type=int, default=2000)
+    parser.add_argument("--duracion", type=float, default=None, help="segundos; sustituye a --ciclos")
+    parser.add_argument("--latencia", type=float, default=0.0, help="latencia anadida por el mock (s)")
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    parser.add_argument("--aceleracion", type=float, default=600.0,
+                        help="velocidad del mercado simulado; con 600 cierra una vela de 1m cada 0.1 s")
+    parser.add_argument("--limites-reales", action="store_true",
+                        help="aplica los limites de peticiones de produccion del cliente (acotan los ticks/s)")
+    parser.add_argument("--guardar", help="guarda el resultado como referencia")
+    parser.add_argument("--referencia", help="compara con una referencia y falla si hay regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    mock = MockBitget(latencia=args.latencia, tasa_error=args.tasa_error, aceleracion=args.aceleracion).start()
+    try:
+        resultado = medir_bot(mock, ciclos=args.ciclos, duracion=args.duracion,
+                              rate_limits=RATE_LIMITS if args.limites_reales else SIN_LIMITES)
+    finally:
+        mock.stop()
+    print(json.dumps(resultado, indent=2))
+
+    if args.guardar:
+        with open(args.guardar, "w") as f:
+            json.dump(resultado, f, indent=2)
+    if args.referencia:
+        with open(args.referencia) as f:
+            regresiones = comparar(resultado, json.load(f), args.tolerancia)
+        for regresion in regresiones:
+            print(f"Regresion: {regresion}")
+        sys.exit(1 if regresiones else 0)
@@ -0,0 +1,374 @@
+import time
+import hmac
+import base64
+import hashlib
+import json
+import logging
+import os
+from threading import Lock
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from CandleCache import CANDLE_COLUMNS
+from Metrics import metricas
+from RateLimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Se puede apuntar a otro servidor (p. ej. MockBitget) con la variable de entorno BITGET_BASE_URL
+URL_PRODUCCION = "https://api.bitget.com"
+BASE_URL = os.environ.get("BITGET_BASE_URL", URL_PRODUCCION)
+
+
+def es_produccion(base_url):
+    # Solo los datos de la API real se guardan en los caches de disco (velas y contratos)
+    return base_url.rstrip("/") == URL_PRODUCCION
+
+# Peticiones por segundo por familia de endpoints (limites publicados por Bitget para futuros)
+RATE_LIMITS = {
+    "market": 20,
+    "account": 10,
+    "order": 10,
+    "default": 10,
+}
+
+# Codigos con los que Bitget rechaza ACCESS-TIMESTAMP (invalido o fuera de la ventana de 30 s): la peticion no se
+# ha procesado, asi que se puede volver a medir el desfase y repetir incluso si es un POST
+CODIGOS_TIMESTAMP = {"40005", "40008"}
+
+
+def cargar_json(datos):
+    # orjson decodifica directamente los bytes y es bastante mas rapido con las listas de velas y tickers
+    if orjson is not None:
+        return orjson.loads(datos)
+    return json.loads(datos)
+
+
+def leer_json(response):
+    return cargar_json(response.content)
+
+
+def endpoint_family(path):
+    if path.startswith("/api/v2/mix/market"):
+        return "market"
+    if path.startswith("/api/v2/mix/account"):
+        return "account"
+    if path.startswith("/api/v2/mix/order"):
+        return "order"
+    return "default"
+
+
+class BitgetClient:
+    # Cliente HTTP compartido: una sesion con pool de conexiones keep-alive, timeouts, reintentos con
+    # backoff exponencial en 429/5xx y un token bucket por familia de endpoints.
+    def __init__(self, base_url=BASE_URL, timeout=(3.05, 10), max_retries=3, backoff=0.5, pool_size=32,
+                 rate_limits=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.limiters = {familia: TokenBucket(rate) for familia, rate in (rate_limits or RATE_LIMITS).items()}
+
+    def get(self, path, params=None, headers=None):
+        return self.request("GET", path, params=params, headers=headers)
+
+    def post(self, path, data=None, headers=None):
+        return self.request("POST", path, data=data, headers=headers)
+
+    def request(self, method, path, params=None, data=None, headers=None):
+        # Devuelve la respuesta o None si no se pudo contactar con el servidor despues de los reintentos.
+        # Los POST solo se reintentan con 429 (la peticion no llego a procesarse) para no duplicar ordenes.
+        familia = endpoint_family(path)
+        limiter = self.limiters.get(familia, self.limiters["default"])
+        endpoint = path.split("?", 1)[0]
+        response = None
+        for intento in range(self.max_retries + 1):
+            limiter.acquire()
+            metricas.fijar("rate_limit_disponible", limiter.available(), familia=familia)
+            inicio = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path, params=params, data=data,
+                                                headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metricas.incrementar("peticiones", endpoint=endpoint, status="error")
+                if method != "GET" or intento == self.max_retries:
+                    logger.warning("Error de conexion en %s %s: %s", method, path, e)
+                    return None
+                time.sleep(self.backoff * 2 ** intento)
+                continue
+
+            metricas.observar("peticion", time.perf_counter() - inicio, endpoint=endpoint)
+            metricas.incrementar("peticiones", endpoint=endpoint, status=response.status_code)
+            reintentar = response.status_code == 429 or (method == "GET" and response.status_code >= 500)
+            if not reintentar or intento == self.max_retries:
+                return response
+            retry_after = response.headers.get("Retry-After")
+            time.sleep(float(retry_after) if retry_after else self.backoff * 2 ** intento)
+        return response
+
+
+    def signed_request(self, method, path, signer, params=None, body=None):
+        # Peticion privada: la query y el cuerpo se serializan una sola vez y se firman y envian los mismos bytes
+        query = urlencode(params) if params else ""
+        payload = json.dumps(body, separators=(",", ":")) if body is not None else ""
+        request_path = path + "?" + query if query else path
+        data = payload.encode("utf-8") if payload else None
+        if signer.caducado():
+            signer.resincronizar(self)
+        response = self.request(method, request_path, data=data, headers=signer.headers(method, request_path, payload))
+        if response is not None and response.status_code == 400 \
+                and str(leer_json(response).get("code")) in CODIGOS_TIMESTAMP:
+            if signer.resincronizar(self, esperar=True) is not None:
+                response = self.request(method, request_path, data=data,
+                                        headers=signer.headers(method, request_path, payload))
+        return response
+
+
+class Signer:
+    # Firma HMAC-SHA256 de una cuenta. El HMAC se crea una vez con la clave y se copia en cada peticion, asi no
+    # se vuelve a preparar la clave; las cabeceras fijas tambien se construyen una sola vez. `offset_ms` corrige
+    # la diferencia entre el reloj local y el del servidor para que los timestamps no se rechacen; se vuelve a
+    # medir cada `intervalo_sincronizacion` segundos (el reloj local deriva) o si el servidor rechaza un timestamp.
+    def __init__(self, api_key, secret_key, passphrase, intervalo_sincronizacion=3600.0, reintento_sincronizacion=60.0):
+        self.api_key = api_key
+        self.passphrase = passphrase
+        self._hmac = hmac.new(secret_key.encode("utf-8"), digestmod=hashlib.sha256)
+        self._headers = {
+            "ACCESS-KEY": api_key,
+            "ACCESS-PASSPHRASE": passphrase,
+            "Content-Type": "application/json",
+        }
+        self.offset_ms = 0
+        self.intervalo_sincronizacion = intervalo_sincronizacion
+        self.reintento_sincronizacion = reintento_sincronizacion
+        self.proxima_sincronizacion = 0.0
+        self._sync_lock = Lock()
+
+    def timestamp_ms(self):
+        return int(time.time() * 1000) + self.offset_ms
+
+    def sign(self, message):
+        h = self._hmac.copy()
+        h.update(message.encode("utf-8"))
+        return base64.b64encode(h.digest()).decode()
+
+    def headers(self, method, request_path, body=""):
+        timestamp = str(self.timestamp_ms())
+        headers = dict(self._headers)
+        headers["ACCESS-SIGN"] = self.sign(timestamp + method + request_path + body)
+        headers["ACCESS-TIMESTAMP"] = timestamp
+        return headers
+
+    def sync_time(self, client=None):
+        # Mide el desfase con /public/time tomando el punto medio de la peticion como hora local. Si falla se
+        # vuelve a intentar tras `reintento_sincronizacion` segundos en lugar de esperar al intervalo completo.
+        inicio = time.time()
+        response = (client or default_client).get("/api/v2/public/time")
+        fin = time.time()
+        if response is None or response.status_code != 200:
+            self.proxima_sincronizacion = time.monotonic() + self.reintento_sincronizacion
+            return None
+        server_time = int(response.json()["data"]["serverTime"])
+        self.offset_ms = server_time - int((inicio + fin) / 2 * 1000)
+        self.proxima_sincronizacion = time.monotonic() + self.intervalo_sincronizacion
+        return self.offset_ms
+
+    def caducado(self):
+        return time.monotonic() >= self.proxima_sincronizacion
+
+    def resincronizar(self, client=None, esperar=False):
+        # Solo un hilo mide el desfase a la vez. Sin `esperar`, si otro ya lo esta midiendo se sigue con el
+        # actual; con `esperar` (timestamp rechazado) se espera y se vuelve a medir.
+        if not self._sync_lock.acquire(blocking=esperar):
+            return None
+        try:
+            return self.sync_time(client)
+        finally:
+            self._sync_lock.release()
+
+
+default_client = BitgetClient()
+
+_signers = {}
+_signer_locks = {}
+_signers_lock = Lock()
+
+
+def get_signer(api_key, secret_key, passphrase, client=None):
+    # Un Signer por cuenta, compartido por todos los bots del proceso. El desfase se mide antes de publicarlo,
+    # con un lock por cuenta: los demas bots de la cuenta esperan a esa medida en lugar de firmar con desfase 0,
+    # y las cuentas distintas no se esperan entre si.
+    clave = (api_key, secret_key, passphrase)
+    with _signers_lock:
+        signer = _signers.get(clave)
+        if signer is not None:
+            return signer
+        lock = _signer_locks.setdefault(clave, Lock())
+    with lock:
+        with _signers_lock:
+            signer = _signers.get(clave)
+        if signer is None:
+            signer = Signer(api_key, secret_key, passphrase)
+            signer.resincronizar(client)
+            with _signers_lock:
+                _signers[clave] = signer
+    return signer
+
+
+class VelasRecibidas:
+    # Velas de una respuesta de la API en columnas NumPy: `tiempos` (ms, int64) y `valores` (float64, una columna
+    # por cada campo de CANDLE_COLUMNS despues de 'time'). El DataFrame solo se construye si alguien lo pide.
+    def __init__(self, tiempos, valores):
+        self.tiempos = tiempos
+        self.valores = valores
+        self._df = None
+
+    @classmethod
+    def desde_json(cls, data):
+        if not data:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, len(CANDLE_COLUMNS) - 1), dtype=np.float64))
+        # Una sola conversion de la lista de listas de cadenas a float64; el tiempo en ms cabe sin perdida
+        # en un float64 y se pasa despues a int64
+        bloque = np.array(data, dtype=np.float64)[:, :len(CANDLE_COLUMNS)]
+        return cls(bloque[:, 0].astype(np.int64), bloque[:, 1:])
+
+    def __len__(self):
+        return len(self.tiempos)
+
+    def columna(self, nombre):
+        if nombre == 'time':
+            return self.tiempos
+        return self.valores[:, CANDLE_COLUMNS.index(nombre) - 1]
+
+    def filas(self):
+        # Tuplas (time_ms, entry, high, low, close, volume_base, volume_quote) como las guarda CandleCache
+        return list(zip(self.tiempos.tolist(), *self.valores.T.tolist()))
+
+    def dataframe(self):
+        if self._df is None:
+            df = pd.DataFrame(self.valores, columns=CANDLE_COLUMNS[1:], index=pd.to_datetime(self.tiempos, unit='ms'))
+            df.index.name = 'time'
+            self._df = df
+        return self._df
+
+
+def get_candle_columns(symbol, granularity, end_time, limit=100, product_type="usdt-futures", client=None):
+    endpoint = "/api/v2/mix/market/candles"
+
+    params = {
+        'symbol': symbol,
+        'granularity': granularity,
+        'endTime': str(end_time),
+        'limit': limit,
+        'productType': product_type
+    }
+
+    response = (client or default_client).get(endpoint, params=params)
+
+    if response is not None and response.status_code == 200:
+        return VelasRecibidas.desde_json(leer_json(response).get('data') or [])
+    else:
+        # If the request was not successful, print the error message
+        if response is not None:
+            logger.warning("Error: %s - %s", response.status_code, response.text)
+        return None
+
+
+def get_history_candlestick_data(symbol, granularity, end_time, limit=100, product_type="usdt-futures", client=None):
+    velas = get_candle_columns(symbol, granularity, end_time, limit, product_type, client)
+    if velas is None:
+        return None
+    return velas.dataframe()
+
+def get_latest_price(symbol, _product_type, client=None):
+    endpoint = "/api/v2/mix/market/ticker"
+
+    params = {
+        'symbol': symbol,
+        'productType': _product_type
+    }
+
+    response = (client or default_client).get(endpoint, params=params)
+
+    if response is not None and response.status_code == 200:
+        _data = leer_json(response).get('data', [])
+        return _data[0].get('lastPr')
+    else:
+        return None
+
+def get_asking_price(symbol, _product_type, client=None):
+    endpoint = "/api/v2/mix/market/ticker"
+
+    params = {
+        'symbol': symbol,
+        'productType': _product_type
+    }
+
+    response = (client or default_client).get(endpoint, params=params)
+
+    if response is not None and response.status_code == 200:
+        _data = leer_json(response).get('data', [])
+        return _data[0].get('askPr')
+    else:
+        return None
+
+def get_all_symbols(_product_type, client=None):
+    endpoint = "/api/v2/mix/market/tickers"
+    params = {
+        'productType': _product_type
+    }
+
+    response = (client or default_client).get(endpoint, params=params)
+
+    if response is not None and response.status_code == 200:
+        _data = leer_json(response).get('data', [])
+        symbols = [item["symbol"] for item in _data]
+        symbols = sorted(symbols)
+        return symbols
+    else:
+        return None
+
+def get_account_info(access_key, secret_key, passphrase, symbol, productType, marginCoin, client=None, signer=None):
+    # API endpoint
+    endpoint = "/api/v2/mix/account/account"
+
+    # Params
+    params = {
+        "symbol": symbol,
+        "productType": productType,
+        "marginCoin": marginCoin
+    }
+
+    client = client or default_client
+    signer = signer or get_signer(access_key, secret_key, passphrase, client)
+
+    # Send the request
+    response = client.signed_request("GET", endpoint, signer, params=params)
+
+    if response is None:
+        return None
+    if response.status_code == 200:
+        response_data = response.json()
+        if 'data' in response_data:
+            data_values = response_data['data']
+            return data_values
+        else:
+            return None
+    else:
+        logger.warning("Request failed with status code %s. Response content: %s", response.status_code, response.text)
+        return None
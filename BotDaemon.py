@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import signal
+
+from Execution import ejecucion_papel
+from LogSinks import crear_sink
+from Metrics import metricas, perfilar
+from TradingBot import TradingBot, get_market_feed, usar_servidor
+
+# Valores por defecto iguales a los de la interfaz grafica
+CONFIG_POR_DEFECTO = {
+    "sma_periodo": 20,
+    "ema_periodo": 21,
+    "granularidad": "1m",
+    "product_type": "usdt-futures",
+    "simbolo": None,
+    "ordersize": "50",
+    "pyramiding": "1",
+    "apalancamiento": "1",
+    "actualizaciones": 30,
+    "websocket": False,
+    "gracia_cierre": 2.0,
+    "monitorizar_posicion": False,
+    "confirmacion": [],
+    "papel": False,
+    "papel_saldo": 10_000.0,
+    "papel_deslizamiento": 0.0005,
+    "papel_comision": 0.0006,
+    "papel_latencia": 0.05,
+    "sink": "stdout",
+    "log_file": None,
+    "base_url": None,
+    "metricas_puerto": None,
+    "metricas_fichero": None,
+    "perfil": None,
+}
+
+# Las claves se pueden dar en el fichero de configuracion o, mejor, por variables de entorno
+VARIABLES_CLAVES = {
+    "api_key": "BITGET_API_KEY",
+    "secret_key": "BITGET_SECRET_KEY",
+    "passphrase": "BITGET_PASSPHRASE",
+}
+
+
+def leer_configuracion(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta un TradingBot sin interfaz grafica")
+    parser.add_argument("--config", help="fichero JSON con los parametros del bot")
+    parser.add_argument("--sma", dest="sma_periodo", type=int)
+    parser.add_argument("--ema", dest="ema_periodo", type=int)
+    parser.add_argument("--granularidad")
+    parser.add_argument("--product-type", dest="product_type")
+    parser.add_argument("--simbolo")
+    parser.add_argument("--ordersize", help="tamano de la orden en %% de patrimonio")
+    parser.add_argument("--pyramiding", help="efecto piramide")
+    parser.add_argument("--apalancamiento")
+    parser.add_argument("--actualizaciones", type=int, help="actualizaciones por minuto")
+    parser.add_argument("--gracia", dest="gracia_cierre", type=float,
+                        help="segundos de espera tras el cierre de cada vela")
+    parser.add_argument("--monitorizar-posicion", dest="monitorizar_posicion", action="store_true", default=None,
+                        help="evaluar tambien entre cierres mientras haya una posicion abierta")
+    parser.add_argument("--confirmacion", nargs="+",
+                        help="granularidades mayores que deben confirmar la senal (p. ej. 1h 4h)")
+    parser.add_argument("--websocket", action="store_true", default=None, help="datos de mercado por WebSocket")
+    parser.add_argument("--papel", action="store_true", default=None,
+                        help="ejecuta las ordenes en una cuenta en papel con precios reales, sin tocar fondos")
+    parser.add_argument("--papel-saldo", dest="papel_saldo", type=float)
+    parser.add_argument("--papel-deslizamiento", dest="papel_deslizamiento", type=float,
+                        help="fraccion del precio que empeora cada ejecucion en papel")
+    parser.add_argument("--papel-comision", dest="papel_comision", type=float, help="fraccion del importe")
+    parser.add_argument("--papel-latencia", dest="papel_latencia", type=float,
+                        help="segundos hasta que se ejecuta cada orden en papel")
+    parser.add_argument("--sink", choices=["stdout", "file", "json"])
+    parser.add_argument("--base-url", dest="base_url", help="URL de la API REST (por defecto BITGET_BASE_URL o Bitget)")
+    parser.add_argument("--metricas-puerto", dest="metricas_puerto", type=int,
+                        help="sirve /metrics y /metrics.json en localhost")
+    parser.add_argument("--metricas-fichero", dest="metricas_fichero", help="vuelca las metricas en JSON")
+    parser.add_argument("--perfil", help="guarda un perfil de cProfile del bucle del bot")
+    parser.add_argument("--log-file", dest="log_file")
+    args = parser.parse_args(argv)
+
+    config = dict(CONFIG_POR_DEFECTO)
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config.update(json.load(f))
+    config.update({clave: valor for clave, valor in vars(args).items() if valor is not None and clave != "config"})
+    for clave, variable in VARIABLES_CLAVES.items():
+        if os.environ.get(variable):
+            config[clave] = os.environ[variable]
+
+    # En papel no se usa la API privada y las claves no hacen falta
+    requeridas = ("simbolo",) if config["papel"] else ("simbolo", *VARIABLES_CLAVES)
+    faltan = [clave for clave in requeridas if not config.get(clave)]
+    if faltan:
+        parser.error(f"Faltan parametros: {', '.join(faltan)}")
+    if config["sink"] == "file" and not config["log_file"]:
+        parser.error("--sink file necesita --log-file")
+    return config
+
+
+def crear_ejecucion(config, feed=None, client=None):
+    if not config.get("papel"):
+        return None
+    return ejecucion_papel(config["product_type"], feed, client, saldo=float(config["papel_saldo"]),
+                           deslizamiento=float(config["papel_deslizamiento"]),
+                           comision=float(config["papel_comision"]), latencia=float(config["papel_latencia"]))
+
+
+def crear_bot(config):
+    campos = {"simbolo": config["simbolo"], "granularidad": config["granularidad"]}
+    log = crear_sink(config["sink"], "log", config["log_file"], **campos)
+    order_log = crear_sink(config["sink"], "orden", config["log_file"], **campos)
+
+    feed = None
+    if config["websocket"]:
+        try:
+            feed = get_market_feed()
+        except RuntimeError as e:
+            log.insert("end", f"{e}. Se usara la API REST.\n")
+
+    return TradingBot(int(config["sma_periodo"]), int(config["ema_periodo"]), config["granularidad"],
+                      config["product_type"], config["simbolo"], config.get("api_key"), config.get("secret_key"),
+                      config.get("passphrase"), config["ordersize"], config["pyramiding"], config["apalancamiento"],
+                      int(config["actualizaciones"]), log_text=log, order_log_text=order_log, feed=feed,
+                      feed_privado=feed is not None, gracia_cierre=float(config["gracia_cierre"]),
+                      monitorizar_posicion=bool(config["monitorizar_posicion"]),
+                      confirmacion=config["confirmacion"], ejecucion=crear_ejecucion(config, feed))
+
+
+def activar_metricas(config):
+    if config.get("metricas_puerto"):
+        metricas.servir(int(config["metricas_puerto"]))
+    if config.get("metricas_fichero"):
+        metricas.volcar_periodicamente(config["metricas_fichero"])
+
+
+def main(argv=None):
+    config = leer_configuracion(argv)
+    if config["base_url"]:
+        usar_servidor(config["base_url"])
+    activar_metricas(config)
+    bot = crear_bot(config)
+
+    # El supervisor de procesos para el bot con SIGTERM; Ctrl+C tambien lo detiene limpiamente
+    def detener(signum, frame):
+        bot.detener_bot()
+
+    signal.signal(signal.SIGTERM, detener)
+    signal.signal(signal.SIGINT, detener)
+    if config["perfil"]:
+        with perfilar(config["perfil"]):
+            bot.iniciar_bot()
+    else:
+        bot.iniciar_bot()
+
+
+if __name__ == "__main__":
+    main()
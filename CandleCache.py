@@ -0,0 +1,187 @@
+import time
+from collections import deque
+from threading import Lock
+
+import pandas as pd
+
+from CandleStore import CandleStore
+
+CANDLE_COLUMNS = ['time', 'entry', 'high', 'low', 'close', 'volume_base', 'volume_quote']
+
+# Duracion de cada granularidad en milisegundos ("1M" no tiene duracion fija y no aparece)
+GRANULARIDAD_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "4h": 14_400_000, "6h": 21_600_000, "12h": 43_200_000,
+    "1d": 86_400_000, "3d": 259_200_000, "1w": 604_800_000,
+}
+
+
+def granularidad_ms(granularidad):
+    # La API usa "1H", "1D"... y la interfaz "1h", "1d"; los minutos y el mes distinguen mayusculas
+    if granularidad in GRANULARIDAD_MS:
+        return GRANULARIDAD_MS[granularidad]
+    if granularidad == "1M":
+        return None
+    return GRANULARIDAD_MS.get(granularidad.lower())
+
+
+class CandleCache:
+    # Almacen de velas por (simbolo, granularidad, productType). La primera lectura descarga el
+    # historial completo; las siguientes solo piden las dos ultimas velas (la ultima cerrada y la
+    # que se esta formando) y las reemplazan o anaden en el sitio.
+    # Con raiz_almacen las velas cerradas se guardan tambien en un CandleStore en disco (si este proceso consigue
+    # ser su escritor) y al arrancar se parte de lo guardado, pidiendo a la API solo las velas que faltan.
+    def __init__(self, fetcher, history_limit=100, max_candles=500, refresh_limit=2, raiz_almacen=None):
+        self.fetcher = fetcher
+        self.raiz_almacen = raiz_almacen
+        self.stores = {}
+        self.history_limit = history_limit
+        self.max_candles = max(max_candles, history_limit)
+        self.refresh_limit = refresh_limit
+        self.series = {}
+        # Un candado por clave para que distintos simbolos puedan descargarse en paralelo
+        self.key_locks = {}
+        self.lock = Lock()
+
+    def get_candles(self, symbol, granularity, product_type="usdt-futures"):
+        velas = self.get_rows(symbol, granularity, product_type)
+        if velas is None:
+            return None
+        return self._to_frame(velas)
+
+    def get_rows(self, symbol, granularity, product_type="usdt-futures", refresh=True):
+        # Devuelve una copia de las velas como tuplas (time_ms, entry, high, low, close, volume_base, volume_quote).
+        # Con refresh=False solo se consulta la API si todavia no hay historial (p. ej. cuando las velas
+        # llegan por WebSocket mediante push_rows).
+        key = (symbol, granularity, product_type)
+        with self._key_lock(key):
+            velas = self.series.get(key)
+            if velas is None:
+                velas = self._load_history(key)
+            elif refresh:
+                nuevas = self._fetch(key, self.refresh_limit)
+                if nuevas is None:
+                    return None
+                if not self._merge(velas, nuevas):
+                    # Hueco entre lo almacenado y lo recibido: se vuelve a cargar todo el historial
+                    velas = self._load_history(key)
+                else:
+                    self._persist(key, velas, len(nuevas))
+            if velas is None:
+                return None
+            return list(velas)
+
+    def push_rows(self, symbol, granularity, product_type, rows):
+        # Velas recibidas por un feed en tiempo real. Se ignoran hasta que haya historial cargado.
+        key = (symbol, granularity, product_type)
+        with self._key_lock(key):
+            velas = self.series.get(key)
+            if velas is None:
+                return False
+            self._merge(velas, rows, allow_gap=True)
+            self._persist(key, velas, len(rows))
+            return True
+
+    def _key_lock(self, key):
+        with self.lock:
+            lock = self.key_locks.get(key)
+            if lock is None:
+                lock = self.key_locks[key] = Lock()
+            return lock
+
+    def invalidate(self, symbol=None, granularity=None, product_type=None):
+        with self.lock:
+            for key in list(self.series):
+                if (symbol is None or key[0] == symbol) and (granularity is None or key[1] == granularity) \
+                        and (product_type is None or key[2] == product_type):
+                    self.series.pop(key, None)
+
+    def _load_history(self, key):
+        velas = self._load_from_store(key)
+        if velas is None:
+            filas = self._fetch(key, self.history_limit)
+            if filas is None:
+                self.series.pop(key, None)
+                return None
+            velas = deque(filas, maxlen=self.max_candles)
+        self.series[key] = velas
+        self._persist(key, velas, len(velas))
+        return velas
+
+    def _store(self, key):
+        if self.raiz_almacen is None:
+            return None
+        if key not in self.stores:
+            store = CandleStore(key[0], key[1], key[2], self.raiz_almacen)
+            # Solo un proceso escribe cada particion; el resto solo la usa para arrancar en caliente. El bloqueo
+            # es un byte de un fichero compartido por raiz, no un descriptor por particion.
+            store.escritor = store.bloquear_escritura()
+            self.stores[key] = store
+        return self.stores[key]
+
+    def _load_from_store(self, key):
+        store = self._store(key)
+        if store is None or not len(store):
+            return None
+        guardadas = store.ultimas(self.max_candles)
+        paso = granularidad_ms(key[1])
+        if paso is None:
+            return None
+        faltan = (int(time.time() * 1000) - guardadas[-1][0]) // paso + 2
+        if faltan > self.history_limit:
+            return None
+        nuevas = self._fetch(key, max(faltan, self.refresh_limit))
+        velas = deque(guardadas, maxlen=self.max_candles)
+        if nuevas is None or not self._merge(velas, nuevas):
+            return None
+        return velas
+
+    def _persist(self, key, velas, recientes):
+        # Se guardan las velas cerradas (todas menos la ultima) que han podido cambiar
+        store = self._store(key)
+        if store is None or not store.escritor or len(velas) < 2:
+            return
+        n = len(velas)
+        inicio = max(0, n - 1 - recientes)
+        store.append([velas[i] for i in range(inicio, n - 1)])
+
+    def _fetch(self, key, limit):
+        symbol, granularity, product_type = key
+        recibidas = self.fetcher(symbol, granularity, int(time.time() * 1000), limit=limit, product_type=product_type)
+        if recibidas is None:
+            return None
+        if not isinstance(recibidas, pd.DataFrame):
+            # VelasRecibidas de get_candle_columns: las tuplas salen directamente de las columnas NumPy
+            return recibidas.filas()
+        df = recibidas
+        tiempos = (df.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+        valores = df[CANDLE_COLUMNS[1:]].to_numpy()
+        return [(int(t),) + tuple(v) for t, v in zip(tiempos, valores)]
+
+    @staticmethod
+    def _merge(velas, nuevas, allow_gap=False):
+        if not velas:
+            velas.extend(nuevas)
+            return True
+        if not allow_gap and nuevas and nuevas[0][0] > velas[-1][0]:
+            return False
+        for fila in nuevas:
+            ultimo = velas[-1][0]
+            if fila[0] > ultimo:
+                velas.append(fila)
+                continue
+            # Reemplazar la vela con el mismo tiempo empezando por el final, que es donde estan las recientes
+            for i in range(len(velas) - 1, -1, -1):
+                if velas[i][0] == fila[0]:
+                    velas[i] = fila
+                    break
+                if velas[i][0] < fila[0]:
+                    break
+        return True
+
+    @staticmethod
+    def _to_frame(velas):
+        df = pd.DataFrame(list(velas), columns=CANDLE_COLUMNS)
+        df['time'] = pd.to_datetime(df['time'], unit='ms')
+        df.set_index('time', inplace=True)
+        return df
@@ -0,0 +1,282 @@
+import json
+import os
+import time
+import zlib
+from threading import Lock
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DIRECTORIO_DATOS = "datos"
+
+# Esquema fijo: un fichero binario por columna, sin cabecera, con valores little-endian de 8 bytes
+ESQUEMA = (
+    ('time', np.dtype('<i8')),
+    ('entry', np.dtype('<f8')),
+    ('high', np.dtype('<f8')),
+    ('low', np.dtype('<f8')),
+    ('close', np.dtype('<f8')),
+    ('volume_base', np.dtype('<f8')),
+    ('volume_quote', np.dtype('<f8')),
+)
+VERSION_ESQUEMA = 1
+TAMANO_VALOR = 8
+# Una lectura que coincide con una reescritura se repite; si la particion sigue a medias tanto tiempo es que el
+# escritor se interrumpio y la reparara al volver a abrirla
+INTENTOS_LECTURA = 1000
+
+# Bloqueos de escritor: un solo fichero `.escritores` abierto por raiz y proceso, con un byte bloqueado (lockf)
+# por particion, en lugar de un descriptor por particion. Los bloqueos POSIX no excluyen dentro del mismo
+# proceso, asi que las particiones tomadas por este proceso se apuntan aparte.
+_ficheros_bloqueo = {}
+_particiones_bloqueadas = set()
+_bloqueos_lock = Lock()
+
+
+class CandleStore:
+    # Almacen de velas cerradas en disco por (simbolo, granularidad, productType), solo de anadir.
+    # Un unico proceso escribe (el feed o el descargador) y cualquier numero de procesos lee con np.memmap
+    # sin copiar los datos. El escritor anade primero las columnas de valores y al final la de tiempo, y los
+    # lectores toman la longitud del fichero de tiempo, asi nunca ven una vela a medio escribir. Las
+    # reescrituras (descargas hacia atras) sustituyen todas las columnas; el fichero `generacion` hace de seqlock:
+    # es impar mientras se sustituyen y los lectores repiten la lectura si ha cambiado entre medias.
+    def __init__(self, symbol, granularity, product_type="usdt-futures", raiz=DIRECTORIO_DATOS):
+        self.raiz = raiz
+        self.ruta = os.path.join(raiz, product_type, symbol, granularity)
+        self.lock = Lock()
+        self._mapas = None
+        self._mapas_clave = None
+        self._bloqueo = None
+
+    def existe(self):
+        return os.path.exists(self._fichero("time"))
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self._fichero("time")) // TAMANO_VALOR
+        except OSError:
+            return 0
+
+    # --- Lectura ---
+
+    def velas(self):
+        # {columna: np.memmap de solo lectura}; los mapas se reutilizan mientras el fichero no crezca ni se
+        # reescriba. Cada mapa mantiene abierto un descriptor: para leer unas pocas velas, mejor ultimas().
+        def mapear(generacion):
+            n = len(self)
+            with self.lock:
+                if self._mapas is not None and self._mapas_clave == (generacion, n):
+                    return self._mapas
+            if n == 0:
+                mapas = {nombre: np.empty(0, dtype=dtype) for nombre, dtype in ESQUEMA}
+            else:
+                mapas = {nombre: np.memmap(self._fichero(nombre), dtype=dtype, mode='r', shape=(n,))
+                         for nombre, dtype in ESQUEMA}
+            with self.lock:
+                self._mapas = mapas
+                self._mapas_clave = (generacion, n)
+            return mapas
+
+        return self._leer_consistente(mapear)
+
+    def columna(self, nombre):
+        return self.velas()[nombre]
+
+    def ultimas(self, n):
+        # Ultimas n velas como tuplas (time, entry, high, low, close, volume_base, volume_quote). Se leen sin
+        # memmap para no dejar descriptores abiertos por cada particion consultada.
+        def leer(generacion):
+            total = len(self)
+            if total == 0:
+                return []
+            desde = max(0, total - n)
+            columnas = []
+            for nombre, dtype in ESQUEMA:
+                with open(self._fichero(nombre), "rb") as f:
+                    columnas.append(np.fromfile(f, dtype=dtype, count=total - desde,
+                                                offset=desde * TAMANO_VALOR).tolist())
+            return list(zip(*columnas))
+
+        return self._leer_consistente(leer)
+
+    def _leer_consistente(self, leer):
+        for _ in range(INTENTOS_LECTURA):
+            generacion = self._generacion()
+            if generacion % 2 == 0:
+                resultado = leer(generacion)
+                if self._generacion() == generacion:
+                    return resultado
+            time.sleep(0.001)
+        raise RuntimeError(f"La particion {self.ruta} esta a medio reescribir")
+
+    def ultimo_tiempo(self):
+        n = len(self)
+        if n == 0:
+            return None
+        with open(self._fichero("time"), "rb") as f:
+            f.seek((n - 1) * TAMANO_VALOR)
+            return int(np.frombuffer(f.read(TAMANO_VALOR), dtype=ESQUEMA[0][1])[0])
+
+    # --- Escritura ---
+
+    def bloquear_escritura(self):
+        # Garantiza un solo escritor por particion. Devuelve False si otro proceso (u otro CandleStore de este
+        # proceso) ya la tiene.
+        self._crear()
+        if fcntl is None or self._bloqueo is not None:
+            return True
+        particion = os.path.abspath(self.ruta)
+        ruta_bloqueo = os.path.join(os.path.abspath(self.raiz), ".escritores")
+        # Un byte por particion; una colision de crc32 solo haria que un segundo escritor no pudiera escribir
+        desplazamiento = zlib.crc32(os.path.relpath(particion, os.path.abspath(self.raiz)).encode())
+        with _bloqueos_lock:
+            if particion in _particiones_bloqueadas:
+                return False
+            f = _ficheros_bloqueo.get(ruta_bloqueo)
+            if f is None:
+                f = _ficheros_bloqueo[ruta_bloqueo] = open(ruta_bloqueo, "a")
+            try:
+                fcntl.lockf(f, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, desplazamiento)
+            except OSError:
+                return False
+            _particiones_bloqueadas.add(particion)
+        self._bloqueo = (f, desplazamiento, particion)
+        self._reparar_reescritura()
+        return True
+
+    def liberar_escritura(self):
+        if self._bloqueo is None:
+            return
+        f, desplazamiento, particion = self._bloqueo
+        with _bloqueos_lock:
+            fcntl.lockf(f, fcntl.LOCK_UN, 1, desplazamiento)
+            _particiones_bloqueadas.discard(particion)
+        self._bloqueo = None
+
+    def append(self, filas):
+        # filas: tuplas (time, entry, ...) en orden ascendente. Las posteriores a la ultima vela se anaden, la
+        # que coincide con la ultima la reemplaza en el sitio y las anteriores se ignoran.
+        self._crear()
+        self._reparar()
+        ultimo = self.ultimo_tiempo()
+        for fila in filas:
+            if fila[0] == ultimo:
+                self._sobrescribir_ultima(fila)
+        nuevas = [fila for fila in filas if ultimo is None or fila[0] > ultimo]
+        if not nuevas:
+            return 0
+        columnas = list(zip(*nuevas))
+        # El tiempo se escribe el ultimo para que los lectores solo vean velas completas
+        for i in list(range(1, len(ESQUEMA))) + [0]:
+            nombre, dtype = ESQUEMA[i]
+            with open(self._fichero(nombre), "ab") as f:
+                f.write(np.asarray(columnas[i], dtype=dtype).tobytes())
+        return len(nuevas)
+
+    def merge(self, velas):
+        # velas: array 2D (n, 7) en el orden de ESQUEMA. Si todo es posterior a lo guardado se anade; si no
+        # se reescribe la particion con la union ordenada y sin duplicados (descargas hacia atras).
+        if not len(velas):
+            return
+        ultimo = self.ultimo_tiempo()
+        if ultimo is None or velas[0, 0] > ultimo:
+            self.append([tuple(fila) for fila in velas.tolist()])
+            return
+        existentes = self.velas()
+        actuales = np.column_stack([existentes[nombre].astype(np.float64) for nombre, _ in ESQUEMA])
+        todas = np.concatenate([velas, actuales])
+        _, indices = np.unique(todas[:, 0], return_index=True)
+        todas = todas[indices]
+        self._reescribir(todas)
+
+    def leer_estado(self):
+        try:
+            with open(os.path.join(self.ruta, "estado.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def guardar_estado(self, estado):
+        self._crear()
+        tmp = os.path.join(self.ruta, "estado.tmp.json")
+        with open(tmp, "w") as f:
+            json.dump(estado, f)
+        os.replace(tmp, os.path.join(self.ruta, "estado.json"))
+
+    def _fichero(self, nombre):
+        return os.path.join(self.ruta, nombre + ".bin")
+
+    def _crear(self):
+        if os.path.exists(os.path.join(self.ruta, "esquema.json")):
+            return
+        os.makedirs(self.ruta, exist_ok=True)
+        with open(os.path.join(self.ruta, "esquema.json"), "w") as f:
+            json.dump({"version": VERSION_ESQUEMA, "columnas": [[nombre, dtype.str] for nombre, dtype in ESQUEMA]}, f)
+
+    def _reparar(self):
+        # Si un escritor se interrumpio entre las columnas de valores y la de tiempo, las columnas de valores
+        # tienen velas de mas: se recortan a la longitud de la columna de tiempo
+        limite = len(self) * TAMANO_VALOR
+        for nombre, _ in ESQUEMA[1:]:
+            fichero = self._fichero(nombre)
+            if os.path.exists(fichero) and os.path.getsize(fichero) > limite:
+                with open(fichero, "r+b") as f:
+                    f.truncate(limite)
+
+    def _sobrescribir_ultima(self, fila):
+        n = len(self)
+        for i in range(1, len(ESQUEMA)):
+            nombre, dtype = ESQUEMA[i]
+            with open(self._fichero(nombre), "r+b") as f:
+                f.seek((n - 1) * TAMANO_VALOR)
+                f.write(np.asarray([fila[i]], dtype=dtype).tobytes())
+
+    def _generacion(self):
+        try:
+            with open(os.path.join(self.ruta, "generacion")) as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _guardar_generacion(self, generacion):
+        tmp = os.path.join(self.ruta, "generacion.tmp")
+        with open(tmp, "w") as f:
+            f.write(str(generacion))
+        os.replace(tmp, os.path.join(self.ruta, "generacion"))
+
+    def _reescribir(self, velas):
+        # Todas las columnas se escriben primero en temporales; despues, con la generacion en impar, se sustituyen
+        # (el tiempo al final, como en append) y la generacion vuelve a par. Un lector que mapee a la vez ve el
+        # cambio de generacion y repite; los que ya tenian los ficheros mapeados siguen con la version anterior.
+        with self.lock:
+            self._mapas = None
+        for i, (nombre, dtype) in enumerate(ESQUEMA):
+            with open(self._fichero(nombre) + ".tmp", "wb") as f:
+                f.write(velas[:, i].astype(dtype).tobytes())
+        generacion = self._generacion()
+        self._guardar_generacion(generacion + 1)
+        self._sustituir_temporales()
+        self._guardar_generacion(generacion + 2)
+
+    def _sustituir_temporales(self):
+        for i in list(range(1, len(ESQUEMA))) + [0]:
+            tmp = self._fichero(ESQUEMA[i][0]) + ".tmp"
+            if os.path.exists(tmp):
+                os.replace(tmp, self._fichero(ESQUEMA[i][0]))
+
+    def _reparar_reescritura(self):
+        # Un escritor interrumpido a mitad de las sustituciones deja la generacion en impar: todos los temporales
+        # estaban completos, asi que se termina la sustitucion. Con la generacion en par los temporales que
+        # queden son de una reescritura que no llego a empezar y se descartan.
+        generacion = self._generacion()
+        if generacion % 2:
+            self._sustituir_temporales()
+            self._guardar_generacion(generacion + 1)
+        else:
+            for nombre, _ in ESQUEMA:
+                if os.path.exists(self._fichero(nombre) + ".tmp"):
+                    os.remove(self._fichero(nombre) + ".tmp")
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import time
+from decimal import Decimal, ROUND_DOWN
+from threading import Lock, Thread
+
+from BitgetClient import default_client, es_produccion, leer_json
+from CandleStore import DIRECTORIO_DATOS
+
+logger = logging.getLogger(__name__)
+
+CONTRACTS_ENDPOINT = "/api/v2/mix/market/contracts"
+# Contratos que ya no se pueden operar y no se ofrecen en la lista de simbolos
+ESTADOS_NO_OPERABLES = {"off"}
+
+
+class Contrato:
+    # Especificacion de un contrato de futuros: decimales y multiplo del tamano de las ordenes, tamano minimo
+    # e importe minimo en la moneda de cotizacion
+    def __init__(self, datos):
+        self.simbolo = datos["symbol"]
+        self.estado = datos.get("symbolStatus", "normal")
+        self.volume_place = int(datos.get("volumePlace") or 0)
+        self.price_place = int(datos.get("pricePlace") or 0)
+        self.min_trade_num = Decimal(datos.get("minTradeNum") or "0")
+        self.min_trade_usdt = Decimal(datos.get("minTradeUSDT") or "0")
+        multiplicador = Decimal(datos.get("sizeMultiplier") or "0")
+        paso = Decimal(1).scaleb(-self.volume_place)
+        # El tamano tiene que ser multiplo de sizeMultiplier y no tener mas de volumePlace decimales
+        self.paso = max(multiplicador, paso)
+        self.datos = datos
+
+    def redondear_size(self, size, precio=None):
+        # Redondea hacia abajo al paso del contrato. Devuelve 0 si no llega al minimo (en unidades o, con el
+        # precio, en importe), para no enviar una orden que el exchange va a rechazar.
+        pasos = (Decimal(str(size)) / self.paso).to_integral_value(rounding=ROUND_DOWN)
+        redondeado = pasos * self.paso
+        if redondeado <= 0 or redondeado < self.min_trade_num:
+            return 0.0
+        if precio is not None and redondeado * Decimal(str(precio)) < self.min_trade_usdt:
+            return 0.0
+        return float(redondeado)
+
+
+class ContractCache:
+    # Especificaciones de los contratos por productType. Se guardan en disco (datos/contratos/<productType>.json)
+    # y se consideran frescas durante `ttl` segundos. Con una copia caducada se responde con ella y se pide la
+    # nueva en segundo plano; solo se espera a la API cuando no hay ninguna copia. Con raiz=None solo se guardan
+    # en memoria (Replay, benchmarks).
+    def __init__(self, client=None, raiz=DIRECTORIO_DATOS, ttl=6 * 3600):
+        self.client = client or default_client
+        self.ruta = os.path.join(raiz, "contratos") if raiz is not None else None
+        self.ttl = ttl
+        self.contratos_por_tipo = {}  # productType -> (instante, {simbolo: Contrato})
+        self.refrescando = set()
+        self.key_locks = {}
+        self.lock = Lock()
+
+    def contratos(self, product_type):
+        # {simbolo: Contrato} o None si no hay copia y la API no responde
+        with self._key_lock(product_type):
+            entrada = self.contratos_por_tipo.get(product_type)
+            if entrada is None:
+                entrada = self._leer_disco(product_type)
+                if entrada is None:
+                    return self._descargar(product_type)
+                self.contratos_por_tipo[product_type] = entrada
+        instante, contratos = entrada
+        if time.time() - instante > self.ttl:
+            self.refrescar_async(product_type)
+        return contratos
+
+    def contrato(self, product_type, simbolo):
+        contratos = self.contratos(product_type)
+        return contratos.get(simbolo) if contratos else None
+
+    def simbolos(self, product_type):
+        contratos = self.contratos(product_type)
+        if contratos is None:
+            return None
+        return sorted(s for s, contrato in contratos.items() if contrato.estado not in ESTADOS_NO_OPERABLES)
+
+    def precargar(self, product_types):
+        # Al arrancar: carga (de disco o de la API) los productTypes indicados sin bloquear al llamante
+        hilo = Thread(target=lambda: [self.contratos(product_type) for product_type in product_types], daemon=True)
+        hilo.start()
+        return hilo
+
+    def refrescar_async(self, product_type):
+        with self.lock:
+            if product_type in self.refrescando:
+                return
+            self.refrescando.add(product_type)
+
+        def refrescar():
+            try:
+                with self._key_lock(product_type):
+                    self._descargar(product_type)
+            finally:
+                with self.lock:
+                    self.refrescando.discard(product_type)
+
+        Thread(target=refrescar, daemon=True).start()
+
+    def _key_lock(self, product_type):
+        with self.lock:
+            lock = self.key_locks.get(product_type)
+            if lock is None:
+                lock = self.key_locks[product_type] = Lock()
+            return lock
+
+    def _descargar(self, product_type):
+        response = self.client.get(CONTRACTS_ENDPOINT, params={"productType": product_type})
+        if response is None or response.status_code != 200:
+            if response is not None:
+                logger.warning("Error: %s - %s", response.status_code, response.text)
+            # Si habia una copia, aunque este caducada, se sigue usando
+            entrada = self.contratos_por_tipo.get(product_type)
+            return entrada[1] if entrada else None
+        data = leer_json(response).get('data') or []
+        instante = time.time()
+        self.contratos_por_tipo[product_type] = (instante, {datos["symbol"]: Contrato(datos) for datos in data})
+        self._guardar_disco(product_type, instante, data)
+        return self.contratos_por_tipo[product_type][1]
+
+    def _fichero(self, product_type):
+        return os.path.join(self.ruta, f"{product_type}.json")
+
+    def _leer_disco(self, product_type):
+        if self.ruta is None:
+            return None
+        try:
+            with open(self._fichero(product_type), encoding="utf-8") as f:
+                guardado = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return guardado["ts"], {datos["symbol"]: Contrato(datos) for datos in guardado["data"]}
+
+    def _guardar_disco(self, product_type, instante, data):
+        # Sustitucion atomica para que otro proceso nunca lea un fichero a medias
+        if self.ruta is None:
+            return
+        os.makedirs(self.ruta, exist_ok=True)
+        tmp = self._fichero(product_type) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ts": instante, "data": data}, f)
+        os.replace(tmp, self._fichero(product_type))
+
+
+# Cache compartido por la interfaz, los bots y el escaner del proceso. Contra otro servidor (p. ej. MockBitget)
+# los contratos solo se guardan en memoria
+contract_cache = ContractCache(raiz=DIRECTORIO_DATOS if es_produccion(default_client.base_url) else None)
@@ -0,0 +1,227 @@
+import json
+import random
+import time
+import uuid
+from threading import Lock
+
+from BitgetClient import default_client, leer_json
+from ContractCache import contract_cache
+
+
+def _ok(data):
+    return 200, {"code": "00000", "msg": "success", "requestTime": int(time.time() * 1000), "data": data}
+
+
+def _error(status, code, msg):
+    return status, {"code": code, "msg": msg, "requestTime": int(time.time() * 1000), "data": None}
+
+
+class RespuestaSimulada:
+    # Lo que el bot usa de requests.Response
+    def __init__(self, status_code, cuerpo):
+        self.status_code = status_code
+        self.cuerpo = cuerpo
+        self.headers = {}
+
+    def json(self):
+        return self.cuerpo
+
+    @property
+    def content(self):
+        return json.dumps(self.cuerpo).encode()
+
+    @property
+    def text(self):
+        return json.dumps(self.cuerpo)
+
+
+class CuentaSimulada:
+    # Cuenta con margen aislado: cada orden bloquea size * precio / apalancamiento y al cerrar se devuelve el
+    # margen mas el PnL. Las ordenes a mercado se ejecutan al ask (compras) o al bid (ventas) del mercado,
+    # empeorados en `deslizamiento` (fraccion del precio), y pagan `comision` (fraccion del importe). El mercado
+    # tiene que ofrecer ticker, contrato y ahora.
+    def __init__(self, mercado, saldo=10_000.0, margin_coin="USDT", deslizamiento=0.0, comision=0.0):
+        self.mercado = mercado
+        self.margin_coin = margin_coin
+        self.deslizamiento = deslizamiento
+        self.comision = comision
+        self.disponible = saldo
+        self.apalancamiento = {}
+        self.posiciones = {}  # (simbolo, lado) -> {"total", "precio", "margen"}
+        self.ordenes = {}  # clientOid -> datos
+        self.historial = []  # aperturas y cierres ejecutados, con el instante del mercado
+        self.lock = Lock()
+
+    def cuenta(self):
+        with self.lock:
+            return {"marginCoin": self.margin_coin, "available": f"{self.disponible:.6f}",
+                    "locked": "0", "accountEquity": f"{self.disponible + self._margen_bloqueado():.6f}"}
+
+    def _margen_bloqueado(self):
+        return sum(posicion["margen"] for posicion in self.posiciones.values())
+
+    def _precio(self, simbolo, compra):
+        ticker = self.mercado.ticker(simbolo)
+        if ticker is None:
+            return None
+        if compra:
+            return float(ticker["askPr"]) * (1 + self.deslizamiento)
+        return float(ticker["bidPr"]) * (1 - self.deslizamiento)
+
+    def posiciones_de(self, simbolo):
+        with self.lock:
+            return [{"symbol": s, "holdSide": lado, "total": f"{p['total']:.6f}", "available": f"{p['total']:.6f}",
+                     "openPriceAvg": f"{p['precio']:.6f}", "marginCoin": self.margin_coin,
+                     "leverage": str(self.apalancamiento.get(s, 1.0))}
+                    for (s, lado), p in self.posiciones.items() if s == simbolo and p["total"] > 0]
+
+    def fijar_apalancamiento(self, simbolo, apalancamiento):
+        with self.lock:
+            self.apalancamiento[simbolo] = float(apalancamiento)
+        return _ok({"symbol": simbolo, "longLeverage": str(apalancamiento), "shortLeverage": str(apalancamiento)})
+
+    def abrir(self, params):
+        simbolo = params["symbol"]
+        lado = "long" if params["side"] == "buy" else "short"
+        size = float(params["size"])
+        client_oid = params.get("clientOid") or uuid.uuid4().hex
+        with self.lock:
+            if client_oid in self.ordenes:
+                # Misma orden reenviada: no se ejecuta dos veces
+                return _ok(self.ordenes[client_oid])
+            contrato = self.mercado.contrato(simbolo)
+            if contrato is not None:
+                if size < float(contrato["minTradeNum"]):
+                    return _error(400, "45111", "less than the minimum order quantity")
+                if round(size, int(contrato["volumePlace"])) != size:
+                    return _error(400, "40808", f"Parameter verification exception size checkBDScale error value={size}")
+            precio = self._precio(simbolo, lado == "long")
+            if precio is None:
+                return _error(400, "40034", f"Sin precio para {simbolo}")
+            margen = size * precio / self.apalancamiento.get(simbolo, 1.0)
+            comision = size * precio * self.comision
+            if margen + comision > self.disponible:
+                return _error(400, "40762", "The order amount exceeds the balance")
+            self.disponible -= margen + comision
+            posicion = self.posiciones.setdefault((simbolo, lado), {"total": 0.0, "precio": 0.0, "margen": 0.0})
+            posicion["precio"] = (posicion["precio"] * posicion["total"] + precio * size) / (posicion["total"] + size)
+            posicion["total"] += size
+            posicion["margen"] += margen
+            orden = {"orderId": str(len(self.ordenes) + 1), "clientOid": client_oid, "state": "filled",
+                     "priceAvg": f"{precio:.6f}", "size": str(size)}
+            self.ordenes[client_oid] = orden
+            self.historial.append({"ts": self.mercado.ahora(), "tipo": "apertura", "simbolo": simbolo, "lado": lado,
+                                   "size": size, "precio": precio, "pnl": 0.0, "comision": comision})
+            return _ok({"orderId": orden["orderId"], "clientOid": client_oid})
+
+    def cerrar(self, simbolo, lado):
+        with self.lock:
+            posicion = self.posiciones.get((simbolo, lado))
+            if not posicion or posicion["total"] <= 0:
+                return _error(400, "22002", "No position to close")
+            precio = self._precio(simbolo, lado == "short")
+            if precio is None:
+                return _error(400, "40034", f"Sin precio para {simbolo}")
+            signo = 1 if lado == "long" else -1
+            pnl = signo * (precio - posicion["precio"]) * posicion["total"]
+            comision = posicion["total"] * precio * self.comision
+            self.disponible += max(0.0, posicion["margen"] + pnl) - comision
+            del self.posiciones[(simbolo, lado)]
+            self.historial.append({"ts": self.mercado.ahora(), "tipo": "cierre", "simbolo": simbolo, "lado": lado,
+                                   "size": posicion["total"], "precio": precio, "pnl": pnl, "comision": comision})
+            return _ok({"successList": [{"symbol": simbolo, "holdSide": lado}], "failureList": []})
+
+    def atender(self, metodo, ruta, params):
+        # Endpoints privados de la API v2 (cuenta, posiciones, apalancamiento y ordenes); None si la ruta no es
+        # de la cuenta
+        if ruta == "/api/v2/mix/account/account":
+            return _ok(self.cuenta())
+        if ruta == "/api/v2/mix/position/single-position":
+            return _ok(self.posiciones_de(params["symbol"]))
+        if ruta == "/api/v2/mix/account/set-leverage":
+            return self.fijar_apalancamiento(params["symbol"], params["leverage"])
+        if ruta == "/api/v2/mix/order/place-order" and metodo == "POST":
+            return self.abrir(params)
+        if ruta == "/api/v2/mix/order/close-positions" and metodo == "POST":
+            return self.cerrar(params["symbol"], params["holdSide"])
+        if ruta == "/api/v2/mix/order/detail":
+            orden = self.ordenes.get(params.get("clientOid"))
+            return _ok(orden) if orden else _error(400, "40109", "The data of the order cannot be found")
+        return None
+
+
+class MercadoEnVivo:
+    # Mercado real visto por una CuentaSimulada: el ask/bid sale del libro que ya mantiene el feed WebSocket (sin
+    # peticiones) o, sin feed, del ticker REST publico; los contratos, del ContractCache. Nunca usa la API privada.
+    def __init__(self, product_type, feed=None, client=None, contratos=None):
+        self.product_type = product_type
+        self.feed = feed
+        self.client = client or default_client
+        self.contratos = contratos or contract_cache
+
+    def ahora(self):
+        return int(time.time() * 1000)
+
+    def ticker(self, simbolo):
+        if self.feed is not None:
+            ask = self.feed.ask_price(simbolo, self.product_type)
+            bid = self.feed.bid_price(simbolo, self.product_type)
+            if ask is not None and bid is not None:
+                return {"symbol": simbolo, "lastPr": self.feed.last_price(simbolo, self.product_type),
+                        "askPr": ask, "bidPr": bid}
+        response = self.client.get("/api/v2/mix/market/ticker",
+                                   params={"symbol": simbolo, "productType": self.product_type})
+        if response is None or response.status_code != 200:
+            return None
+        data = leer_json(response).get('data') or []
+        return data[0] if data else None
+
+    def contrato(self, simbolo):
+        contrato = self.contratos.contrato(self.product_type, simbolo)
+        return contrato.datos if contrato is not None else None
+
+
+class EjecucionReal:
+    # Backend de ejecucion por defecto: las peticiones privadas van firmadas a la API de Bitget. `signer` es una
+    # funcion que devuelve el Signer, para que solo se cree (y se mida el desfase de reloj) al primer uso.
+    simulada = False
+
+    def __init__(self, client, signer):
+        self.client = client
+        self.signer = signer
+
+    def peticion(self, method, endpoint, params):
+        if method == "GET":
+            return self.client.signed_request(method, endpoint, self.signer(), params=params)
+        return self.client.signed_request(method, endpoint, self.signer(), body=params)
+
+
+class EjecucionPapel:
+    # Backend de ejecucion en papel: atiende los mismos endpoints privados con una CuentaSimulada en memoria, asi
+    # que el bot no cambia su logica de ordenes, reintentos ni reconciliacion. Cada peticion espera `latencia`
+    # segundos (mas hasta `jitter` al azar) antes de ejecutarse, como el viaje de ida al exchange: el precio de
+    # la ejecucion es el del mercado tras la espera. No consume el limite de peticiones de la API privada.
+    simulada = True
+
+    def __init__(self, cuenta, latencia=0.0, jitter=0.0, dormir=time.sleep, semilla=None):
+        self.cuenta = cuenta
+        self.latencia = latencia
+        self.jitter = jitter
+        self.dormir = dormir
+        self.random = random.Random(semilla)
+
+    def peticion(self, method, endpoint, params):
+        if self.latencia or self.jitter:
+            self.dormir(self.latencia + self.random.uniform(0, self.jitter))
+        respuesta = self.cuenta.atender(method, endpoint, dict(params or {}))
+        if respuesta is None:
+            respuesta = _error(404, "40404", f"Endpoint no simulado: {method} {endpoint}")
+        return RespuestaSimulada(*respuesta)
+
+
+def ejecucion_papel(product_type, feed=None, client=None, contratos=None, saldo=10_000.0, deslizamiento=0.0005,
+                    comision=0.0006, latencia=0.05, jitter=0.0):
+    # Cuenta en papel sobre precios reales para dejar un bot (o una estrategia nueva) funcionando dias sin fondos
+    mercado = MercadoEnVivo(product_type, feed, client, contratos)
+    cuenta = CuentaSimulada(mercado, saldo, product_type.split("-")[0].upper(), deslizamiento, comision)
+    return EjecucionPapel(cuenta, latencia, jitter)
@@ -0,0 +1,138 @@
+import json
+import logging
+import sys
+import time
+from collections import deque
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+END = "end"
+
+
+class TkLogQueue:
+    # Sustituto seguro entre hilos de un tk.Text: los hilos del bot llaman a insert/see como si fuera el widget
+    # y el texto se acumula en una cola que el hilo de Tk vacia por lotes con root.after. El widget se limita a
+    # max_lineas, borrando las mas antiguas, para que no crezca sin limite en sesiones largas.
+    def __init__(self, root, widget, max_lineas=2000, intervalo_ms=200):
+        self.root = root
+        self.widget = widget
+        self.max_lineas = max_lineas
+        self.intervalo_ms = intervalo_ms
+        self.pendiente = deque()
+        self.tareas = deque()
+        self.lock = Lock()
+        self.root.after(self.intervalo_ms, self._vaciar)
+
+    def insert(self, index, text):
+        # El indice se ignora: el log siempre se escribe al final
+        with self.lock:
+            self.pendiente.append(text)
+
+    def see(self, index):
+        # El desplazamiento al final se hace al vaciar cada lote
+        pass
+
+    def en_hilo_ui(self, funcion):
+        # Ejecuta `funcion` en el hilo de Tk en el proximo vaciado (p. ej. para cambiar el estado de un boton)
+        with self.lock:
+            self.tareas.append(funcion)
+
+    def _vaciar(self):
+        # Se vuelve a programar pase lo que pase: si un vaciado fallara sin hacerlo, el log se quedaria parado
+        try:
+            with self.lock:
+                texto = "".join(self.pendiente)
+                self.pendiente.clear()
+                tareas = list(self.tareas)
+                self.tareas.clear()
+
+            if texto:
+                self.widget.insert(END, texto)
+                lineas = int(self.widget.index("end-1c").split(".")[0])
+                if lineas > self.max_lineas:
+                    self.widget.delete("1.0", f"{lineas - self.max_lineas + 1}.0")
+                self.widget.see(END)
+            for tarea in tareas:
+                # Una tarea que falla no impide ejecutar las demas
+                try:
+                    tarea()
+                except Exception:
+                    logger.exception("Error en una tarea del hilo de la interfaz")
+        finally:
+            self.root.after(self.intervalo_ms, self._vaciar)
+
+
+class NullSink:
+    # Descarta el texto, para los logs que nadie va a leer (p. ej. los de Replay si no se piden)
+    def insert(self, index, text):
+        pass
+
+    def see(self, index):
+        pass
+
+
+class LineSink:
+    # Base de los destinos sin interfaz grafica. Acepta las mismas llamadas insert/see que un tk.Text y
+    # entrega el texto linea a linea a `escribir_linea`.
+    def __init__(self):
+        self.buffer = ""
+        self.lock = Lock()
+
+    def insert(self, index, text):
+        with self.lock:
+            self.buffer += text
+            *lineas, self.buffer = self.buffer.split("\n")
+            for linea in lineas:
+                self.escribir_linea(linea)
+
+    def see(self, index):
+        pass
+
+    def escribir_linea(self, linea):
+        raise NotImplementedError
+
+
+class StreamSink(LineSink):
+    def __init__(self, stream=None, prefijo=""):
+        super().__init__()
+        self.stream = stream or sys.stdout
+        self.prefijo = prefijo
+
+    def escribir_linea(self, linea):
+        self.stream.write(f"{self.prefijo}{linea}\n")
+        self.stream.flush()
+
+
+class FileSink(StreamSink):
+    def __init__(self, ruta, prefijo=""):
+        super().__init__(open(ruta, "a", encoding="utf-8"), prefijo)
+
+
+class JsonSink(LineSink):
+    # Una linea JSON por mensaje, para recolectores de logs
+    def __init__(self, stream=None, **campos):
+        super().__init__()
+        self.stream = stream or sys.stdout
+        self.campos = campos
+
+    def escribir_linea(self, linea):
+        if not linea.strip():
+            return
+        registro = {"ts": time.time(), **self.campos, "msg": linea}
+        self.stream.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+def crear_sink(tipo, canal, ruta=None, **campos):
+    # tipo: "stdout", "file" o "json"; canal distingue el log general ("log") del de ordenes ("orden")
+    if tipo == "stdout":
+        return StreamSink(prefijo=f"[{canal}] ")
+    if tipo == "file":
+        if ruta is None:
+            raise ValueError("El destino 'file' necesita una ruta")
+        return FileSink(ruta, prefijo=f"[{canal}] ")
+    if tipo == "json":
+        stream = open(ruta, "a", encoding="utf-8") if ruta else None
+        return JsonSink(stream, canal=canal, **campos)
+    raise ValueError(f"Destino de log desconocido: {tipo}")
@@ -0,0 +1,255 @@
+import json
+import logging
+import time
+from threading import Condition, Lock, Thread
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+logger = logging.getLogger(__name__)
+
+WS_PUBLIC_URL = "wss://ws.bitget.com/v2/ws/public"
+WS_PRIVATE_URL = "wss://ws.bitget.com/v2/ws/private"
+
+# Granularidad de la interfaz -> canal de velas de Bitget
+CANALES_VELAS = {
+    "1m": "candle1m", "5m": "candle5m", "15m": "candle15m", "30m": "candle30m",
+    "1h": "candle1H", "4h": "candle4H", "6h": "candle6H", "12h": "candle12H",
+    "1d": "candle1D", "3d": "candle3D", "1w": "candle1W", "1M": "candle1M",
+}
+GRANULARIDADES = {canal: granularidad for granularidad, canal in CANALES_VELAS.items()}
+# Canales por mensaje de suscripcion: Bitget limita los mensajes por segundo de cada conexion, asi que muchas
+# suscripciones (p. ej. todos los simbolos del escaner) se agrupan en pocos mensajes
+LOTE_SUSCRIPCION = 100
+
+
+class MarketFeed:
+    # Feed de mercado por WebSocket: mantiene el ultimo precio / ask / bid de cada simbolo y empuja las
+    # velas al cache de velas. Cuando llega una vela con un tiempo nuevo la anterior se considera cerrada
+    # y se despiertan los que esperan en wait_candle_close.
+    def __init__(self, candle_cache=None, url=WS_PUBLIC_URL, ping_interval=25, reconnect_delay=5):
+        if websocket is None:
+            raise RuntimeError("El feed WebSocket necesita el paquete websocket-client (pip install websocket-client)")
+        self.candle_cache = candle_cache
+        self.url = url
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+
+        self.book = {}
+        self.subscriptions = set()
+        self.last_candle_time = {}
+        self.closed_count = {}
+        self.listeners = []
+
+        self.lock = Lock()
+        self.candle_closed = Condition(self.lock)
+        self.ws = None
+        self.running = False
+        self.connected = False
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        Thread(target=self._run, daemon=True).start()
+        Thread(target=self._keepalive, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        if self.ws is not None:
+            self.ws.close()
+
+    def subscribe_candles(self, symbol, granularity, product_type):
+        self._subscribe((product_type.upper(), CANALES_VELAS[granularity], symbol))
+
+    def subscribe_candles_batch(self, symbols, granularity, product_type):
+        self._subscribe(*[(product_type.upper(), CANALES_VELAS[granularity], symbol) for symbol in symbols])
+
+    def subscribe_ticker(self, symbol, product_type):
+        self._subscribe((product_type.upper(), "ticker", symbol))
+
+    def add_listener(self, callback):
+        # callback(symbol, granularity, product_type, tiempo_vela_cerrada)
+        self.listeners.append(callback)
+
+    def last_price(self, symbol, product_type):
+        return self._book_value(symbol, product_type, "last")
+
+    def ask_price(self, symbol, product_type):
+        return self._book_value(symbol, product_type, "ask")
+
+    def bid_price(self, symbol, product_type):
+        return self._book_value(symbol, product_type, "bid")
+
+    def wait_candle_close(self, symbol, granularity, product_type, timeout=None):
+        # Devuelve True si se cerro una vela de la clave antes de que pase `timeout`
+        key = (symbol, granularity, product_type)
+        with self.candle_closed:
+            inicial = self.closed_count.get(key, 0)
+            return self.candle_closed.wait_for(lambda: self.closed_count.get(key, 0) != inicial, timeout)
+
+    def _book_value(self, symbol, product_type, campo):
+        entrada = self.book.get((symbol, product_type.lower()))
+        if entrada is None:
+            return None
+        return entrada.get(campo)
+
+    def _subscribe(self, *args):
+        with self.lock:
+            nuevos = [arg for arg in dict.fromkeys(args) if arg not in self.subscriptions]
+            self.subscriptions.update(nuevos)
+        if nuevos and self.connected:
+            self._send_subscribe(nuevos)
+
+    def _send_subscribe(self, args):
+        for i in range(0, len(args), LOTE_SUSCRIPCION):
+            mensaje = {"op": "subscribe",
+                       "args": [{"instType": inst_type, "channel": channel, "instId": inst_id}
+                                for inst_type, channel, inst_id in args[i:i + LOTE_SUSCRIPCION]]}
+            try:
+                self.ws.send(json.dumps(mensaje))
+            except Exception as e:
+                logger.warning("No se pudo suscribir al feed: %s", e)
+                return
+
+    def _run(self):
+        while self.running:
+            self.ws = websocket.WebSocketApp(self.url, on_open=self._on_open, on_message=self._on_message,
+                                             on_error=self._on_error, on_close=self._on_close)
+            self.ws.run_forever()
+            self.connected = False
+            if self.running:
+                time.sleep(self.reconnect_delay)
+
+    def _keepalive(self):
+        # Bitget cierra la conexion si no recibe "ping" en 30 segundos
+        while self.running:
+            time.sleep(self.ping_interval)
+            if self.connected:
+                try:
+                    self.ws.send("ping")
+                except Exception:
+                    pass
+
+    def _on_open(self, ws):
+        self.connected = True
+        with self.lock:
+            args = list(self.subscriptions)
+        self._send_subscribe(args)
+
+    def _on_error(self, ws, error):
+        logger.warning("Error en el feed WebSocket: %s", error)
+
+    def _on_close(self, ws, status_code, msg):
+        self.connected = False
+
+    def _on_message(self, ws, message):
+        if message == "pong":
+            return
+        mensaje = json.loads(message)
+        arg = mensaje.get("arg")
+        datos = mensaje.get("data")
+        if not arg or not datos:
+            return
+        channel = arg.get("channel", "")
+        if channel == "ticker":
+            self._on_ticker(arg, datos)
+        elif channel in GRANULARIDADES:
+            self._on_candles(arg, GRANULARIDADES[channel], datos)
+
+    def _on_ticker(self, arg, datos):
+        product_type = arg["instType"].lower()
+        for ticker in datos:
+            self.book[(ticker.get("instId", arg.get("instId")), product_type)] = {
+                "last": ticker.get("lastPr"),
+                "ask": ticker.get("askPr"),
+                "bid": ticker.get("bidPr"),
+                "ts": ticker.get("ts"),
+            }
+
+    def _on_candles(self, arg, granularity, datos):
+        symbol = arg["instId"]
+        product_type = arg["instType"].lower()
+        key = (symbol, granularity, product_type)
+        filas = sorted((int(v[0]), float(v[1]), float(v[2]), float(v[3]), float(v[4]), float(v[5]), float(v[6]))
+                       for v in datos)
+        if self.candle_cache is not None:
+            self.candle_cache.push_rows(symbol, granularity, product_type, filas)
+
+        cerradas = []
+        with self.candle_closed:
+            anterior = self.last_candle_time.get(key)
+            if anterior is None:
+                # Primer mensaje (snapshot con el historial): solo se toma la vela mas reciente como referencia
+                self.last_candle_time[key] = filas[-1][0]
+                return
+            for fila in filas:
+                if fila[0] > anterior:
+                    cerradas.append(anterior)
+                    anterior = fila[0]
+            self.last_candle_time[key] = anterior
+            if cerradas:
+                self.closed_count[key] = self.closed_count.get(key, 0) + len(cerradas)
+                self.candle_closed.notify_all()
+
+        for tiempo in cerradas:
+            for callback in self.listeners:
+                callback(symbol, granularity, product_type, tiempo)
+
+
+class PrivateFeed(MarketFeed):
+    # Canales privados de cuenta y posiciones. Reutiliza la reconexion y el keepalive del feed publico; al
+    # conectar hace login y, cuando se confirma, se suscribe. Cada actualizacion se entrega a los listeners
+    # como callback(canal, datos) con canal "account" o "positions".
+    def __init__(self, signer, product_type, url=WS_PRIVATE_URL, **kwargs):
+        super().__init__(None, url, **kwargs)
+        self.signer = signer
+        self.inst_type = product_type.upper()
+        self.private_listeners = []
+
+    def add_private_listener(self, callback):
+        self.private_listeners.append(callback)
+
+    def remove_private_listener(self, callback):
+        if callback in self.private_listeners:
+            self.private_listeners.remove(callback)
+
+    def _on_open(self, ws):
+        self.connected = True
+        # El login del WebSocket firma el timestamp en segundos
+        timestamp = str(self.signer.timestamp_ms() // 1000)
+        login = {"op": "login", "args": [{"apiKey": self.signer.api_key, "passphrase": self.signer.passphrase,
+                                           "timestamp": timestamp,
+                                           "sign": self.signer.sign(timestamp + "GET" + "/user/verify")}]}
+        try:
+            ws.send(json.dumps(login))
+        except Exception as e:
+            logger.warning("No se pudo hacer login en el feed privado: %s", e)
+
+    def _suscribir_privados(self):
+        mensaje = {"op": "subscribe",
+                   "args": [{"instType": self.inst_type, "channel": "account", "coin": "default"},
+                            {"instType": self.inst_type, "channel": "positions", "instId": "default"}]}
+        try:
+            self.ws.send(json.dumps(mensaje))
+        except Exception as e:
+            logger.warning("No se pudo suscribir al feed privado: %s", e)
+
+    def _on_message(self, ws, message):
+        if message == "pong":
+            return
+        mensaje = json.loads(message)
+        if mensaje.get("event") == "login":
+            if str(mensaje.get("code")) == "0":
+                self._suscribir_privados()
+            else:
+                logger.warning("Login rechazado en el feed privado: %s", mensaje.get('msg'))
+            return
+        canal = (mensaje.get("arg") or {}).get("channel")
+        datos = mensaje.get("data")
+        if canal not in ("account", "positions") or datos is None:
+            return
+        for callback in list(self.private_listeners):
+            callback(canal, datos)
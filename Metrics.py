@@ -0,0 +1,193 @@
+import cProfile
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+# Limites superiores (segundos) de los buckets de los histogramas: de 1 ms a 30 s
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histograma:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.cuentas = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.cuentas[bisect_left(self.buckets, valor)] += 1
+        self.total += 1
+        self.suma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def percentil(self, p):
+        # Aproximado: limite superior del bucket que contiene el percentil
+        if not self.total:
+            return None
+        objetivo = p / 100 * self.total
+        acumulado = 0
+        for limite, cuenta in zip(self.buckets + (self.maximo,), self.cuentas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        return {"n": self.total, "media": self.suma / self.total if self.total else None,
+                "p50": self.percentil(50), "p99": self.percentil(99), "max": self.maximo}
+
+
+SIN_CRONOMETRAR = nullcontext()
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+class Metricas:
+    # Registro de metricas del proceso: histogramas de tiempos, contadores y valores instantaneos, cada uno con
+    # etiquetas opcionales (endpoint, status, paso...). Es seguro entre hilos y barato de actualizar: todo el
+    # formateo se hace al exportar.
+    def __init__(self):
+        self.lock = Lock()
+        self.histogramas = {}
+        self.contadores = {}
+        self.valores = {}
+        self.servidor = None
+        # Sin activar no se registra nada: Replay las desactiva mientras reproduce, sus tiempos no son los de un bot
+        self.activo = True
+
+    def observar(self, nombre, segundos, **etiquetas):
+        if not self.activo:
+            return
+        clave = _clave(nombre, etiquetas)
+        with self.lock:
+            histograma = self.histogramas.get(clave)
+            if histograma is None:
+                histograma = self.histogramas[clave] = Histograma()
+            histograma.observar(segundos)
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        if not self.activo:
+            return
+        clave = _clave(nombre, etiquetas)
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def fijar(self, nombre, valor, **etiquetas):
+        if not self.activo:
+            return
+        with self.lock:
+            self.valores[_clave(nombre, etiquetas)] = valor
+
+    def cronometrar(self, nombre, **etiquetas):
+        if not self.activo:
+            return SIN_CRONOMETRAR
+        return self._cronometrar(nombre, etiquetas)
+
+    @contextmanager
+    def _cronometrar(self, nombre, etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def reiniciar(self):
+        with self.lock:
+            self.histogramas.clear()
+            self.contadores.clear()
+            self.valores.clear()
+
+    # --- Exportacion ---
+
+    def instantanea(self):
+        with self.lock:
+            return {
+                "histogramas": [{"nombre": n, **dict(e), **h.resumen()} for (n, e), h in self.histogramas.items()],
+                "contadores": [{"nombre": n, **dict(e), "valor": v} for (n, e), v in self.contadores.items()],
+                "valores": [{"nombre": n, **dict(e), "valor": v} for (n, e), v in self.valores.items()],
+            }
+
+    def texto(self):
+        # Formato de exposicion de Prometheus
+        def etiquetas_texto(etiquetas, extra=()):
+            pares = list(etiquetas) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}" if pares else ""
+
+        lineas = []
+        with self.lock:
+            for (nombre, etiquetas), h in sorted(self.histogramas.items()):
+                acumulado = 0
+                for limite, cuenta in zip(h.buckets, h.cuentas):
+                    acumulado += cuenta
+                    le = etiquetas_texto(etiquetas, [("le", limite)])
+                    lineas.append(f"bmsb_{nombre}_segundos_bucket{le} {acumulado}")
+                le = etiquetas_texto(etiquetas, [("le", "+Inf")])
+                lineas.append(f"bmsb_{nombre}_segundos_bucket{le} {h.total}")
+                lineas.append(f"bmsb_{nombre}_segundos_sum{etiquetas_texto(etiquetas)} {h.suma}")
+                lineas.append(f"bmsb_{nombre}_segundos_count{etiquetas_texto(etiquetas)} {h.total}")
+            for (nombre, etiquetas), valor in sorted(self.contadores.items()):
+                lineas.append(f"bmsb_{nombre}_total{etiquetas_texto(etiquetas)} {valor}")
+            for (nombre, etiquetas), valor in sorted(self.valores.items()):
+                lineas.append(f"bmsb_{nombre}{etiquetas_texto(etiquetas)} {valor}")
+        return "\n".join(lineas) + "\n"
+
+    def servir(self, puerto=9108, host="127.0.0.1"):
+        # /metrics en formato Prometheus y /metrics.json con percentiles aproximados
+        metricas = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    cuerpo, tipo = metricas.texto().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    cuerpo, tipo = json.dumps(metricas.instantanea()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self.servidor
+
+    def volcar_periodicamente(self, ruta, intervalo=10.0):
+        # Escribe la instantanea en JSON cada `intervalo` segundos (sustitucion atomica del fichero)
+        def volcar():
+            while True:
+                time.sleep(intervalo)
+                tmp = ruta + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump({"ts": time.time(), **self.instantanea()}, f)
+                os.replace(tmp, ruta)
+
+        Thread(target=volcar, daemon=True).start()
+
+
+metricas = Metricas()
+
+
+@contextmanager
+def perfilar(ruta):
+    # Perfil de cProfile del bloque (solo del hilo que lo ejecuta); se guarda en `ruta` para abrirlo con pstats
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield perfil
+    finally:
+        perfil.disable()
+        perfil.dump_stats(ruta)
@@ -0,0 +1,194 @@
+import json
+import math
+import random
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+
+from CandleCache import granularidad_ms
+from Execution import CuentaSimulada, _error, _ok
+from Resampler import origen_ms
+
+SIMBOLOS_POR_DEFECTO = ("BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT")
+
+
+def contrato_por_precio(simbolo, precio):
+    # Decimales del tamano segun el orden de magnitud del precio, como en los contratos reales
+    volume_place = max(0, min(4, int(math.log10(precio)) - 1))
+    paso = f"{10 ** -volume_place:.{volume_place}f}"
+    return {"symbol": simbolo, "baseCoin": simbolo[:-4], "quoteCoin": simbolo[-4:], "symbolStatus": "normal",
+            "volumePlace": str(volume_place), "pricePlace": "4", "sizeMultiplier": paso, "minTradeNum": paso,
+            "minTradeUSDT": "5"}
+
+
+class MercadoSimulado:
+    # Precios deterministas por simbolo: dos ondas de periodos distintos mas ruido, de modo que el cierre cruza
+    # la BMSB cada pocas decenas de velas. `aceleracion` hace avanzar el tiempo del mercado mas rapido que el
+    # reloj real a partir del arranque (1.0 = tiempo real), para provocar cierres de vela en pocos segundos.
+    def __init__(self, simbolos=SIMBOLOS_POR_DEFECTO, aceleracion=1.0, spread=0.0002):
+        self.simbolos = list(simbolos)
+        self.aceleracion = aceleracion
+        self.spread = spread
+        self.inicio_ms = int(time.time() * 1000)
+
+    def ahora(self):
+        return self.a_simulado(int(time.time() * 1000))
+
+    def a_simulado(self, tiempo_ms):
+        return self.inicio_ms + int((tiempo_ms - self.inicio_ms) * self.aceleracion)
+
+    def precio(self, simbolo, tiempo_ms):
+        semilla = zlib.crc32(simbolo.encode())
+        base = 1 + semilla % 50_000
+        minutos = tiempo_ms / 60_000
+        ruido = ((zlib.crc32(f"{simbolo}{int(minutos)}".encode()) % 2001) - 1000) / 1000
+        return base * (1 + 0.03 * math.sin(minutos / 23.0 + semilla) + 0.01 * math.sin(minutos / 5.3) + 0.002 * ruido)
+
+    def velas(self, simbolo, granularidad, fin_ms, limite, inicio_ms=None):
+        # Velas alineadas como en Bitget: de 6h en adelante en UTC+8 y las semanales en lunes
+        paso = granularidad_ms(granularidad)
+        origen = origen_ms(granularidad) if paso is not None else 0
+        paso = paso or 30 * 86_400_000
+        ahora = self.ahora()
+        fin_ms = min(fin_ms, ahora)
+        ultima = fin_ms - (fin_ms - origen) % paso
+        primera = ultima - (limite - 1) * paso
+        if inicio_ms is not None:
+            primera = max(primera, inicio_ms + (origen - inicio_ms) % paso)
+        filas = []
+        for apertura in range(primera, ultima + 1, paso):
+            cierre_ms = min(apertura + paso, ahora)
+            abre = self.precio(simbolo, apertura)
+            cierra = self.precio(simbolo, cierre_ms)
+            medio = self.precio(simbolo, (apertura + cierre_ms) // 2)
+            alto, bajo = max(abre, cierra, medio), min(abre, cierra, medio)
+            volumen = 1000 + zlib.crc32(f"{simbolo}{apertura}".encode()) % 1000
+            filas.append([str(apertura), f"{abre:.6f}", f"{alto:.6f}", f"{bajo:.6f}", f"{cierra:.6f}",
+                          str(volumen), f"{volumen * cierra:.2f}"])
+        return filas
+
+    def contrato(self, simbolo):
+        return contrato_por_precio(simbolo, 1 + zlib.crc32(simbolo.encode()) % 50_000)
+
+    def ticker(self, simbolo):
+        ahora = self.ahora()
+        ultimo = self.precio(simbolo, ahora)
+        return {"symbol": simbolo, "lastPr": f"{ultimo:.6f}", "askPr": f"{ultimo * (1 + self.spread):.6f}",
+                "bidPr": f"{ultimo * (1 - self.spread):.6f}", "ts": str(ahora)}
+
+
+class ApiSimulada:
+    # Enrutado de los endpoints REST sobre un mercado y una cuenta simulados, sin red. Lo usan MockBitget (detras
+    # de un servidor HTTP) y Replay (llamado directamente como cliente del bot). El mercado tiene que ofrecer
+    # simbolos, a_simulado, velas, ticker y contrato.
+    def __init__(self, mercado, cuenta):
+        self.mercado = mercado
+        self.cuenta = cuenta
+
+    def atender(self, metodo, ruta, params):
+        mercado, cuenta = self.mercado, self.cuenta
+        if ruta == "/api/v2/public/time":
+            return _ok({"serverTime": str(int(time.time() * 1000))})
+        if ruta in ("/api/v2/mix/market/candles", "/api/v2/mix/market/history-candles"):
+            fin = mercado.a_simulado(int(params.get("endTime") or time.time() * 1000))
+            inicio = mercado.a_simulado(int(params["startTime"])) if params.get("startTime") else None
+            limite = min(int(params.get("limit") or 100), 1000 if ruta.endswith("/candles") else 200)
+            return _ok(mercado.velas(params["symbol"], params["granularity"], fin, limite, inicio))
+        if ruta == "/api/v2/mix/market/ticker":
+            return _ok([mercado.ticker(params["symbol"])])
+        if ruta == "/api/v2/mix/market/tickers":
+            return _ok([mercado.ticker(simbolo) for simbolo in mercado.simbolos])
+        if ruta == "/api/v2/mix/market/contracts":
+            return _ok([mercado.contrato(simbolo) for simbolo in mercado.simbolos])
+        respuesta = cuenta.atender(metodo, ruta, params)
+        if respuesta is not None:
+            return respuesta
+        return _error(404, "40404", f"Endpoint no simulado: {metodo} {ruta}")
+
+
+class MockBitget:
+    # Servidor HTTP local que imita los endpoints de Bitget que usa el bot: velas, tickers, contratos, hora del
+    # servidor, cuenta, posiciones, apalancamiento y ordenes. No comprueba firmas. Permite inyectar latencia y errores
+    # para medir el bot sin tocar el exchange real (ver Benchmark.py).
+    def __init__(self, host="127.0.0.1", puerto=0, simbolos=SIMBOLOS_POR_DEFECTO, saldo=10_000.0, latencia=0.0,
+                 jitter=0.0, tasa_error=0.0, tasa_429=0.0, aceleracion=1.0, semilla=0):
+        self.mercado = MercadoSimulado(simbolos, aceleracion)
+        self.cuenta = CuentaSimulada(self.mercado, saldo)
+        self.api = ApiSimulada(self.mercado, self.cuenta)
+        self.latencia = latencia
+        self.jitter = jitter
+        self.tasa_error = tasa_error
+        self.tasa_429 = tasa_429
+        self.random = random.Random(semilla)
+        self.peticiones = 0
+
+        mock = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Cabeceras y cuerpo se escriben por separado; sin esto Nagle + ACK retardado anaden ~40 ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self._responder("GET")
+
+            def do_POST(self):
+                self._responder("POST")
+
+            def _responder(self, metodo):
+                url = urlparse(self.path)
+                params = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+                longitud = int(self.headers.get("Content-Length") or 0)
+                if longitud:
+                    params.update(json.loads(self.rfile.read(longitud)))
+                status, cuerpo = mock.atender(metodo, url.path, params)
+                datos = json.dumps(cuerpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        self.servidor.daemon_threads = True
+        self.url = f"http://{host}:{self.servidor.server_address[1]}"
+
+    def start(self):
+        Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def atender(self, metodo, ruta, params):
+        self.peticiones += 1
+        if self.latencia or self.jitter:
+            time.sleep(self.latencia + self.random.uniform(0, self.jitter))
+        if self.tasa_429 and self.random.random() < self.tasa_429:
+            return _error(429, "429", "Too Many Requests")
+        if self.tasa_error and self.random.random() < self.tasa_error:
+            return _error(500, "50000", "Internal error")
+
+        return self.api.atender(metodo, ruta, params)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API REST de Bitget")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos anadidos a cada respuesta")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="probabilidad de responder 500")
+    parser.add_argument("--aceleracion", type=float, default=1.0)
+    args = parser.parse_args()
+
+    mock = MockBitget(puerto=args.puerto, latencia=args.latencia, tasa_error=args.tasa_error,
+                      aceleracion=args.aceleracion)
+    print(f"Mock de Bitget en {mock.url} (BITGET_BASE_URL={mock.url})")
+    mock.servidor.serve_forever()
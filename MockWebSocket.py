@@ -0,0 +1,188 @@
+import base64
+import hashlib
+import json
+import socketserver
+import struct
+import time
+from threading import Condition, Lock, Thread
+
+# Constante del handshake de RFC 6455
+GUID_WEBSOCKET = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TEXTO, CIERRE, PING, PONG = 0x1, 0x8, 0x9, 0xA
+
+
+def _leer_trama(fichero):
+    # (opcode, datos) de la siguiente trama o (None, None) si la conexion se ha cerrado. Los clientes
+    # siempre enmascaran; no se soportan mensajes fragmentados (websocket-client no los usa para texto corto).
+    cabecera = fichero.read(2)
+    if len(cabecera) < 2:
+        return None, None
+    opcode = cabecera[0] & 0x0F
+    n = cabecera[1] & 0x7F
+    if n == 126:
+        n = struct.unpack(">H", fichero.read(2))[0]
+    elif n == 127:
+        n = struct.unpack(">Q", fichero.read(8))[0]
+    mascara = fichero.read(4) if cabecera[1] & 0x80 else b""
+    datos = fichero.read(n)
+    if mascara:
+        datos = bytes(b ^ mascara[i % 4] for i, b in enumerate(datos))
+    return opcode, datos
+
+
+def _trama(opcode, datos):
+    n = len(datos)
+    if n < 126:
+        cabecera = struct.pack(">BB", 0x80 | opcode, n)
+    elif n < 65536:
+        cabecera = struct.pack(">BBH", 0x80 | opcode, 126, n)
+    else:
+        cabecera = struct.pack(">BBQ", 0x80 | opcode, 127, n)
+    return cabecera + datos
+
+
+class Conexion:
+    def __init__(self, manejador):
+        self.manejador = manejador
+        self.suscripciones = set()  # (instType, channel, instId)
+        self.lock = Lock()
+
+    def enviar(self, texto, opcode=TEXTO):
+        with self.lock:
+            try:
+                self.manejador.wfile.write(_trama(opcode, texto.encode() if isinstance(texto, str) else texto))
+            except OSError:
+                pass
+
+
+class MockWebSocket:
+    # Servidor WebSocket local que imita el feed publico de Bitget (v2): responde "pong" al "ping", confirma las
+    # suscripciones y reenvia a cada conexion los mensajes de velas y tickers de los canales a los que se ha
+    # suscrito, con el mismo formato que el exchange. Las velas y tickers los empuja quien lo usa
+    # (enviar_velas, enviar_ticker), asi los cierres de vela ocurren cuando se quiere y sin esperar al reloj.
+    # Solo usa la libreria estandar.
+    def __init__(self, host="127.0.0.1", puerto=0):
+        mock = self
+        self.conexiones = []
+        self.suscritos = Condition()
+        self.mensajes = 0
+        self.mensajes_suscripcion = []  # numero de canales de cada mensaje de suscripcion recibido
+
+        class Manejador(socketserver.StreamRequestHandler):
+            def handle(self):
+                if not self._handshake():
+                    return
+                conexion = Conexion(self)
+                with mock.suscritos:
+                    mock.conexiones.append(conexion)
+                try:
+                    while True:
+                        opcode, datos = _leer_trama(self.rfile)
+                        if opcode is None:
+                            break
+                        if opcode == CIERRE:
+                            conexion.enviar(datos[:2], CIERRE)
+                            break
+                        if opcode == PING:
+                            conexion.enviar(datos, PONG)
+                        elif opcode == TEXTO:
+                            mock._atender(conexion, datos.decode())
+                finally:
+                    with mock.suscritos:
+                        mock.conexiones.remove(conexion)
+
+            def _handshake(self):
+                cabeceras = {}
+                if not self.rfile.readline():
+                    return False
+                while True:
+                    linea = self.rfile.readline().decode().strip()
+                    if not linea:
+                        break
+                    clave, _, valor = linea.partition(":")
+                    cabeceras[clave.strip().lower()] = valor.strip()
+                clave = cabeceras.get("sec-websocket-key")
+                if clave is None:
+                    return False
+                aceptar = base64.b64encode(hashlib.sha1((clave + GUID_WEBSOCKET).encode()).digest()).decode()
+                self.wfile.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                                  f"Sec-WebSocket-Accept: {aceptar}\r\n\r\n").encode())
+                return True
+
+        self.servidor = socketserver.ThreadingTCPServer((host, puerto), Manejador)
+        self.servidor.daemon_threads = True
+        self.url = f"ws://{host}:{self.servidor.server_address[1]}"
+
+    def start(self):
+        Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.cerrar_conexiones()
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def cerrar_conexiones(self):
+        # Corta todas las conexiones como haria el exchange (p. ej. para probar la reconexion)
+        with self.suscritos:
+            conexiones = list(self.conexiones)
+        for conexion in conexiones:
+            conexion.enviar(struct.pack(">H", 1000), CIERRE)
+            try:
+                conexion.manejador.connection.shutdown(2)
+            except OSError:
+                pass
+
+    def esperar_suscripcion(self, inst_type, channel, inst_id, timeout=5.0):
+        # True cuando alguna conexion abierta esta suscrita al canal
+        arg = (inst_type.upper(), channel, inst_id)
+        with self.suscritos:
+            return self.suscritos.wait_for(
+                lambda: any(arg in conexion.suscripciones for conexion in self.conexiones), timeout)
+
+    def _atender(self, conexion, texto):
+        if texto == "ping":
+            conexion.enviar("pong")
+            return
+        mensaje = json.loads(texto)
+        if mensaje.get("op") != "subscribe":
+            return
+        self.mensajes_suscripcion.append(len(mensaje.get("args", [])))
+        for arg in mensaje.get("args", []):
+            with self.suscritos:
+                conexion.suscripciones.add((arg["instType"], arg["channel"], arg["instId"]))
+                self.suscritos.notify_all()
+            conexion.enviar(json.dumps({"event": "subscribe", "arg": arg}))
+
+    def _publicar(self, inst_type, channel, inst_id, accion, datos):
+        arg = {"instType": inst_type.upper(), "channel": channel, "instId": inst_id}
+        texto = json.dumps({"action": accion, "arg": arg, "data": datos, "ts": int(time.time() * 1000)})
+        clave = (arg["instType"], channel, inst_id)
+        with self.suscritos:
+            destinos = [conexion for conexion in self.conexiones if clave in conexion.suscripciones]
+        for conexion in destinos:
+            conexion.enviar(texto)
+        self.mensajes += len(destinos)
+        return len(destinos)
+
+    def enviar_velas(self, symbol, channel, product_type, filas, accion="update"):
+        # filas: tuplas (time, entry, high, low, close, volume_base, volume_quote); como en Bitget van en texto
+        datos = [[str(int(fila[0]))] + [str(valor) for valor in fila[1:7]] for fila in filas]
+        return self._publicar(product_type, channel, symbol, accion, datos)
+
+    def enviar_ticker(self, symbol, product_type, last, ask, bid):
+        datos = [{"instId": symbol, "lastPr": str(last), "askPr": str(ask), "bidPr": str(bid),
+                  "ts": str(int(time.time() * 1000))}]
+        return self._publicar(product_type, "ticker", symbol, "snapshot", datos)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor local que imita el feed WebSocket publico de Bitget")
+    parser.add_argument("--puerto", type=int, default=8766)
+    args = parser.parse_args()
+
+    mock = MockWebSocket(puerto=args.puerto)
+    print(f"Mock del feed de Bitget en {mock.url} (MarketFeed(url=...))")
+    mock.servidor.serve_forever()
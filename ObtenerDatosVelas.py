@@ -1,6 +1,161 @@
-import pandas as pd
-import requests
+import logging
 import time
-import talib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from BitgetClient import default_client, leer_json
+from CandleCache import CANDLE_COLUMNS, granularidad_ms
+from CandleStore import CandleStore, DIRECTORIO_DATOS
+from Resampler import origen_ms
+
+logger = logging.getLogger(__name__)
+
+# /history-candles devuelve como maximo 200 velas por peticion y acepta rangos de hasta 90 dias
+HISTORY_ENDPOINT = "/api/v2/mix/market/history-candles"
+LIMITE_PAGINA = 200
+RANGO_MAXIMO_MS = 90 * 86_400_000
+
+
+def _pedir_pagina(symbol, granularity, product_type, inicio, fin, client):
+    params = {
+        'symbol': symbol,
+        'granularity': granularity,
+        'productType': product_type,
+        'startTime': str(inicio),
+        'endTime': str(fin),
+        'limit': LIMITE_PAGINA,
+    }
+    response = client.get(HISTORY_ENDPOINT, params=params)
+    if response is None or response.status_code != 200:
+        if response is not None:
+            logger.warning("Error: %s - %s", response.status_code, response.text)
+        return None
+    data = leer_json(response).get('data') or []
+    if not data:
+        return np.empty((0, len(CANDLE_COLUMNS)), dtype=np.float64)
+    return np.array(data, dtype=np.float64)[:, :len(CANDLE_COLUMNS)]
+
+
+def descargar_velas(symbol, granularity, desde, hasta=None, product_type="usdt-futures", raiz=DIRECTORIO_DATOS,
+                    max_workers=8, paginas_por_lote=40, client=None):
+    # Descarga [desde, hasta) (ms) recorriendo endTime hacia atras. Cada lote de paginas se pide en paralelo
+    # (el cliente aplica el limite de peticiones) y se guarda en el CandleStore al terminar, de modo que una
+    # descarga interrumpida continua donde se quedo: estado.json guarda el rango cubierto sin huecos.
+    client = client or default_client
+    paso = granularidad_ms(granularity)
+    if paso is None:
+        raise ValueError(f"Granularidad no soportada para descargas paginadas: {granularity}")
+    # Solo se guardan velas cerradas: `hasta` se lleva al inicio de la vela en formacion. Las velas de 6h o mas
+    # no empiezan en multiplos de UTC (Bitget las abre en UTC+8 y las semanales en lunes), por eso se alinea
+    # con el mismo origen que usa el Resampler.
+    ahora = int(time.time() * 1000)
+    hasta = min(hasta or ahora, ahora)
+    origen = origen_ms(granularity)
+    hasta -= (hasta - origen) % paso
+    store = CandleStore(symbol, granularity, product_type, raiz)
+    if not store.bloquear_escritura():
+        raise RuntimeError(f"Otro proceso esta escribiendo las velas de {symbol} {granularity}")
+    try:
+        estado = store.leer_estado()
+
+        # Rangos pendientes. Hacia delante se recorre de lo mas antiguo a lo mas reciente y hacia atras al
+        # reves, asi el rango cubierto en estado.json crece pagina a pagina sin dejar huecos.
+        pendientes = []
+        if estado:
+            # Las descargas anteriores a la alineacion pudieron dejar guardada como cerrada la vela que estaba en
+            # formacion: se vuelve a pedir desde su inicio y el merge la sustituye
+            reanudar = estado["hasta"] - (estado["hasta"] - origen) % paso
+            if hasta > reanudar:
+                pendientes.append(("adelante", reanudar, hasta))
+            if desde < estado["desde"] and not estado.get("inicio_listado", False):
+                pendientes.append(("atras", desde, estado["desde"]))
+        else:
+            estado = {"desde": hasta, "hasta": hasta}
+            pendientes.append(("atras", desde, hasta))
+
+        ancho_pagina = min(LIMITE_PAGINA * paso, RANGO_MAXIMO_MS - RANGO_MAXIMO_MS % paso)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for direccion, inicio_rango, fin_rango in pendientes:
+                paginas = []
+                fin = fin_rango
+                while fin > inicio_rango:
+                    paginas.append((max(inicio_rango, fin - ancho_pagina), fin))
+                    fin -= ancho_pagina
+                if direccion == "adelante":
+                    paginas.reverse()
+
+                for i in range(0, len(paginas), paginas_por_lote):
+                    lote = paginas[i:i + paginas_por_lote]
+                    resultados = list(executor.map(
+                        lambda pagina: _pedir_pagina(symbol, granularity, product_type, pagina[0], pagina[1] - 1,
+                                                     client),
+                        lote))
+
+                    recibidas = []
+                    fallo = False
+                    for (inicio, fin), resultado in zip(lote, resultados):
+                        if resultado is None:
+                            fallo = True
+                            break
+                        recibidas.append(resultado)
+                        if direccion == "adelante":
+                            estado["hasta"] = fin
+                        else:
+                            estado["desde"] = inicio
+                            if not len(resultado):
+                                # Pagina vacia hacia atras: se ha llegado al inicio del listado del contrato
+                                estado["inicio_listado"] = True
+                                break
+
+                    if recibidas:
+                        nuevas = np.concatenate(recibidas)
+                        _, indices = np.unique(nuevas[:, 0], return_index=True)
+                        store.merge(nuevas[indices])
+                    store.guardar_estado(estado)
+                    if fallo:
+                        raise RuntimeError(f"Descarga interrumpida en {symbol} {granularity}; "
+                                           "se reanudara al repetirla")
+                    if estado.get("inicio_listado") and direccion == "atras":
+                        break
+    finally:
+        store.liberar_escritura()
+    return cargar_velas(symbol, granularity, product_type, raiz)
+
+
+def cargar_velas(symbol, granularity, product_type="usdt-futures", raiz=DIRECTORIO_DATOS, columnas=None):
+    # Devuelve {columna: array} con vistas np.memmap sobre el CandleStore (no se copian a memoria)
+    store = CandleStore(symbol, granularity, product_type, raiz)
+    if not store.existe():
+        return None
+    velas = store.velas()
+    return {columna: velas[columna] for columna in (columnas or CANDLE_COLUMNS)}
+
+
+def cargar_dataframe(symbol, granularity, product_type="usdt-futures", raiz=DIRECTORIO_DATOS):
+    velas = cargar_velas(symbol, granularity, product_type, raiz)
+    if velas is None:
+        return None
+    df = pd.DataFrame({columna: velas[columna] for columna in CANDLE_COLUMNS[1:]},
+                      index=pd.to_datetime(velas['time'], unit='ms'))
+    df.index.name = 'time'
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="Descarga historica de velas de Bitget a disco")
+    parser.add_argument("simbolos", nargs="+")
+    parser.add_argument("--granularidad", default="1m")
+    parser.add_argument("--dias", type=float, default=30)
+    parser.add_argument("--product-type", default="usdt-futures")
+    parser.add_argument("--raiz", default=DIRECTORIO_DATOS)
+    args = parser.parse_args()
 
+    desde = int((time.time() - args.dias * 86400) * 1000)
+    for simbolo in args.simbolos:
+        inicio = time.perf_counter()
+        velas = descargar_velas(simbolo, args.granularidad, desde, product_type=args.product_type, raiz=args.raiz)
+        print(f"{simbolo}: {len(velas['time'])} velas en disco ({time.perf_counter() - inicio:.1f}s)")
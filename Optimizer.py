@@ -0,0 +1,130 @@
+import itertools
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from Backtest import backtest, TAKER_FEE
+from BMSBIndicators import bmsb_cross_arrays
+
+# Velas compartidas con los procesos del pool: granularidad -> (entry, close) como vistas sobre la memoria compartida
+_historiales = {}
+_bloques = []
+
+
+def _adjuntar_historiales(descriptores):
+    # Inicializador de cada proceso: se adjunta una sola vez a los bloques de memoria compartida en lugar
+    # de recibir las velas serializadas con cada tarea. El proceso principal crea los bloques y es el unico que
+    # los borra (unlink en optimizar); los workers solo los abren.
+    for granularidad, (nombre, n) in descriptores.items():
+        bloque = _abrir_bloque(nombre)
+        _bloques.append(bloque)
+        velas = np.ndarray((2, n), dtype=np.float64, buffer=bloque.buf)
+        _historiales[granularidad] = (velas[0], velas[1])
+
+
+def _abrir_bloque(nombre):
+    # Desde Python 3.13 se puede abrir sin registrarlo en el resource_tracker. En versiones anteriores el registro
+    # va al tracker del proceso principal, que los workers heredan con fork, spawn y forkserver: ya lo tenia
+    # registrado al crearlo y lo quita el unlink, asi que no queda nada que limpiar al terminar los workers.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    return shared_memory.SharedMemory(name=nombre)
+
+
+def _evaluar(tarea):
+    # Una tarea agrupa todas las combinaciones con la misma granularidad y periodos, asi las senales se
+    # calculan una sola vez y solo se repite la simulacion de la ejecucion
+    (granularidad, sma_periodo, ema_periodo), variantes, capital, fee, leverage = tarea
+    entry, close = _historiales[granularidad]
+    senales = bmsb_cross_arrays(close, sma_periodo, ema_periodo)
+    filas = []
+    for pyramiding, ordersize in variantes:
+        resultado = backtest(close, entry=entry, sma_periodo=sma_periodo, ema_periodo=ema_periodo,
+                             ordersize=ordersize, pyramiding=pyramiding, leverage=leverage, capital=capital, fee=fee,
+                             senales=senales)
+        fila = {"granularidad": granularidad, "sma_periodo": sma_periodo, "ema_periodo": ema_periodo,
+                "pyramiding": pyramiding, "ordersize": ordersize}
+        fila.update(resultado.resumen())
+        filas.append(fila)
+    return filas
+
+
+def combinaciones(granularidades, sma_periodos, ema_periodos, pyramidings=(1,), ordersizes=(50,), muestras=None,
+                  semilla=None):
+    # Rejilla completa o, con `muestras`, una busqueda aleatoria sobre la misma rejilla. El apalancamiento no forma
+    # parte de ella: Backtest no modela liquidaciones y el apalancamiento solo cambia el margen bloqueado, asi que
+    # barrerlo repetiria las mismas simulaciones; se fija para todo el barrido en optimizar.
+    rejilla = list(itertools.product(granularidades, sma_periodos, ema_periodos, pyramidings, ordersizes))
+    if muestras is not None and muestras < len(rejilla):
+        rejilla = random.Random(semilla).sample(rejilla, muestras)
+    return rejilla
+
+
+def optimizar(historiales, rejilla, capital=1000.0, fee=TAKER_FEE, orden="retorno_%", max_workers=None, leverage=1):
+    # historiales: granularidad -> (entry, close) con arrays del mismo tamano. Devuelve un DataFrame con una
+    # fila por combinacion ordenado de mejor a peor segun `orden`.
+    bloques = []
+    descriptores = {}
+    try:
+        for granularidad, (entry, close) in historiales.items():
+            n = len(close)
+            bloque = shared_memory.SharedMemory(create=True, size=max(2 * n * 8, 1))
+            bloques.append(bloque)
+            velas = np.ndarray((2, n), dtype=np.float64, buffer=bloque.buf)
+            velas[0] = entry
+            velas[1] = close
+            del velas
+            descriptores[granularidad] = (bloque.name, n)
+
+        grupos = {}
+        for granularidad, sma_periodo, ema_periodo, pyramiding, ordersize in rejilla:
+            grupos.setdefault((granularidad, sma_periodo, ema_periodo), []).append((pyramiding, ordersize))
+        tareas = [(clave, variantes, capital, fee, leverage) for clave, variantes in grupos.items()]
+
+        max_workers = max_workers or os.cpu_count()
+        chunksize = max(1, len(tareas) // (max_workers * 8))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_adjuntar_historiales,
+                                 initargs=(descriptores,)) as executor:
+            filas = [fila for bloque in executor.map(_evaluar, tareas, chunksize=chunksize) for fila in bloque]
+    finally:
+        for bloque in bloques:
+            bloque.close()
+            bloque.unlink()
+
+    resultados = pd.DataFrame(filas)
+    if len(resultados):
+        resultados = resultados.sort_values(orden, ascending=False, ignore_index=True)
+    return resultados
+
+
+if __name__ == "__main__":
+    import argparse
+    from ObtenerDatosVelas import cargar_velas, DIRECTORIO_DATOS
+
+    parser = argparse.ArgumentParser(description="Barrido de parametros de la BMSB sobre velas en disco")
+    parser.add_argument("simbolo")
+    parser.add_argument("--granularidades", nargs="+", default=["1m", "5m", "15m", "1h"])
+    parser.add_argument("--sma", nargs=3, type=int, default=[10, 60, 5], metavar=("DESDE", "HASTA", "PASO"))
+    parser.add_argument("--ema", nargs=3, type=int, default=[10, 60, 5], metavar=("DESDE", "HASTA", "PASO"))
+    parser.add_argument("--apalancamiento", type=float, default=1)
+    parser.add_argument("--pyramiding", nargs="+", type=int, default=[1])
+    parser.add_argument("--muestras", type=int, default=None, help="busqueda aleatoria con N combinaciones")
+    parser.add_argument("--product-type", default="usdt-futures")
+    parser.add_argument("--raiz", default=DIRECTORIO_DATOS)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    historiales = {}
+    for granularidad in args.granularidades:
+        velas = cargar_velas(args.simbolo, granularidad, args.product_type, args.raiz, columnas=["entry", "close"])
+        if velas is not None:
+            historiales[granularidad] = (velas["entry"], velas["close"])
+    rejilla = combinaciones(list(historiales), range(*args.sma), range(*args.ema), args.pyramiding,
+                            muestras=args.muestras)
+    resultados = optimizar(historiales, rejilla, leverage=args.apalancamiento)
+    print(resultados.head(args.top).to_string())
@@ -0,0 +1,206 @@
+import queue
+import time
+import uuid
+from collections import deque
+from threading import Condition, Thread, Lock, Event
+
+from Metrics import metricas
+
+# Codigos de place-order que indican que el tamano no cabe en el margen disponible: se reintenta con menos
+CODIGOS_REDUCIR_TAMANO = {"40762", "43012"}
+CODIGO_OK = "00000"
+
+
+class Orden:
+    # Una orden de mercado encolada. El clientOid se genera una vez y se mantiene en todos los reintentos,
+    # asi el exchange rechaza un duplicado si un intento anterior llego a ejecutarse sin que viesemos la respuesta.
+    def __init__(self, params, vigente=None, precio=None):
+        self.params = dict(params)
+        self.precio = precio  # precio de referencia con el que se calculo el tamano
+        self.client_oid = "bmsb" + uuid.uuid4().hex[:28]
+        self.params["clientOid"] = self.client_oid
+        self.vigente = vigente
+        self.estado = "pendiente"  # pendiente, ejecutada, fallida o cancelada
+        self.intentos = 0
+        self.order_id = None
+        self.error = None
+        self.encolada = time.perf_counter()
+        self.latencia = None  # segundos desde que se encolo hasta la respuesta definitiva
+        self.terminada = Event()
+
+    @property
+    def size(self):
+        return self.params["size"]
+
+    @property
+    def side(self):
+        return self.params["side"]
+
+
+def _leer_respuesta(response):
+    # (codigo, datos, mensaje). El codigo es None si no se sabe si la orden llego a procesarse
+    # (sin respuesta o error 5xx) y "429" si se supero el limite de peticiones.
+    if response is None:
+        return None, None, "sin respuesta"
+    if response.status_code >= 500:
+        return None, None, f"HTTP {response.status_code}"
+    if response.status_code == 429:
+        return "429", None, "limite de peticiones"
+    try:
+        cuerpo = response.json()
+    except ValueError:
+        return str(response.status_code), None, response.text
+    return str(cuerpo.get("code")), cuerpo.get("data"), cuerpo.get("msg")
+
+
+class OrderPipeline:
+    # Ejecuta las ordenes de un bot de una en una en un unico hilo. Sustituye al hilo por orden que reintentaba
+    # place-order sin pausa: los reintentos estan acotados, esperan con backoff exponencial y solo reducen el
+    # tamano cuando el exchange responde que no hay margen suficiente.
+    #
+    # enviar(params) -> requests.Response o None: firma y envia place-order.
+    # consultar(client_oid) -> datos de la orden o None: se usa cuando no se sabe si un intento se ejecuto.
+    # al_ejecutar(orden) / al_fallar(orden): se llaman desde el hilo del pipeline al terminar cada orden.
+    # redondear(size, precio) -> size: ajusta el tamano reducido al paso del contrato (0 si no llega al minimo).
+    # Con `sincrono` cada orden se ejecuta en el hilo que la envia, sin hilo propio (Replay: el reloj simulado no
+    # avanza hasta que terminan, asi que el hilo solo anadiria el coste de pasarle cada orden).
+    def __init__(self, enviar, consultar=None, al_ejecutar=None, al_fallar=None, log=None, max_intentos=5,
+                 backoff=0.25, backoff_max=4.0, reduccion=0.05, redondear=None, sincrono=False):
+        self.enviar = enviar
+        self.consultar = consultar
+        self.al_ejecutar = al_ejecutar
+        self.al_fallar = al_fallar
+        self.log = log or (lambda texto: None)
+        self.max_intentos = max_intentos
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.reduccion = reduccion
+        self.redondear = redondear or (lambda size, precio: size)
+        self.sincrono = sincrono
+
+        self.cola = queue.Queue()
+        self.lock = Lock()
+        self.inactivo = Condition(self.lock)
+        self.en_curso = 0
+        self.ejecutadas = 0
+        self.fallidas = 0
+        self.latencias = deque(maxlen=1000)
+        self.hilo = None
+
+    def enviar_orden(self, params, vigente=None, precio=None):
+        # Encola la orden y vuelve enseguida. `vigente()` se comprueba antes de cada intento para abandonar
+        # la orden si la senal que la origino ya no esta activa.
+        orden = Orden(params, vigente, precio)
+        with self.lock:
+            self.en_curso += 1
+        if self.sincrono:
+            self._procesar(orden)
+            return orden
+        with self.lock:
+            if self.hilo is None or not self.hilo.is_alive():
+                self.hilo = Thread(target=self._trabajar, daemon=True)
+                self.hilo.start()
+        self.cola.put(orden)
+        return orden
+
+    def ocupado(self):
+        with self.lock:
+            return self.en_curso > 0
+
+    def esperar_inactivo(self, timeout=None):
+        # Bloquea hasta que no quede ninguna orden encolada ni en curso (Replay no avanza el reloj simulado con
+        # ordenes pendientes, como en vivo, donde se ejecutan mucho antes de la siguiente evaluacion)
+        with self.inactivo:
+            return self.inactivo.wait_for(lambda: self.en_curso == 0, timeout)
+
+    def detener(self):
+        # Las ordenes ya encoladas se procesan antes de que el hilo termine
+        with self.lock:
+            if self.hilo is not None:
+                self.cola.put(None)
+                self.hilo = None
+
+    def _trabajar(self):
+        while True:
+            orden = self.cola.get()
+            if orden is None:
+                return
+            self._procesar(orden)
+
+    def _procesar(self, orden):
+        try:
+            self._ejecutar(orden)
+        except Exception as e:
+            orden.estado = "fallida"
+            orden.error = str(e)
+        orden.latencia = time.perf_counter() - orden.encolada
+        with self.lock:
+            if orden.estado == "ejecutada":
+                self.ejecutadas += 1
+                self.latencias.append(orden.latencia)
+            elif orden.estado == "fallida":
+                self.fallidas += 1
+        metricas.observar("orden_latencia", orden.latencia, estado=orden.estado)
+        metricas.incrementar("ordenes", estado=orden.estado)
+        self._registrar(orden)
+        if orden.estado == "fallida" and self.al_fallar is not None:
+            self.al_fallar(orden)
+        # La orden deja de contar como en curso cuando ya se han aplicado sus efectos
+        with self.lock:
+            self.en_curso -= 1
+            self.inactivo.notify_all()
+        orden.terminada.set()
+
+    def _ejecutar(self, orden):
+        espera = self.backoff
+        while orden.intentos < self.max_intentos:
+            if orden.vigente is not None and not orden.vigente():
+                orden.estado = "cancelada"
+                return
+            orden.intentos += 1
+            with metricas.cronometrar("etapa", etapa="orden_post"):
+                response = self.enviar(orden.params)
+            codigo, datos, mensaje = _leer_respuesta(response)
+
+            if codigo == CODIGO_OK:
+                self._confirmar(orden, datos)
+                return
+            orden.error = f"{codigo}: {mensaje}"
+            if codigo is None:
+                # No sabemos si la orden se ejecuto: se consulta por clientOid antes de repetirla
+                datos = self.consultar(orden.client_oid) if self.consultar is not None else None
+                if datos:
+                    self._confirmar(orden, datos)
+                    return
+            elif codigo in CODIGOS_REDUCIR_TAMANO:
+                size = self.redondear(orden.size * (1 - self.reduccion), orden.precio)
+                if size <= 0:
+                    orden.estado = "fallida"
+                    return
+                orden.params["size"] = size
+                self.log(f"Margen insuficiente, se reintenta con tamaño {orden.size}\n")
+                continue
+            elif codigo != "429":
+                # Errores de validacion: repetir la misma orden no va a cambiar el resultado
+                orden.estado = "fallida"
+                return
+            time.sleep(espera)
+            espera = min(espera * 2, self.backoff_max)
+        orden.estado = "fallida"
+
+    def _confirmar(self, orden, datos):
+        orden.estado = "ejecutada"
+        orden.error = None
+        if isinstance(datos, dict):
+            orden.order_id = datos.get("orderId")
+        if self.al_ejecutar is not None:
+            self.al_ejecutar(orden)
+
+    def _registrar(self, orden):
+        if orden.estado == "ejecutada":
+            self.log(f"Orden procesada exitosamente ({orden.side} {orden.size}, {orden.intentos} intentos, "
+                     f"latencia {orden.latencia * 1000:.0f} ms)\n")
+        elif orden.estado == "cancelada":
+            self.log(f"Orden {orden.side} cancelada: la senal ya no esta activa\n")
+        else:
+            self.log(f"Orden {orden.side} no realizada tras {orden.intentos} intentos ({orden.error})\n")
@@ -0,0 +1,157 @@
+import time
+from threading import Lock
+
+LADOS = ("long", "short")
+
+
+class PositionTracker:
+    # Saldo y posiciones de un simbolo en memoria. Se actualiza con las respuestas de las ordenes del propio
+    # bot (o con los canales privados del WebSocket) y solo se reconcilia con la API REST cada
+    # `intervalo_reconciliacion` segundos o cuando algo no cuadra: una orden rechazada o un cierre sin posicion
+    # cuando se esperaba una. Un cierre correcto libera margen con PnL desconocido, pero el exchange acaba de
+    # confirmar la posicion (el lado queda plano): entonces solo se vuelve a pedir el saldo. El saldo y las
+    # posiciones caducan por separado.
+    #
+    # pedir_cuenta() -> datos de /account/account o None
+    # pedir_posiciones() -> lista de posiciones de /position/single-position o None
+    def __init__(self, simbolo, margin_coin, pedir_cuenta, pedir_posiciones=None, intervalo_reconciliacion=60.0,
+                 reloj=time.monotonic):
+        self.simbolo = simbolo
+        self.reloj = reloj
+        self.margin_coin = margin_coin
+        self.pedir_cuenta = pedir_cuenta
+        self.pedir_posiciones = pedir_posiciones
+        self.intervalo_reconciliacion = intervalo_reconciliacion
+
+        self.lock = Lock()
+        self.available = None
+        self.ordenes = {lado: 0 for lado in LADOS}
+        self.tamano = {lado: 0.0 for lado in LADOS}
+        self.actualizado = 0.0  # ultimo saldo conocido
+        self.posiciones_actualizadas = 0.0
+        self.desincronizado = True
+        self.saldo_caducado = False
+        self.posiciones_conocidas = False
+        self.reconciliaciones = 0
+
+    # --- Consultas ---
+
+    def disponible(self):
+        # Margen disponible; solo hace peticiones si el estado local esta caducado o marcado como dudoso
+        with self.lock:
+            ahora = self.reloj()
+            caducado = self.desincronizado or ahora - self.posiciones_actualizadas > self.intervalo_reconciliacion
+            saldo_caducado = self.saldo_caducado or ahora - self.actualizado > self.intervalo_reconciliacion
+        if caducado:
+            self.reconciliar()
+        elif saldo_caducado:
+            self.refrescar_saldo()
+        with self.lock:
+            return self.available
+
+    def ordenes_abiertas(self, lado):
+        with self.lock:
+            return self.ordenes[lado]
+
+    def sin_posicion_confirmada(self, lado):
+        # True solo si el estado esta reconciliado y no hay posicion en `lado`: entonces no hace falta cerrarla
+        with self.lock:
+            return (self.posiciones_conocidas and not self.desincronizado and self.ordenes[lado] == 0
+                    and self.tamano[lado] == 0)
+
+    def total_ordenes(self):
+        with self.lock:
+            return sum(self.ordenes.values())
+
+    # --- Reconciliacion con la API REST ---
+
+    def reconciliar(self):
+        cuenta = self.pedir_cuenta()
+        if cuenta is None:
+            return None
+        posiciones = self.pedir_posiciones() if self.pedir_posiciones is not None else None
+        with self.lock:
+            self.available = float(cuenta['available'])
+            self.posiciones_conocidas = posiciones is not None
+            if posiciones is not None:
+                self._aplicar_posiciones(posiciones)
+            self.actualizado = self.posiciones_actualizadas = self.reloj()
+            self.desincronizado = False
+            self.saldo_caducado = False
+            self.reconciliaciones += 1
+        return cuenta
+
+    def refrescar_saldo(self):
+        # Solo /account/account: las posiciones en memoria siguen siendo validas
+        cuenta = self.pedir_cuenta()
+        if cuenta is None:
+            return None
+        with self.lock:
+            self.available = float(cuenta['available'])
+            self.actualizado = self.reloj()
+            self.saldo_caducado = False
+        return cuenta
+
+    def _aplicar_posiciones(self, posiciones):
+        totales = {lado: 0.0 for lado in LADOS}
+        for posicion in posiciones:
+            if posicion.get('symbol', posicion.get('instId')) == self.simbolo and posicion.get('holdSide') in totales:
+                totales[posicion['holdSide']] += float(posicion.get('total') or 0)
+        for lado in LADOS:
+            self.tamano[lado] = totales[lado]
+            if totales[lado] == 0:
+                self.ordenes[lado] = 0
+            elif self.ordenes[lado] == 0:
+                # Hay una posicion abierta fuera del bot (o de una sesion anterior): cuenta como una orden
+                self.ordenes[lado] = 1
+
+    # --- Eventos del bot ---
+
+    def aplicar_apertura(self, lado, tamano, precio=None, apalancamiento=1):
+        with self.lock:
+            self.ordenes[lado] += 1
+            self.tamano[lado] += tamano
+            if precio is not None and self.available is not None:
+                self.available = max(0.0, self.available - tamano * float(precio) / float(apalancamiento))
+            else:
+                self.desincronizado = True
+
+    def aplicar_cierre(self, lado):
+        # El margen liberado incluye el PnL, que no conocemos: el saldo se vuelve a pedir en la siguiente consulta.
+        # El lado queda plano, asi que las posiciones no hace falta pedirlas.
+        with self.lock:
+            self.ordenes[lado] = 0
+            self.tamano[lado] = 0.0
+            self.saldo_caducado = True
+            self.posiciones_actualizadas = self.reloj()
+
+    def sin_posicion(self, lado):
+        # El exchange dice que no hay posicion en `lado`
+        with self.lock:
+            if self.ordenes[lado]:
+                self.desincronizado = True
+            self.ordenes[lado] = 0
+            self.tamano[lado] = 0.0
+
+    def marcar_desincronizado(self):
+        with self.lock:
+            self.desincronizado = True
+
+    # --- Canales privados del WebSocket ---
+
+    def al_mensaje_privado(self, canal, datos):
+        with self.lock:
+            if canal == "account":
+                for cuenta in datos:
+                    if cuenta.get('marginCoin', '').upper() == self.margin_coin:
+                        self.available = float(cuenta['available'])
+                        # El saldo no dice nada de las posiciones: solo un mensaje de posiciones o una reconciliacion
+                        # quitan la marca de desincronizado
+                        self.actualizado = self.reloj()
+                        self.saldo_caducado = False
+            elif canal == "positions":
+                # Cada mensaje trae todas las posiciones abiertas del tipo de producto
+                self._aplicar_posiciones(datos)
+                self.posiciones_conocidas = True
+                self.posiciones_actualizadas = self.reloj()
+                self.desincronizado = False
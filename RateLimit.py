@@ -0,0 +1,31 @@
+import time
+from threading import Lock
+
+
+class TokenBucket:
+    # Limitador de peticiones: `rate` tokens por segundo con una rafaga maxima de `capacity`
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                espera = (tokens - self.tokens) / self.rate
+            time.sleep(espera)
+
+    def available(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
@@ -0,0 +1,273 @@
+import bisect
+import json
+import time
+from urllib.parse import parse_qs
+
+from CandleCache import granularidad_ms
+from ContractCache import ContractCache
+from Execution import CuentaSimulada, EjecucionPapel, RespuestaSimulada
+from LogSinks import NullSink, StreamSink
+from Metrics import metricas
+from MockBitget import ApiSimulada, contrato_por_precio
+from Resampler import Resampler
+from TradingBot import TradingBot
+
+
+class SimClock:
+    # Reloj simulado con la misma interfaz que el modulo time (time, monotonic, sleep). `sleep` adelanta el
+    # reloj sin esperar; antes de avanzar llama a `antes_de_avanzar` (p. ej. esperar a que terminen las ordenes
+    # en curso) y al llegar a `fin` llama a `al_terminar`.
+    def __init__(self, inicio, fin=None):
+        self.ahora = float(inicio)
+        self.fin = fin
+        self.antes_de_avanzar = []
+        self.al_terminar = []
+
+    def time(self):
+        return self.ahora
+
+    def monotonic(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        for funcion in self.antes_de_avanzar:
+            funcion()
+        self.ahora += max(0.0, segundos)
+        if self.fin is not None and self.ahora >= self.fin:
+            for funcion in self.al_terminar:
+                funcion()
+
+
+class MercadoGrabado:
+    # Velas grabadas de un simbolo vistas desde el reloj simulado: solo son visibles las velas cerradas antes
+    # del instante actual. De la vela en formacion solo se conoce la apertura, que tambien hace de precio del
+    # ticker si no se graban tickers (mismo precio de entrada que usa Backtest). `tickers` son tuplas
+    # (ts_ms, last, ask, bid) en orden. Las granularidades de `confirmacion` se forman agregando las velas grabadas,
+    # con el mismo origen que usa el exchange.
+    def __init__(self, simbolo, granularidad, filas, reloj, tickers=None, spread=0.0, contrato=None, max_velas=500,
+                 confirmacion=()):
+        self.simbolo = simbolo
+        self.simbolos = [simbolo]
+        self.granularidad = granularidad
+        self.paso = granularidad_ms(granularidad)
+        if self.paso is None:
+            raise ValueError(f"Granularidad no soportada en Replay: {granularidad}")
+        self.filas = filas
+        self.tiempos = [fila[0] for fila in filas]
+        self.reloj = reloj
+        self.tickers = tickers
+        self.tiempos_tickers = [ticker[0] for ticker in tickers] if tickers else None
+        self.spread = spread
+        self._contrato = contrato or contrato_por_precio(simbolo, filas[0][4])
+        self.max_velas = max_velas
+        self.agregadas = {}
+        for mayor in confirmacion:
+            resampler = Resampler([mayor], granularidad, max_velas=len(filas))
+            resampler.actualizar(filas)
+            marco = resampler.marcos[mayor]
+            self.agregadas[mayor] = (marco, list(marco.cerradas), [vela[0] for vela in marco.cerradas])
+
+    def ahora(self):
+        return int(self.reloj.time() * 1000)
+
+    def a_simulado(self, tiempo_ms):
+        # Las peticiones llevan la hora real; el mercado grabado nunca enseña nada posterior al reloj simulado
+        return min(tiempo_ms, self.ahora())
+
+    def _cerradas(self, ahora_ms):
+        # Numero de velas cerradas (apertura + paso <= ahora)
+        return bisect.bisect_right(self.tiempos, ahora_ms - self.paso)
+
+    def get_rows(self, symbol, granularity, product_type="usdt-futures", refresh=True):
+        # Misma forma que CandleCache.get_rows: velas cerradas y al final la que esta en formacion
+        if symbol != self.simbolo:
+            return None
+        if granularity in self.agregadas:
+            return self._agregadas(granularity)
+        if granularity != self.granularidad:
+            return None
+        ahora_ms = self.ahora()
+        n = self._cerradas(ahora_ms)
+        velas = self.filas[max(0, n - self.max_velas):n]
+        if n < len(self.filas) and self.tiempos[n] <= ahora_ms:
+            apertura = self.filas[n]
+            velas.append((apertura[0], apertura[1], apertura[1], apertura[1], apertura[1], 0.0, 0.0))
+        return velas
+
+    def _agregadas(self, granularidad):
+        # Velas cerradas de la granularidad mayor y la que esta en formacion con las velas grabadas vistas hasta ahora
+        marco, agregadas, tiempos = self.agregadas[granularidad]
+        ahora_ms = self.ahora()
+        n = bisect.bisect_right(tiempos, ahora_ms - marco.paso)
+        velas = agregadas[max(0, n - self.max_velas):n]
+        apertura = marco.apertura(ahora_ms)
+        cerradas = self._cerradas(ahora_ms)
+        parte = self.filas[bisect.bisect_left(self.tiempos, apertura):cerradas]
+        if cerradas < len(self.filas) and self.tiempos[cerradas] <= ahora_ms:
+            # De la vela base en formacion solo se conoce la apertura
+            entrada = self.filas[cerradas][1]
+            parte.append((self.tiempos[cerradas], entrada, entrada, entrada, entrada, 0.0, 0.0))
+        if parte:
+            velas.append((apertura, parte[0][1], max(fila[2] for fila in parte), min(fila[3] for fila in parte),
+                          parte[-1][4], sum(fila[5] for fila in parte), sum(fila[6] for fila in parte)))
+        return velas
+
+    def velas(self, simbolo, granularidad, fin_ms, limite, inicio_ms=None):
+        filas = self.get_rows(simbolo, granularidad) or []
+        filas = [fila for fila in filas if fila[0] <= fin_ms and (inicio_ms is None or fila[0] >= inicio_ms)]
+        return [[str(fila[0])] + [f"{valor}" for valor in fila[1:]] for fila in filas[-limite:]]
+
+    def ticker(self, simbolo):
+        ahora_ms = self.ahora()
+        if self.tickers:
+            i = bisect.bisect_right(self.tiempos_tickers, ahora_ms) - 1
+            if i >= 0:
+                ts, ultimo, ask, bid = self.tickers[i]
+                return {"symbol": simbolo, "lastPr": str(ultimo), "askPr": str(ask), "bidPr": str(bid), "ts": str(ts)}
+        n = self._cerradas(ahora_ms)
+        ultimo = self.filas[n][1] if n < len(self.filas) else self.filas[-1][4]
+        return {"symbol": simbolo, "lastPr": str(ultimo), "askPr": str(ultimo * (1 + self.spread)),
+                "bidPr": str(ultimo * (1 - self.spread)), "ts": str(ahora_ms)}
+
+    def contrato(self, simbolo):
+        return self._contrato
+
+
+class ClienteSimulado:
+    # Sustituye a BitgetClient para los datos de mercado: las peticiones van directamente a la ApiSimulada, sin red
+    def __init__(self, api):
+        self.api = api
+
+    def get(self, path, params=None, headers=None):
+        return self.request("GET", path, params=params, headers=headers)
+
+    def post(self, path, data=None, headers=None):
+        return self.request("POST", path, data=data, headers=headers)
+
+    def request(self, method, path, params=None, data=None, headers=None):
+        # Se llama en cada evaluacion (precio, cuenta): la ruta solo se analiza si lleva parametros
+        ruta, _, consulta = path.partition("?")
+        todos = {clave: valores[0] for clave, valores in parse_qs(consulta).items()} if consulta else {}
+        todos.update({clave: str(valor) for clave, valor in (params or {}).items()})
+        if data:
+            todos.update(json.loads(data))
+        return RespuestaSimulada(*self.api.atender(method, ruta, todos))
+
+
+class Replay:
+    # Ejecuta el TradingBot real (iniciar_bot: senales, efecto piramide, orden_en_ejecucion, cierre y apertura,
+    # OrderPipeline y PositionTracker) sobre velas grabadas con un reloj simulado. Las ordenes van a una cuenta
+    # en papel (EjecucionPapel sobre una CuentaSimulada) y el tiempo solo avanza cuando el bot duerme y no tiene
+    # ordenes en curso, asi que meses de historia se reproducen en segundos y el resultado no depende de la
+    # velocidad de la maquina.
+    def __init__(self, filas, simbolo="BTCUSDT", granularidad="1m", product_type="usdt-futures", sma_periodo=20,
+                 ema_periodo=21, ordersize="50", pyramiding="1", leverage="1", actualizaciones=30, saldo=10_000.0,
+                 desde=None, hasta=None, tickers=None, spread=0.0, contrato=None, gracia_cierre=2.0,
+                 log_text=None, order_log_text=None, calentamiento=100, confirmacion=()):
+        paso = granularidad_ms(granularidad)
+        # Por defecto se empieza tras `calentamiento` velas para que la BMSB ya tenga historial
+        inicio = desde if desde is not None else filas[min(calentamiento, len(filas) - 1)][0]
+        fin = hasta if hasta is not None else filas[-1][0] + paso
+        self.reloj = SimClock(inicio / 1000, fin / 1000)
+        self.mercado = MercadoGrabado(simbolo, granularidad, filas, self.reloj, tickers, spread, contrato,
+                                      confirmacion=confirmacion)
+        self.cuenta = CuentaSimulada(self.mercado, saldo, product_type.split("-")[0].upper())
+        self.cliente = ClienteSimulado(ApiSimulada(self.mercado, self.cuenta))
+        self.saldo_inicial = saldo
+
+        # Sin destino los logs se descartan: son varias lineas por evaluacion y meses de historia
+        self.log_text = log_text or NullSink()
+        self.order_log_text = order_log_text or NullSink()
+        self.bot = TradingBot(sma_periodo, ema_periodo, granularidad, product_type, simbolo, "replay", "replay",
+                              "replay", ordersize, pyramiding, leverage, actualizaciones, self.log_text,
+                              self.order_log_text, client=self.cliente,
+                              contratos=ContractCache(self.cliente, raiz=None),
+                              gracia_cierre=gracia_cierre, reloj=self.reloj, fuente_velas=self.mercado.get_rows,
+                              ejecucion=EjecucionPapel(self.cuenta), confirmacion=confirmacion)
+        self.reloj.antes_de_avanzar.append(self.bot.pipeline.esperar_inactivo)
+        self.reloj.al_terminar.append(self.bot.detener_bot)
+        self.duracion = None
+
+    def ejecutar(self):
+        # Las metricas del proceso se apagan mientras tanto: medir cada evaluacion costaria mas que evaluarla
+        activas = metricas.activo
+        metricas.activo = False
+        inicio = time.perf_counter()
+        try:
+            self.bot.iniciar_bot()
+            self.bot.pipeline.esperar_inactivo()
+        finally:
+            metricas.activo = activas
+        self.duracion = time.perf_counter() - inicio
+        return self.resumen()
+
+    def resumen(self):
+        operaciones = self.cuenta.historial
+        cierres = [operacion for operacion in operaciones if operacion["tipo"] == "cierre"]
+        # Las posiciones abiertas al final se valoran al ultimo precio
+        precio = float(self.mercado.ticker(self.bot.simbolo)["lastPr"])
+        abierto = sum(p["margen"] + (1 if lado == "long" else -1) * (precio - p["precio"]) * p["total"]
+                      for (_, lado), p in self.cuenta.posiciones.items())
+        equity = self.cuenta.disponible + abierto
+        return {
+            "aperturas": len(operaciones) - len(cierres),
+            "cierres": len(cierres),
+            "ganadoras": sum(1 for operacion in cierres if operacion["pnl"] > 0),
+            "pnl_cerrado": sum(operacion["pnl"] for operacion in cierres),
+            "equity_final": equity,
+            "rentabilidad_pct": (equity / self.saldo_inicial - 1) * 100,
+            "ordenes_fallidas": self.bot.pipeline.fallidas,
+            "duracion_s": self.duracion,
+        }
+
+
+def filas_desde_columnas(velas):
+    # {columna: array} de ObtenerDatosVelas.cargar_velas -> tuplas como las de CandleCache
+    return list(zip(velas["time"].astype("int64").tolist(), velas["entry"].tolist(), velas["high"].tolist(),
+                    velas["low"].tolist(), velas["close"].tolist(), velas["volume_base"].tolist(),
+                    velas["volume_quote"].tolist()))
+
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime, timezone
+    from ObtenerDatosVelas import cargar_velas, DIRECTORIO_DATOS
+
+    def fecha_ms(texto):
+        return int(datetime.fromisoformat(texto).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+    parser = argparse.ArgumentParser(description="Reproduce el TradingBot sobre velas descargadas con ObtenerDatosVelas")
+    parser.add_argument("simbolo")
+    parser.add_argument("--granularidad", default="1m")
+    parser.add_argument("--product-type", default="usdt-futures")
+    parser.add_argument("--raiz", default=DIRECTORIO_DATOS)
+    parser.add_argument("--desde", type=fecha_ms, help="fecha ISO (UTC)")
+    parser.add_argument("--hasta", type=fecha_ms, help="fecha ISO (UTC)")
+    parser.add_argument("--sma", type=int, default=20)
+    parser.add_argument("--ema", type=int, default=21)
+    parser.add_argument("--ordersize", default="50")
+    parser.add_argument("--pyramiding", default="1")
+    parser.add_argument("--apalancamiento", default="1")
+    parser.add_argument("--actualizaciones", type=int, default=30)
+    parser.add_argument("--saldo", type=float, default=10_000.0)
+    parser.add_argument("--spread", type=float, default=0.0)
+    parser.add_argument("--confirmacion", nargs="*", default=[],
+                        help="granularidades mayores que confirman la senal")
+    parser.add_argument("--log-ordenes", help="fichero donde guardar el log de ordenes del bot")
+    parser.add_argument("--operaciones", help="fichero JSON con las aperturas y cierres de la cuenta en papel")
+    args = parser.parse_args()
+
+    velas = cargar_velas(args.simbolo, args.granularidad, args.product_type, args.raiz)
+    if velas is None:
+        raise SystemExit(f"No hay velas en disco para {args.simbolo} {args.granularidad}")
+    order_log = StreamSink(open(args.log_ordenes, "w", encoding="utf-8")) if args.log_ordenes else None
+    replay = Replay(filas_desde_columnas(velas), args.simbolo, args.granularidad, args.product_type, args.sma,
+                    args.ema, args.ordersize, args.pyramiding, args.apalancamiento, args.actualizaciones, args.saldo,
+                    args.desde, args.hasta, spread=args.spread, order_log_text=order_log,
+                    confirmacion=args.confirmacion)
+    resultado = replay.ejecutar()
+    for clave, valor in resultado.items():
+        print(f"{clave}: {valor}")
+    if args.operaciones:
+        with open(args.operaciones, "w", encoding="utf-8") as f:
+            json.dump(replay.cuenta.historial, f, indent=2)
@@ -0,0 +1,168 @@
+import time
+from collections import deque
+
+from BMSBIndicators import BMSBEngine
+from CandleCache import granularidad_ms
+
+DIA_MS = 86_400_000
+# Bitget alinea las velas de 6h en adelante a UTC+8 (las menores caben en 8 horas y coinciden con UTC) y las
+# semanales empiezan el lunes; el 1/1/1970 fue jueves
+DESFASE_EXCHANGE_HORAS = 8
+LUNES_MS = 4 * DIA_MS
+
+
+def origen_ms(granularidad, desfase_horas=DESFASE_EXCHANGE_HORAS):
+    # Instante (ms) en el que empieza una vela de `granularidad`; todas las demas empiezan a multiplos de su
+    # duracion desde ahi
+    paso = granularidad_ms(granularidad)
+    if paso is None:
+        raise ValueError(f"Granularidad sin duracion fija, no se puede remuestrear: {granularidad}")
+    origen = -desfase_horas * 3_600_000
+    if paso == 7 * DIA_MS:
+        origen += LUNES_MS
+    return origen
+
+
+def _combinar(vela, fila):
+    # Anade la vela base `fila` a la vela agregada `vela` (None si es la primera del periodo)
+    if vela is None:
+        return fila
+    return (vela[0], vela[1], max(vela[2], fila[2]), min(vela[3], fila[3]), fila[4], vela[5] + fila[5],
+            vela[6] + fila[6])
+
+
+class _Marco:
+    # Estado de una granularidad destino: velas cerradas y la vela en curso formada por las velas base cerradas
+    # del periodo (`acumulada`). `completa` es falso si el periodo se empezo a ver a medias; esa vela no se da
+    # por cerrada porque le faltan datos. `hasta` marca hasta donde llega una vela sembrada desde la API.
+    def __init__(self, granularidad, max_velas, desfase_horas):
+        self.granularidad = granularidad
+        self.paso = granularidad_ms(granularidad)
+        self.origen = origen_ms(granularidad, desfase_horas)
+        self.cerradas = deque(maxlen=max_velas)
+        self.acumulada = None
+        self.completa = False
+        self.hasta = None
+
+    def apertura(self, tiempo):
+        return tiempo - (tiempo - self.origen) % self.paso
+
+
+class Resampler:
+    # Construye en memoria velas de granularidades mayores (5m, 15m, 1h...) a partir de una sola serie base
+    # (p. ej. 1m) de un simbolo, de forma incremental. Recibe las velas base como las da CandleCache o el feed,
+    # tuplas (time_ms, entry, high, low, close, volume_base, volume_quote) en orden, donde la ultima puede ser
+    # la vela en formacion y volver a llegar actualizada. Una vela base se da por cerrada cuando llega otra
+    # posterior. `reloj` da la hora (segundos) con la que se marca hasta donde llega un historial sembrado; en
+    # Replay es el del reloj simulado.
+    def __init__(self, granularidades, base="1m", max_velas=500, desfase_horas=DESFASE_EXCHANGE_HORAS,
+                 reloj=time.time):
+        self.base = base
+        self.reloj = reloj
+        self.base_ms = granularidad_ms(base)
+        if self.base_ms is None:
+            raise ValueError(f"Granularidad base no soportada: {base}")
+        self.marcos = {}
+        for granularidad in granularidades:
+            marco = _Marco(granularidad, max_velas, desfase_horas)
+            if marco.paso <= self.base_ms or marco.paso % self.base_ms:
+                raise ValueError(f"{granularidad} no es multiplo de la granularidad base {base}")
+            self.marcos[granularidad] = marco
+        self.formando = None  # ultima vela base, todavia abierta
+
+    def sembrar(self, granularidad, filas, hasta_ms=None):
+        # Historial de una granularidad pedido una vez a la API (la ultima fila es la vela en formacion), para
+        # no tener que esperar a reunir sus velas a partir de la serie base. La vela en formacion cubre las
+        # velas base hasta `hasta_ms` (el momento de la peticion); las velas base anteriores no se suman otra vez.
+        marco = self.marcos[granularidad]
+        if not filas:
+            return
+        marco.cerradas.clear()
+        marco.cerradas.extend(filas[:-1])
+        marco.acumulada = filas[-1]
+        marco.completa = True
+        marco.hasta = hasta_ms if hasta_ms is not None else int(self.reloj() * 1000)
+
+    def actualizar(self, filas):
+        # Devuelve [(granularidad, vela)] con las velas agregadas que se han cerrado con estas filas
+        cerradas = []
+        for fila in filas:
+            if self.formando is None or fila[0] > self.formando[0]:
+                if self.formando is not None:
+                    self._acumular(self.formando)
+                self.formando = fila
+                for granularidad, marco in self.marcos.items():
+                    # Solo cierra el periodo una vela base de un periodo posterior: el historial anterior a una
+                    # vela sembrada llega antes que ella y no la cierra
+                    if marco.acumulada is not None and marco.apertura(fila[0]) > marco.acumulada[0]:
+                        if marco.completa:
+                            marco.cerradas.append(marco.acumulada)
+                            cerradas.append((granularidad, marco.acumulada))
+                        marco.acumulada = None
+            elif fila[0] == self.formando[0]:
+                self.formando = fila
+            # Las revisiones de velas base ya cerradas llegan tarde y se ignoran
+        return cerradas
+
+    def _acumular(self, fila):
+        for marco in self.marcos.values():
+            if marco.hasta is not None and fila[0] + self.base_ms <= marco.hasta:
+                # Ya incluida en la vela sembrada desde la API
+                continue
+            apertura = marco.apertura(fila[0])
+            if marco.acumulada is None:
+                marco.completa = fila[0] == apertura
+                marco.acumulada = (apertura,) + tuple(fila[1:])
+            else:
+                marco.acumulada = _combinar(marco.acumulada, fila)
+
+    def filas(self, granularidad):
+        # Velas de `granularidad` como las devuelve CandleCache.get_rows: las cerradas y al final la que se esta
+        # formando (las velas base cerradas del periodo mas la vela base abierta)
+        marco = self.marcos[granularidad]
+        filas = list(marco.cerradas)
+        formando = marco.acumulada
+        if self.formando is not None:
+            # `acumulada` siempre es del mismo periodo que la vela base abierta: se cierra al cambiar de periodo
+            if formando is None:
+                formando = (marco.apertura(self.formando[0]),) + tuple(self.formando[1:])
+            else:
+                formando = _combinar(formando, self.formando)
+        if formando is not None:
+            filas.append(formando)
+        return filas
+
+
+class MultiTimeframeBMSB:
+    # Banda BMSB en varias granularidades de un simbolo alimentada por una sola serie base: las velas de cada
+    # granularidad salen del Resampler y cada una tiene su BMSBEngine incremental
+    def __init__(self, sma_periodo, ema_periodo, granularidades, base="1m", max_velas=500, reloj=time.time):
+        self.resampler = Resampler(granularidades, base, max_velas, reloj=reloj)
+        self.engines = {granularidad: BMSBEngine(sma_periodo, ema_periodo) for granularidad in granularidades}
+
+    def sembrar(self, granularidad, filas, hasta_ms=None):
+        self.resampler.sembrar(granularidad, filas, hasta_ms)
+        self.engines[granularidad].reset()
+        self.engines[granularidad].update_closed(filas)
+
+    def actualizar(self, filas):
+        cerradas = self.resampler.actualizar(filas)
+        for granularidad in {granularidad for granularidad, _ in cerradas}:
+            self.engines[granularidad].update_closed(self.resampler.filas(granularidad))
+        return cerradas
+
+    def tendencia(self, granularidad):
+        # "alcista" si la ultima vela cerrada esta por encima de la banda, "bajista" si esta por debajo y None
+        # si esta dentro o todavia no hay suficientes velas
+        engine = self.engines[granularidad]
+        if engine.close > engine.bmsb_mayor:
+            return "alcista"
+        if engine.close < engine.bmsb_menor:
+            return "bajista"
+        return None
+
+    def confirma(self, senal):
+        # Filtro multi-temporalidad: una senal de compra (venta) solo se confirma si el precio esta por encima
+        # (por debajo) de la banda en todas las granularidades
+        esperada = "alcista" if senal == "compra" else "bajista"
+        return all(self.tendencia(granularidad) == esperada for granularidad in self.engines)
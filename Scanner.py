@@ -0,0 +1,116 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Screener import BMSBScreener
+
+
+class BMSBScanner:
+    # Evalua el cruce de la BMSB sobre todos los simbolos de un productType. Las velas se leen del
+    # cache incremental, asi que despues del primer ciclo solo se piden dos velas por simbolo. El limite
+    # de peticiones por segundo lo aplica el cliente HTTP (BitgetClient): las velas van por la familia "market"
+    # (20/s), asi que sin feed cada ciclo tarda al menos N/20 s (unos 25 s con 500 simbolos). Con `feed` (un
+    # MarketFeed) se suscriben las velas de todos los simbolos y, mientras esta conectado, el cache se mantiene
+    # al dia por WebSocket: la API solo se usa para el historial inicial de cada simbolo. La BMSB de todos los
+    # simbolos se calcula a la vez con el BMSBScreener.
+    def __init__(self, candle_cache, symbols_fetcher, sma_periodo, ema_periodo, granularidad,
+                 product_type="usdt-futures", max_workers=16, max_velas=500, feed=None):
+        self.candle_cache = candle_cache
+        self.symbols_fetcher = symbols_fetcher
+        self.sma_periodo = sma_periodo
+        self.ema_periodo = ema_periodo
+        self.granularidad = granularidad
+        self.product_type = product_type
+        self.max_workers = max_workers
+        self.feed = feed
+        self.symbols = None
+        self.screener = BMSBScreener(sma_periodo, ema_periodo, max_velas)
+        self.duracion = 0.0
+        self.duracion_calculo = 0.0
+
+    def load_symbols(self):
+        self.symbols = self.symbols_fetcher(self.product_type) or []
+        if self.feed is not None:
+            self.feed.subscribe_candles_batch(self.symbols, self.granularidad, self.product_type)
+        return self.symbols
+
+    def _velas(self, simbolo):
+        # Sin feed, o mientras esta desconectado, las velas nuevas se piden a la API
+        refresh = self.feed is None or not self.feed.connected
+        return self.candle_cache.get_rows(simbolo, self.granularidad, self.product_type, refresh=refresh)
+
+    def escanear(self):
+        if self.symbols is None:
+            self.load_symbols()
+        inicio = time.perf_counter()
+        # Las peticiones van en paralelo; el calculo, una sola vez para todos los simbolos
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            todas = list(executor.map(self._velas, self.symbols))
+
+        inicio_calculo = time.perf_counter()
+        simbolos = []
+        for simbolo, velas in zip(self.symbols, todas):
+            if velas is None or len(velas) < 3:
+                continue
+            self.screener.actualizar(simbolo, velas)
+            simbolos.append(simbolo)
+        evaluacion = self.screener.evaluar(simbolos)
+        close, mayor, menor = evaluacion["close"], evaluacion["bmsb_mayor"], evaluacion["bmsb_menor"]
+        compra, venta = evaluacion["compra"], evaluacion["venta"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            distancia = np.where(compra, (close - mayor) / mayor * 100,
+                                 np.where(venta, (menor - close) / menor * 100, 0.0))
+
+        tabla = [{
+            "simbolo": simbolo,
+            "senal": "compra" if es_compra else "venta" if es_venta else None,
+            "close": c,
+            "bmsb_mayor": bmsb_mayor,
+            "bmsb_menor": bmsb_menor,
+            "distancia": d,
+        } for simbolo, es_compra, es_venta, c, bmsb_mayor, bmsb_menor, d in zip(
+            evaluacion["simbolos"], compra.tolist(), venta.tolist(), close.tolist(), mayor.tolist(), menor.tolist(),
+            distancia.tolist())]
+
+        # Primero los simbolos con senal, ordenados por lo lejos que ha cerrado el precio de la banda
+        tabla.sort(key=lambda fila: (fila["senal"] is None, -fila["distancia"]))
+        fin = time.perf_counter()
+        self.duracion_calculo = fin - inicio_calculo
+        self.duracion = fin - inicio
+        return tabla
+
+
+def formatear_tabla(tabla, limite=20):
+    lineas = [f"{'simbolo':<16}{'senal':<8}{'close':>14}{'bmsb_menor':>14}{'bmsb_mayor':>14}{'dist %':>9}"]
+    for fila in tabla[:limite]:
+        lineas.append(f"{fila['simbolo']:<16}{fila['senal'] or '-':<8}{fila['close']:>14.6g}"
+                      f"{fila['bmsb_menor']:>14.6g}{fila['bmsb_mayor']:>14.6g}{fila['distancia']:>9.3f}")
+    return "\n".join(lineas) + "\n"
+
+
+if __name__ == "__main__":
+    import argparse
+    from TradingBot import candle_cache, get_market_feed
+    from BitgetClient import get_all_symbols
+
+    parser = argparse.ArgumentParser(description="Escaner BMSB sobre todos los simbolos de un productType")
+    parser.add_argument("--product-type", default="usdt-futures")
+    parser.add_argument("--granularidad", default="1m")
+    parser.add_argument("--sma", type=int, default=20)
+    parser.add_argument("--ema", type=int, default=21)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--intervalo", type=float, default=60, help="segundos entre ciclos")
+    parser.add_argument("--websocket", action="store_true",
+                        help="mantener las velas por WebSocket en lugar de pedirlas a la API en cada ciclo")
+    args = parser.parse_args()
+
+    scanner = BMSBScanner(candle_cache, get_all_symbols, args.sma, args.ema, args.granularidad,
+                          args.product_type, max_workers=args.workers,
+                          feed=get_market_feed() if args.websocket else None)
+    while True:
+        tabla = scanner.escanear()
+        print(f"{len(tabla)} simbolos escaneados en {scanner.duracion:.2f}s "
+              f"(calculo {scanner.duracion_calculo * 1000:.1f} ms)")
+        print(formatear_tabla(tabla))
+        time.sleep(args.intervalo)
@@ -0,0 +1,77 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from CandleCache import granularidad_ms
+from Metrics import metricas
+
+
+class CandleScheduler:
+    # Decide cuando volver a evaluar una estrategia que solo mira velas cerradas: justo despues del cierre de la
+    # vela en formacion, mas `gracia` segundos para que la API ya la devuelva cerrada. Entre cierres solo se
+    # despierta a intervalos de `tick` cuando se pide (senal activa o posicion abierta que vigilar).
+    # El cierre se calcula a partir del tiempo de apertura de la vela en formacion, asi se respeta la
+    # alineacion que use el exchange para cada granularidad (p. ej. velas diarias en UTC+8).
+    # `reloj` y `dormir` se sustituyen por los de un reloj simulado en Replay; `paso_maximo` limita cada espera
+    # para poder detenerse enseguida. Si la vela nueva no llega tras el cierre (retraso del exchange o peticion
+    # fallida) se reintenta tras `reintento` segundos, doblando la espera hasta `reintento_maximo`.
+    def __init__(self, granularidad, gracia=2.0, reloj=time.time, dormir=time.sleep, paso_maximo=1.0, reintento=1.0,
+                 reintento_maximo=30.0):
+        self.granularidad = granularidad
+        self.duracion_ms = granularidad_ms(granularidad)
+        self.gracia = gracia
+        self.reloj = reloj
+        self.dormir = dormir
+        self.paso_maximo = paso_maximo
+        self.reintento = reintento
+        self.reintento_maximo = reintento_maximo
+        self._atrasada = None  # apertura de la vela que ya deberia haber cerrado
+        self._reintentos = 0
+
+    def siguiente_cierre(self, apertura_ms):
+        # Tiempo (ms) en que se cierra la vela que abrio en `apertura_ms`
+        if self.duracion_ms is not None:
+            return apertura_ms + self.duracion_ms
+        # "1M": la vela abre a medianoche del dia 1 en la zona horaria del exchange, que puede caer en el dia 1
+        # o en el ultimo dia del mes anterior en UTC. Se desplaza a esa medianoche, se suma un mes y se deshace.
+        apertura = datetime.fromtimestamp(apertura_ms / 1000, tz=timezone.utc)
+        segundos_dia = apertura.hour * 3600 + apertura.minute * 60 + apertura.second
+        desplazamiento = timedelta(seconds=-segundos_dia if apertura.day == 1 else 86400 - segundos_dia)
+        local = apertura + desplazamiento
+        anio, mes = (local.year + 1, 1) if local.month == 12 else (local.year, local.month + 1)
+        return int((local.replace(year=anio, month=mes) - desplazamiento).timestamp() * 1000)
+
+    def proxima_evaluacion(self, apertura_ms=None, tick=None):
+        # Instante (segundos, reloj de pared) de la siguiente evaluacion y si corresponde a un cierre de vela.
+        # Sin vela conocida se usa `tick` o, en su defecto, un minuto.
+        ahora = self.reloj()
+        if apertura_ms is None:
+            return ahora + (tick or 60.0), False
+        cierre = self.siguiente_cierre(apertura_ms) / 1000 + self.gracia
+        if cierre <= ahora:
+            # La vela conocida ya cerro (p. ej. tras un ciclo largo): se evalua enseguida la primera vez; si
+            # despues de evaluar sigue siendo la ultima conocida, se espera antes de volver a pedirla
+            if apertura_ms != self._atrasada:
+                self._atrasada, self._reintentos = apertura_ms, 0
+                return ahora, True
+            espera = min(self.reintento * 2 ** self._reintentos, self.reintento_maximo)
+            self._reintentos += 1
+            if tick is not None:
+                espera = min(espera, tick)
+            return ahora + espera, True
+        if tick is not None and ahora + tick < cierre:
+            return ahora + tick, False
+        return cierre, True
+
+    def esperar(self, apertura_ms=None, tick=None, activo=lambda: True, paso_maximo=None):
+        # Duerme hasta la siguiente evaluacion en pasos de como mucho `paso_maximo` segundos para poder
+        # detenerse enseguida. Devuelve True si se desperto por un cierre de vela.
+        paso_maximo = paso_maximo or self.paso_maximo
+        instante, es_cierre = self.proxima_evaluacion(apertura_ms, tick)
+        while activo():
+            restante = instante - self.reloj()
+            if restante <= 0:
+                # Retraso del despertar respecto al instante previsto
+                metricas.observar("jitter", -restante, granularidad=self.granularidad)
+                break
+            self.dormir(min(restante, paso_maximo))
+        return es_cierre
@@ -0,0 +1,143 @@
+import numpy as np
+
+from BMSBIndicators import bmsb_cross_from_band, ema_matrix, sma_matrix
+
+
+class BMSBScreener:
+    # Cruces de la BMSB de todos los simbolos en una sola pasada de NumPy. Los cierres de las velas cerradas se
+    # guardan en una matriz (velas x simbolos) alineada por abajo: la ultima fila es la ultima vela cerrada de
+    # cada simbolo y los que tienen menos historial llevan NaN al principio de su columna. Entre ciclos solo se
+    # desplazan las columnas con velas nuevas (en bloque, agrupadas por numero de velas). En cada evaluacion la EMA
+    # se recalcula sobre la matriz entera y la SMA, la banda y los cruces solo en las dos ultimas velas, que es lo
+    # que decide la senal (bmsb_cross_arrays da las mascaras de todas las velas si hacen falta).
+    def __init__(self, sma_periodo, ema_periodo, max_velas=500):
+        self.sma_periodo = sma_periodo
+        self.ema_periodo = ema_periodo
+        self.max_velas = max_velas
+        self.cierres = np.full((max_velas, 0), np.nan)
+        self.columnas = {}  # simbolo -> columna
+        self.simbolos = []
+        self.ultimo = []  # apertura de la ultima vela cerrada de cada columna
+        self.pendientes = {}  # columna -> cierres nuevos que aun no se han desplazado en la matriz
+
+    def actualizar(self, simbolo, velas):
+        # velas como las da CandleCache.get_rows; la ultima esta en formacion y se ignora
+        cerradas = velas[:-1]
+        if not cerradas:
+            return
+        columna = self.columnas.get(simbolo)
+        if columna is None:
+            columna = self._nueva_columna(simbolo)
+        ultimo = self.ultimo[columna]
+        if ultimo is not None and cerradas[-1][0] <= ultimo:
+            return
+        if ultimo is None or cerradas[0][0] > ultimo:
+            # Primera vez o se han perdido velas intermedias: la columna se rellena con el historial disponible
+            self.pendientes.pop(columna, None)
+            valores = [fila[4] for fila in cerradas[-self.max_velas:]]
+            self.cierres[:, columna] = np.nan
+            self.cierres[self.max_velas - len(valores):, columna] = valores
+        else:
+            # Las velas nuevas estan al final
+            inicio = len(cerradas)
+            while inicio > 0 and cerradas[inicio - 1][0] > ultimo:
+                inicio -= 1
+            self.pendientes.setdefault(columna, []).extend(fila[4] for fila in cerradas[inicio:])
+        self.ultimo[columna] = cerradas[-1][0]
+
+    def _nueva_columna(self, simbolo):
+        columna = len(self.simbolos)
+        if columna == self.cierres.shape[1]:
+            ampliada = np.full((self.max_velas, max(64, 2 * columna)), np.nan)
+            ampliada[:, :columna] = self.cierres
+            self.cierres = ampliada
+        self.columnas[simbolo] = columna
+        self.simbolos.append(simbolo)
+        self.ultimo.append(None)
+        return columna
+
+    def _desplazar(self):
+        grupos = {}
+        for columna, valores in self.pendientes.items():
+            grupos.setdefault(min(len(valores), self.max_velas), []).append(columna)
+        n = len(self.simbolos)
+        for k, columnas in grupos.items():
+            nuevos = np.array([self.pendientes[columna][-k:] for columna in columnas]).T
+            if len(columnas) == n:
+                # Caso habitual: todas las columnas tienen las mismas velas nuevas y se mueven con un solo slice
+                orden = np.argsort(columnas)
+                self.cierres[:-k, :n] = self.cierres[k:, :n]
+                self.cierres[-k:, :n] = nuevos[:, orden]
+            else:
+                self.cierres[:-k, columnas] = self.cierres[k:, columnas]
+                self.cierres[-k:, columnas] = nuevos
+        self.pendientes.clear()
+        if self.cierres.shape[1] != n:
+            # Sin columnas de reserva la matriz es contigua y se evalua sin copiarla
+            self.cierres = np.ascontiguousarray(self.cierres[:, :n])
+
+    def evaluar(self, simbolos=None):
+        # Ultima vela cerrada de cada simbolo (todos los vistos o los de `simbolos`): cierre, banda y senal
+        self._desplazar()
+        if simbolos is None:
+            simbolos = self.simbolos
+        else:
+            simbolos = [simbolo for simbolo in simbolos if simbolo in self.columnas]
+        columnas = [self.columnas[simbolo] for simbolo in simbolos]
+        if columnas == list(range(len(self.simbolos))):
+            cierres = self.cierres[:, :len(columnas)]
+        else:
+            cierres = self.cierres[:, columnas]
+        ema = ema_matrix(cierres, self.ema_periodo)[-2:]
+        sma = sma_matrix(cierres[-(self.sma_periodo + 1):], self.sma_periodo)[-2:]
+        # fmax/fmin ignoran los NaN igual que BMSBEngine cuando solo hay una media
+        mayor, menor = np.fmax(sma, ema), np.fmin(sma, ema)
+        compra, venta = bmsb_cross_from_band(cierres[-2:], mayor, menor)
+        return {
+            "simbolos": simbolos,
+            "close": cierres[-1],
+            "bmsb_mayor": mayor[-1],
+            "bmsb_menor": menor[-1],
+            "compra": compra[-1],
+            "venta": venta[-1],
+        }
+
+    def cruces(self, simbolos=None):
+        # (simbolos con cruce de compra, simbolos con cruce de venta) en la ultima vela cerrada
+        evaluacion = self.evaluar(simbolos)
+        nombres = np.array(evaluacion["simbolos"], dtype=object)
+        return nombres[evaluacion["compra"]].tolist(), nombres[evaluacion["venta"]].tolist()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Mide el screener con velas sinteticas")
+    parser.add_argument("--simbolos", type=int, default=600)
+    parser.add_argument("--velas", type=int, default=500)
+    parser.add_argument("--ciclos", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    precios = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, (args.velas + args.ciclos + 1, args.simbolos)), axis=0))
+    nombres = [f"S{i}USDT" for i in range(args.simbolos)]
+
+    def velas_hasta(fin, i):
+        return [(t * 60_000, p, p, p, p, 0.0, 0.0) for t, p in enumerate(precios[max(0, fin - args.velas):fin + 1, i],
+                                                                          start=max(0, fin - args.velas))]
+
+    screener = BMSBScreener(20, 21, args.velas)
+    for i, nombre in enumerate(nombres):
+        screener.actualizar(nombre, velas_hasta(args.velas, i))
+    screener.evaluar()
+    tiempos = []
+    for fin in range(args.velas + 1, args.velas + args.ciclos + 1):
+        for i, nombre in enumerate(nombres):
+            screener.actualizar(nombre, velas_hasta(fin, i)[-3:])
+        inicio = time.perf_counter()
+        compras, ventas = screener.cruces()
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    print(f"{args.simbolos} simbolos x {args.velas} velas: mediana {tiempos[len(tiempos) // 2] * 1000:.2f} ms, "
+          f"p90 {tiempos[int(len(tiempos) * 0.9)] * 1000:.2f} ms por evaluacion")
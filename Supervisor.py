@@ -0,0 +1,227 @@
+import heapq
+import json
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Thread
+
+from BitgetClient import BitgetClient
+from BotDaemon import CONFIG_POR_DEFECTO, activar_metricas, crear_ejecucion
+from LogSinks import END, crear_sink
+from Metrics import metricas
+from TradingBot import TradingBot, candle_cache, get_market_feed
+
+
+class Supervisor:
+    # Aloja muchos TradingBot en un proceso. Los bots con el mismo (simbolo, granularidad, productType) forman
+    # un grupo: las velas se piden una sola vez por grupo y un unico hilo planificador decide cuando evaluar
+    # cada grupo, en lugar de tener un hilo durmiendo por bot. Los grupos se evaluan al cerrar cada vela (por el
+    # feed WebSocket o segun el CandleScheduler de cada bot) y, mientras algun bot tenga una senal activa, al
+    # ritmo de sus actualizaciones por minuto.
+    def __init__(self, bots, feed=None, max_workers=8):
+        self.grupos = {}
+        for bot in bots:
+            self.grupos.setdefault((bot.simbolo, bot.granularidad, bot.product_type), []).append(bot)
+        self.feed = feed
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self.condicion = Condition()
+        self.pendientes = []  # heap de (instante, clave); las entradas que no coinciden con `proximo` se ignoran
+        self.proximo = {}
+        self.en_curso = set()
+        self.refrescar = {clave: True for clave in self.grupos}
+        self.running = False
+        self.hilo = None
+
+    def bots(self):
+        return [bot for grupo in self.grupos.values() for bot in grupo]
+
+    def iniciar(self):
+        self.running = True
+        # Cada bot pide su cuenta y fija el apalancamiento al prepararse; se hace en paralelo. Un bot que no se
+        # puede preparar (p. ej. sin acceso a su cuenta) se anota en su log y se quita de su grupo; el resto sigue.
+        bots = self.bots()
+        preparados = set(bot for bot, ok in zip(bots, self.executor.map(self._preparar, bots)) if ok)
+        for clave in list(self.grupos):
+            self.grupos[clave] = [bot for bot in self.grupos[clave] if bot in preparados]
+            if not self.grupos[clave]:
+                del self.grupos[clave]
+                del self.refrescar[clave]
+        if not self.grupos:
+            # Sin bots el planificador termina enseguida y esperar() vuelve
+            self.running = False
+        if self.feed is not None:
+            self.feed.add_listener(self._vela_cerrada)
+        ahora = time.monotonic()
+        for clave in self.grupos:
+            self._programar(clave, ahora)
+        self.hilo = Thread(target=self._planificar, daemon=True)
+        self.hilo.start()
+
+    @staticmethod
+    def _preparar(bot):
+        try:
+            bot.preparar()
+            return True
+        except Exception as e:
+            bot.log_text.insert(END, f"No se pudo preparar el bot, queda fuera del supervisor: {e}\n")
+            bot.detener_bot()
+            bot.finalizar()
+            return False
+
+    def esperar(self):
+        while self.hilo is not None and self.hilo.is_alive():
+            self.hilo.join(timeout=1.0)
+
+    def detener(self):
+        for bot in self.bots():
+            bot.detener_bot()
+        with self.condicion:
+            self.running = False
+            self.condicion.notify_all()
+
+    def _programar(self, clave, instante):
+        with self.condicion:
+            if clave in self.proximo and self.proximo[clave] <= instante:
+                return
+            self.proximo[clave] = instante
+            heapq.heappush(self.pendientes, (instante, clave))
+            self.condicion.notify_all()
+
+    def _vela_cerrada(self, symbol, granularity, product_type, tiempo):
+        clave = (symbol, granularity, product_type)
+        if clave in self.grupos:
+            self.refrescar[clave] = True
+            self._programar(clave, time.monotonic())
+
+    def _planificar(self):
+        while True:
+            with self.condicion:
+                while self.running:
+                    ahora = time.monotonic()
+                    if self.pendientes and self.pendientes[0][0] <= ahora:
+                        break
+                    espera = self.pendientes[0][0] - ahora if self.pendientes else None
+                    self.condicion.wait(espera)
+                if not self.running:
+                    break
+                instante, clave = heapq.heappop(self.pendientes)
+                if self.proximo.get(clave) != instante or clave in self.en_curso:
+                    # Entrada sustituida por otra mas temprana, o el grupo todavia se esta evaluando
+                    continue
+                del self.proximo[clave]
+                self.en_curso.add(clave)
+            metricas.observar("jitter", time.monotonic() - instante, granularidad=clave[1])
+            self.executor.submit(self._ciclo, clave)
+
+        self.executor.shutdown(wait=True)
+        for bot in self.bots():
+            bot.finalizar()
+
+    def _ciclo(self, clave):
+        bots = self.grupos[clave]
+        # Las velas solo se piden a la API tras cada cierre; entre cierres basta con el cache (que el feed, si lo
+        # hay, mantiene al dia)
+        refrescar = self.refrescar[clave]
+        self.refrescar[clave] = False
+        try:
+            velas = candle_cache.get_rows(*clave, refresh=refrescar)
+            for bot in bots:
+                if not bot.running:
+                    continue
+                try:
+                    bot.ejecutar_ciclo(velas)
+                except Exception as e:
+                    bot.log_text.insert(END, f"Error en el ciclo del bot: {e}\n")
+        finally:
+            with self.condicion:
+                self.en_curso.discard(clave)
+                if clave in self.proximo:
+                    # Se pidio otra evaluacion (p. ej. un cierre de vela) mientras esta estaba en curso
+                    heapq.heappush(self.pendientes, (self.proximo[clave], clave))
+                    self.condicion.notify_all()
+            if self.feed is None:
+                # Cada bot sabe cuando cierra su vela y si necesita evaluar antes; el grupo sigue al mas urgente y
+                # refresca las velas si para alguno de los bots ese instante es un cierre
+                evaluaciones = [bot.siguiente_ciclo() for bot in bots]
+                segundos = min(segundos for segundos, _ in evaluaciones)
+                self.refrescar[clave] = any(es_cierre for espera, es_cierre in evaluaciones if espera <= segundos)
+                self._programar(clave, time.monotonic() + segundos)
+            else:
+                # Hasta el siguiente cierre solo se repite la evaluacion si algun bot tiene una senal activa
+                # (efecto piramide) o una posicion que vigilar
+                activos = [bot for bot in bots if bot.necesita_ticks()]
+                if activos:
+                    self._programar(clave, time.monotonic() + min(60 / bot.actualizaciones for bot in activos))
+
+
+def cargar_configuracion(ruta):
+    # {"cuentas": {nombre: {"api_key", "secret_key", "passphrase"}}, "bots": [{"nombre", "cuenta", "simbolo", ...}]}
+    # Las claves pueden referirse a variables de entorno con "${VARIABLE}". Un bot con "papel": true opera en
+    # una cuenta en papel propia (ver BotDaemon.CONFIG_POR_DEFECTO).
+    with open(ruta, encoding="utf-8") as f:
+        config = json.load(f)
+    for cuenta in config["cuentas"].values():
+        for campo, valor in cuenta.items():
+            if isinstance(valor, str):
+                cuenta[campo] = os.path.expandvars(valor)
+    return config
+
+
+def crear_bots(config, sink="stdout", ruta_log=None, feed=None):
+    # Un cliente HTTP (pool de conexiones y limites de peticiones) por cuenta, compartido por sus bots
+    clientes = {nombre: BitgetClient(pool_size=8) for nombre in config["cuentas"]}
+    bots = []
+    for i, parametros in enumerate(config["bots"]):
+        parametros = {**CONFIG_POR_DEFECTO, **parametros}
+        nombre = parametros.get("nombre") or f"{parametros['simbolo']}-{parametros['granularidad']}-{i}"
+        cuenta = config["cuentas"][parametros["cuenta"]]
+        log = crear_sink(sink, nombre, ruta_log, bot=nombre)
+        order_log = crear_sink(sink, f"{nombre}/orden", ruta_log, bot=nombre)
+        bots.append(TradingBot(int(parametros["sma_periodo"]), int(parametros["ema_periodo"]),
+                               parametros["granularidad"], parametros["product_type"], parametros["simbolo"],
+                               cuenta.get("api_key"),
+                               cuenta.get("secret_key"), cuenta.get("passphrase"), parametros["ordersize"],
+                               parametros["pyramiding"], parametros["apalancamiento"],
+                               int(parametros["actualizaciones"]), log_text=log, order_log_text=order_log, feed=feed,
+                               client=clientes[parametros["cuenta"]], feed_privado=feed is not None,
+                               gracia_cierre=float(parametros["gracia_cierre"]),
+                               monitorizar_posicion=bool(parametros["monitorizar_posicion"]),
+                               confirmacion=parametros["confirmacion"],
+                               ejecucion=crear_ejecucion(parametros, feed, clientes[parametros["cuenta"]])))
+    return bots
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ejecuta varios TradingBot en un solo proceso")
+    parser.add_argument("config", help="fichero JSON con las cuentas y los bots")
+    parser.add_argument("--websocket", action="store_true", help="datos de mercado por WebSocket")
+    parser.add_argument("--sink", choices=["stdout", "file", "json"], default="stdout")
+    parser.add_argument("--log-file", dest="log_file")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--metricas-puerto", dest="metricas_puerto", type=int,
+                        help="sirve /metrics y /metrics.json en localhost")
+    parser.add_argument("--metricas-fichero", dest="metricas_fichero", help="vuelca las metricas en JSON")
+    args = parser.parse_args(argv)
+    if args.sink == "file" and not args.log_file:
+        parser.error("--sink file necesita --log-file")
+
+    activar_metricas(vars(args))
+    feed = get_market_feed() if args.websocket else None
+    supervisor = Supervisor(crear_bots(cargar_configuracion(args.config), args.sink, args.log_file, feed),
+                            feed=feed, max_workers=args.workers)
+
+    def detener(signum, frame):
+        supervisor.detener()
+
+    signal.signal(signal.SIGTERM, detener)
+    signal.signal(signal.SIGINT, detener)
+    supervisor.iniciar()
+    supervisor.esperar()
+
+
+if __name__ == "__main__":
+    main()
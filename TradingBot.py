@@ -0,0 +1,578 @@
+import math
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from CandleCache import CandleCache
+from CandleStore import DIRECTORIO_DATOS
+from ContractCache import contract_cache
+from Execution import EjecucionReal
+from BMSBIndicators import BMSBEngine
+from MarketFeed import MarketFeed, PrivateFeed
+from LogSinks import END
+from Metrics import metricas
+from OrderPipeline import OrderPipeline
+from PositionTracker import PositionTracker
+from Resampler import MultiTimeframeBMSB
+from Scheduler import CandleScheduler
+from BitgetClient import default_client, es_produccion, get_candle_columns, get_latest_price, get_asking_price, \
+    get_signer
+
+# Cache de velas compartido por todos los bots del proceso; las velas cerradas se guardan en disco para
+# arrancar en caliente y para que otros procesos (backtests, escaner) las lean sin pedirlas a la API. Contra
+# otro servidor (p. ej. MockBitget) no se toca el disco: sus velas acabarian mezcladas con las reales.
+candle_cache = CandleCache(get_candle_columns,
+                           raiz_almacen=DIRECTORIO_DATOS if es_produccion(default_client.base_url) else None)
+market_feed = None
+private_feeds = {}
+private_feeds_lock = Lock()
+
+def usar_servidor(base_url):
+    # Apunta la API REST de todo el proceso a `base_url`. Fuera de produccion los caches compartidos dejan de
+    # leer y escribir en disco; hay que llamarlo antes de crear los bots.
+    default_client.base_url = base_url
+    if not es_produccion(base_url):
+        candle_cache.raiz_almacen = None
+        candle_cache.stores.clear()
+        contract_cache.ruta = None
+
+def get_market_feed():
+    # El feed WebSocket se crea al arrancar el primer bot que lo usa y se comparte entre todos
+    global market_feed
+    if market_feed is None:
+        market_feed = MarketFeed(candle_cache)
+        market_feed.start()
+    return market_feed
+
+def get_private_feed(signer, product_type):
+    # Un feed privado por cuenta y tipo de producto, compartido por todos los bots de esa cuenta
+    clave = (signer.api_key, product_type.lower())
+    with private_feeds_lock:
+        feed = private_feeds.get(clave)
+        if feed is None:
+            feed = PrivateFeed(signer, product_type)
+            feed.start()
+            private_feeds[clave] = feed
+    return feed
+
+def cronometrar(tiempos, paso, funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    try:
+        return funcion(*args, **kwargs)
+    finally:
+        tiempos[paso] = time.perf_counter() - inicio
+
+class ValorTemporal:
+    # Ultimo valor devuelto por una funcion, reutilizado durante `ttl` segundos
+    def __init__(self, ttl, reloj=time.monotonic):
+        self.ttl = ttl
+        self.reloj = reloj
+        self.valor = None
+        self.instante = 0.0
+        self.lock = Lock()
+
+    def obtener(self, funcion, forzar=False):
+        with self.lock:
+            if not forzar and self.valor is not None and self.reloj() - self.instante < self.ttl:
+                return self.valor
+        valor = funcion()
+        if valor is not None:
+            with self.lock:
+                self.valor = valor
+                self.instante = self.reloj()
+        return valor
+
+    def invalidar(self):
+        with self.lock:
+            self.valor = None
+
+class TradingBot:
+    def __init__(self, sma_periodo, ema_periodo, granularidad, product_type, simbolo, api_key, secret_key, passphrase,
+                 ordersize, pyramiding, leverage, actualizaciones, log_text, order_log_text, feed=None, client=None,
+                 feed_privado=False, gracia_cierre=2.0, monitorizar_posicion=False, contratos=None,
+                 confirmacion=(), reloj=None, fuente_velas=None, ejecucion=None):
+        self.sma_periodo = sma_periodo
+        self.ema_periodo = ema_periodo
+        self.simbolo = simbolo
+        self.granularidad = granularidad
+        self.product_type = product_type
+
+        self.margin_mode = "isolated"
+        self.margin_coin = self.get_margin_coin(product_type)
+
+        self.ordersize = ordersize
+        self.pyramiding = pyramiding
+        self.leverage = leverage
+
+        self.actualizaciones = actualizaciones
+
+        self.log_text = log_text
+        self.log_text.insert(END, "*" * 50 + "\n")
+        self.log_text.insert(END, "Bot creado con:\n")
+        self.log_text.insert(END, f"sma_periodo:{sma_periodo}\n")
+        self.log_text.insert(END, f"ema_periodo:{ema_periodo}\n")
+        self.log_text.insert(END, f"granularidad:{granularidad}\n")
+        self.log_text.insert(END, f"product_type:{product_type}\n")
+        self.log_text.insert(END, f"simbolo:{simbolo}\n")
+        self.log_text.insert(END, f"tamaño de la orden en % de patrimonio:{ordersize}\n")
+        self.log_text.insert(END, f"efecto piramide:{pyramiding}\n")
+        self.log_text.insert(END, f"apalancamiento:{leverage}\n")
+        self.log_text.insert(END, f"actualizaciones por minuto:{actualizaciones}\n")
+        self.log_text.insert(END, "*" * 50 + "\n")
+
+        self.order_log_text = order_log_text
+
+        # Reloj del bot: el modulo time o, en Replay, un reloj simulado con time/monotonic/sleep
+        self.reloj = reloj or time
+        # Cliente HTTP con el pool de conexiones de la cuenta
+        self.client = client or default_client
+        # De donde salen las velas: el cache compartido o, en Replay, las velas grabadas
+        self.fuente_velas = fuente_velas or candle_cache.get_rows
+        # Especificacion del contrato (decimales y minimos del tamano); se carga al preparar el bot
+        self.contratos = contratos or contract_cache
+        self.contrato = None
+
+        #KEYS
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.passphrase = passphrase
+        self._signer = None
+        # Donde se ejecutan las ordenes y las consultas privadas: la API de Bitget o una cuenta en papel
+        self.ejecucion = ejecucion or EjecucionReal(self.client, lambda: self.signer)
+
+        self.running = False
+
+        self.buy_signal = False
+        self.sell_signal = False
+        # Saldo y posiciones en memoria; solo se consultan a la API al reconciliar. El feed privado informa de
+        # la cuenta real, asi que no se usa con una cuenta en papel.
+        self.feed_privado = None
+        self.usar_feed_privado = feed_privado and not self.ejecucion.simulada
+        self.posiciones = PositionTracker(simbolo, self.margin_coin, self.pedir_cuenta, self.pedir_posiciones,
+                                          intervalo_reconciliacion=300.0 if self.usar_feed_privado else 60.0,
+                                          reloj=self.reloj.monotonic)
+
+        # Las ordenes se ejecutan de una en una con reintentos acotados; orden_en_ejecucion lo consulta. Con un
+        # reloj simulado se ejecutan en el hilo del bot: el tiempo no avanza mientras haya ordenes en curso.
+        self.pipeline = OrderPipeline(self.enviar_orden, self.consultar_orden, al_ejecutar=self.orden_ejecutada,
+                                      al_fallar=lambda orden: self.posiciones.marcar_desincronizado(),
+                                      redondear=self.redondear_size,
+                                      log=lambda texto: self.order_log_text.insert(END, texto),
+                                      sincrono=reloj is not None)
+
+        self.bmsb = BMSBEngine(sma_periodo, ema_periodo)
+        # Filtro multi-temporalidad: la BMSB de las granularidades de `confirmacion` se calcula remuestreando las
+        # velas del bot, sin pedir a la API mas que su historial inicial
+        self.confirmacion = list(confirmacion)
+        self.multi = MultiTimeframeBMSB(sma_periodo, ema_periodo, self.confirmacion, base=granularidad,
+                                        reloj=self.reloj.time) if self.confirmacion else None
+
+        # Al voltear, el precio se pide mientras se cierra la posicion contraria y se reutiliza durante unos
+        # instantes para no repetir peticiones en los ticks del efecto piramide.
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.precio_venta = ValorTemporal(ttl=0.5, reloj=self.reloj.monotonic)
+        self.cached_available = None
+
+        # Feed WebSocket opcional; sin el se consulta la API REST al cerrar cada vela
+        self.feed = feed
+        self.refrescar_velas = True
+
+        # Sin feed se despierta justo despues de cada cierre de vela; entre cierres solo se evalua al ritmo de
+        # `actualizaciones` si hay una senal activa (efecto piramide) o una posicion que vigilar
+        # Con un reloj simulado las esperas no se trocean: nadie puede pedir que se detenga a mitad de una
+        self.scheduler = CandleScheduler(granularidad, gracia=gracia_cierre, reloj=self.reloj.time,
+                                         dormir=self.reloj.sleep, paso_maximo=1.0 if reloj is None else math.inf)
+        self.monitorizar_posicion = monitorizar_posicion
+        self.apertura_vela = None
+
+    def iniciar_bot(self):
+        self.preparar()
+        while self.running:
+            self.ejecutar_ciclo()
+            self.esperar_siguiente_ciclo()
+        self.finalizar()
+
+    def preparar(self):
+        self.running = True
+
+        if self.ejecucion.simulada:
+            self.log_text.insert(END, "Ordenes en papel: no se envian al exchange\n")
+        self.log_text.insert(END, f"Informacion de la cuenta:\n")
+        account_data = self.posiciones.reconciliar()
+        if account_data is None:
+            raise RuntimeError("No se pudo obtener la informacion de la cuenta")
+        self.cached_available = float(account_data['available'])
+        self.log_text.insert(END, f"Moneda de margen:{account_data['marginCoin']}\n"
+                                     f"Margen disponible:{account_data['available']}\n")
+
+        self.contrato = self.contratos.contrato(self.product_type, self.simbolo)
+        if self.contrato is not None:
+            self.log_text.insert(END, f"Contrato: paso del tamaño {self.contrato.paso}, "
+                                      f"minimo {self.contrato.min_trade_num}\n")
+        else:
+            self.log_text.insert(END, "No se pudo obtener la especificacion del contrato, el tamaño no se redondeara\n")
+
+        self.set_leverage_value(self.leverage,"long")
+        self.set_leverage_value(self.leverage, "short")
+
+        for granularidad in self.confirmacion:
+            historial = self.fuente_velas(self.simbolo, granularidad, self.product_type)
+            if historial:
+                self.multi.sembrar(granularidad, historial)
+        if self.confirmacion:
+            self.log_text.insert(END, f"Confirmacion en: {', '.join(self.confirmacion)}\n")
+
+        if self.feed is not None:
+            self.feed.subscribe_candles(self.simbolo, self.granularidad, self.product_type)
+            self.feed.subscribe_ticker(self.simbolo, self.product_type)
+            self.log_text.insert(END, "Datos de mercado por WebSocket\n")
+
+        if self.usar_feed_privado:
+            try:
+                self.feed_privado = get_private_feed(self.signer, self.product_type)
+                self.feed_privado.add_private_listener(self.posiciones.al_mensaje_privado)
+                self.log_text.insert(END, "Saldo y posiciones por WebSocket privado\n")
+            except RuntimeError as e:
+                self.log_text.insert(END, f"{e}. El saldo se consultara por la API REST.\n")
+
+    def ejecutar_ciclo(self, velas=None):
+        # Una evaluacion de la estrategia. El Supervisor pasa las velas ya pedidas para todos los bots del
+        # mismo simbolo y granularidad; si no, se piden al cache.
+        metricas.incrementar("ciclos", simbolo=self.simbolo)
+        if velas is None:
+            # Sample OHLC data (replace this with your actual price data)
+            with metricas.cronometrar("etapa", etapa="velas"):
+                velas = self.fuente_velas(self.simbolo, self.granularidad, self.product_type,
+                                          refresh=self.refrescar_velas)
+        if velas is None or len(velas) < 3:
+            return
+        self.apertura_vela = velas[-1][0]
+
+        # Actualizar la BMSB solo con las velas cerradas nuevas
+        with metricas.cronometrar("etapa", etapa="indicadores"):
+            self.bmsb.update_closed(velas)
+            if self.multi is not None:
+                self.multi.actualizar(velas)
+        inicio_senal = time.perf_counter()
+
+        ultimo_close = self.bmsb.close
+        bmsb_mayor = self.bmsb.bmsb_mayor
+        bmsb_menor = self.bmsb.bmsb_menor
+
+        senal = self.bmsb.signal
+        if senal is not None and self.multi is not None and not self.multi.confirma(senal):
+            tendencias = ", ".join(f"{g}={self.multi.tendencia(g) or 'dentro de la banda'}" for g in self.confirmacion)
+            self.log_text.insert(END, f"Senal de {senal} sin confirmar en las granularidades mayores ({tendencias})\n")
+            senal = None
+
+        if senal == "compra":
+            self.log_text.insert(END,'_' * 100 + "\n")
+            self.log_text.insert(END,
+                f'El precio de cierre ha cruzado de abajo hacia arriba la BMSB. Oportunidad de compra a las {self.ahora().time()}\n')
+            self.log_text.insert(END,
+                f"precio actual: {self.precio_actual()}, precio de cierre: {ultimo_close}, valores de la banda a eliminar:{bmsb_menor},{bmsb_mayor} \n")
+            self.buy_signal = True
+            self.sell_signal = False
+        elif senal == "venta":
+            self.log_text.insert(END, '_' * 100 + "\n")
+            self.log_text.insert(END,
+                f"El precio de cierre ha cruzado de arriba hacia abajo la BMSB. Oportunidad de venta a las {self.ahora().time()}\n")
+            self.log_text.insert(END,
+                f"precio actual: {self.precio_actual()}, precio de cierre: {ultimo_close}, valores de la banda a eliminar:{bmsb_menor},{bmsb_mayor} \n")
+            self.buy_signal = False
+            self.sell_signal = True
+        else:
+            self.log_text.insert(END,'_' * 100 + "\n")
+            self.log_text.insert(END,f"El precio de cierre no ha cruzado la BMSB y son las {self.ahora().time()}\n")
+            self.log_text.insert(END,
+                f"precio actual: {self.precio_actual()}, precio de cierre: {ultimo_close}, valores de la banda a eliminar:{bmsb_menor},{bmsb_mayor}\n ")
+            self.buy_signal = False
+            self.sell_signal = False
+
+        metricas.observar("etapa", time.perf_counter() - inicio_senal, etapa="senal")
+
+        # Calcular los lotajes e importes usando los parametros recibidos de la interfaz y ejecutar las operaciones
+        if self.buy_signal and self.posiciones.ordenes_abiertas("long") < int(self.pyramiding) and not self.orden_en_ejecucion:
+            #Cerrar operaciones de venta abierta y abrir una nueva operacion de compra
+            self.voltear("buy")
+
+        if self.sell_signal and self.posiciones.ordenes_abiertas("short") < int(self.pyramiding) and not self.orden_en_ejecucion:
+            # Cerrar operacion de compra abierta, abrir una nueva operacion de venta
+            self.voltear("sell")
+
+        self.log_text.insert(END, f"Numero de operaciones abiertas:{self.orders_count}\n")
+        self.log_text.insert(END, '_' * 100 + "\n")
+        self.log_text.see(END)
+
+    def finalizar(self):
+        self.pipeline.detener()
+        if self.feed_privado is not None:
+            self.feed_privado.remove_private_listener(self.posiciones.al_mensaje_privado)
+        self.executor.shutdown(wait=False)
+        self.log_text.insert(END, f"El bot se ha detenido exitosamente:\n")
+        self.log_text.insert(END, "*" * 50 + "\n")
+
+    def ahora(self):
+        return datetime.fromtimestamp(self.reloj.time())
+
+    def detener_bot(self):
+        self.running = False
+
+    def necesita_ticks(self):
+        return self.buy_signal or self.sell_signal or (self.monitorizar_posicion and self.orders_count > 0)
+
+    def siguiente_ciclo(self):
+        # (segundos hasta la siguiente evaluacion, si corresponde a un cierre de vela) para quien planifica
+        # los ciclos desde fuera (Supervisor sin feed)
+        tick = 60/self.actualizaciones if self.necesita_ticks() else None
+        instante, es_cierre = self.scheduler.proxima_evaluacion(self.apertura_vela, tick)
+        return max(0.0, instante - self.scheduler.reloj()), es_cierre
+
+    def esperar_siguiente_ciclo(self):
+        if self.feed is None:
+            tick = 60/self.actualizaciones if self.necesita_ticks() else None
+            # Las velas solo cambian al cerrar; en los ticks intermedios basta con lo que hay en el cache
+            self.refrescar_velas = self.scheduler.esperar(self.apertura_vela, tick, activo=lambda: self.running)
+            return
+        # Con el feed se evalua al cerrar cada vela. Mientras haya una senal activa se sigue evaluando al
+        # ritmo configurado para poder completar el efecto piramide dentro de la misma vela.
+        limite = 60/self.actualizaciones if self.necesita_ticks() else None
+        inicio = time.monotonic()
+        while self.running:
+            espera = 1.0 if limite is None else min(1.0, limite - (time.monotonic() - inicio))
+            if espera <= 0:
+                self.refrescar_velas = False
+                return
+            if self.feed.wait_candle_close(self.simbolo, self.granularidad, self.product_type, timeout=espera):
+                # Se pide la vela cerrada a la API una vez por vela para tener sus valores definitivos
+                self.refrescar_velas = True
+                return
+
+    def precio_actual(self):
+        with metricas.cronometrar("etapa", etapa="precio"):
+            return self._precio_actual()
+
+    def _precio_actual(self):
+        if self.feed is not None:
+            precio = self.feed.last_price(self.simbolo, self.product_type)
+            if precio is not None:
+                return precio
+        return get_latest_price(self.simbolo, self.product_type, client=self.client)
+
+    def voltear(self, side):
+        # Cierra el lado contrario a `side` y abre una orden en `side`. El precio se pide en paralelo con el
+        # cierre. El saldo sale del PositionTracker, que solo lo pide a la API si el cierre ha liberado margen o
+        # si el estado local esta caducado, y el cierre se omite si se sabe que no hay posicion contraria.
+        tiempos = {}
+        inicio = time.perf_counter()
+        precio_futuro = self.executor.submit(cronometrar, tiempos, "precio", self.precio_venta.obtener,
+                                             lambda: self.get_asking_price(self.simbolo, self.product_type))
+        contrario = "short" if side == "buy" else "long"
+        if not self.posiciones.sin_posicion_confirmada(contrario):
+            if not cronometrar(tiempos, "cierre", self.cerrarOperaciones, contrario):
+                return None
+        actual_available = cronometrar(tiempos, "cuenta", self.posiciones.disponible)
+        coin_asking_price = precio_futuro.result()
+        if actual_available is None or coin_asking_price is None:
+            self.order_log_text.insert(END, "No se pudo obtener el saldo o el precio, no se abre la orden\n")
+            return None
+
+        size = float(self.ordersize) / 100 * self.cached_available
+        if size > actual_available:
+            size = actual_available
+        if size <= 0:
+            self.order_log_text.insert(END, "No hay margen disponible, no se abre la orden\n")
+            self.posiciones.marcar_desincronizado()
+            return None
+
+        operacion = "compra" if side == "buy" else "venta"
+        self.order_log_text.insert(END, "*" * 40 + "\n")
+        self.order_log_text.insert(END, f"Se ha iniciado una nueva orden de {operacion}\n")
+        self.order_log_text.insert(END, f"parametros de la operacion de {operacion}:\n"
+                                     f"Modo={self.margin_mode}\n"
+                                     f"Moneda de margen={self.margin_coin}\n"
+                                     f"Tamaño de la orden en {self.margin_coin}={size}\n")
+
+        size = self.redondear_size(size / float(coin_asking_price), coin_asking_price)
+        self.order_log_text.insert(END, f"Tamaño de la orden={size}\n")
+        if size <= 0:
+            self.order_log_text.insert(END, "El tamaño no llega al minimo del contrato, no se abre la orden\n")
+            return None
+
+        if side == "buy":
+            orden = self.abrirOperacionDeCompra(self.margin_mode, self.margin_coin, size, coin_asking_price)
+        else:
+            orden = self.abrirOperacionDeVenta(self.margin_mode, self.margin_coin, size, coin_asking_price)
+        tiempos["total"] = time.perf_counter() - inicio
+        for paso, segundos in tiempos.items():
+            metricas.observar("voltear", segundos, paso=paso)
+        self.order_log_text.insert(END, "Tiempos hasta la orden: " +
+                                   ", ".join(f"{paso}={segundos * 1000:.0f} ms" for paso, segundos in tiempos.items()) + "\n")
+        return orden
+
+    def redondear_size(self, size, precio=None):
+        if self.contrato is None:
+            return size
+        return self.contrato.redondear_size(size, precio)
+
+    def pedir_cuenta(self):
+        params = {
+            "symbol": self.simbolo,
+            "productType": self.product_type,
+            "marginCoin": self.margin_coin,
+        }
+        response = self.peticion_firmada("GET", "/api/v2/mix/account/account", params)
+        if response is None:
+            return None
+        if response.status_code != 200:
+            self.log_text.insert(END, f"No se pudo obtener la cuenta ({response.status_code}): {response.text}\n")
+            return None
+        return response.json().get('data')
+
+    def pedir_posiciones(self):
+        params = {
+            "symbol": self.simbolo,
+            "productType": self.product_type,
+            "marginCoin": self.margin_coin,
+        }
+        response = self.peticion_firmada("GET", "/api/v2/mix/position/single-position", params)
+        if response is None or response.status_code != 200:
+            return None
+        return response.json().get('data')
+
+    def abrirOperacionDeVenta(self, marginMode, marginCoin, size, precio=None):
+        return self.abrirOperacion("sell", marginMode, marginCoin, size, precio,
+                                   vigente=lambda: self.running and self.sell_signal)
+
+    def abrirOperacionDeCompra(self, marginMode, marginCoin, size, precio=None):
+        return self.abrirOperacion("buy", marginMode, marginCoin, size, precio,
+                                   vigente=lambda: self.running and self.buy_signal)
+
+    def abrirOperacion(self, side, marginMode, marginCoin, size, precio=None, vigente=None):
+        # La orden se encola en el pipeline, que la reintenta en su propio hilo mientras `vigente()` sea cierto
+        params = {
+            "symbol": self.simbolo,
+            "productType": self.product_type,
+            "marginMode": marginMode,
+            "marginCoin": marginCoin,
+            "size": size,
+            "side": side,
+            "orderType": "market",
+            "tradeSide": "open"
+        }
+        return self.pipeline.enviar_orden(params, vigente, precio)
+
+    def enviar_orden(self, params):
+        return self.peticion_firmada("POST", "/api/v2/mix/order/place-order", params)
+
+    def consultar_orden(self, client_oid):
+        params = {
+            "symbol": self.simbolo,
+            "productType": self.product_type,
+            "clientOid": client_oid,
+        }
+        response = self.peticion_firmada("GET", "/api/v2/mix/order/detail", params)
+        if response is None or response.status_code != 200:
+            return None
+        response_data = response.json()
+        if response_data.get('code') != '00000':
+            return None
+        return response_data.get('data')
+
+    def peticion_firmada(self, method, endpoint, params):
+        return self.ejecucion.peticion(method, endpoint, params)
+
+    @property
+    def signer(self):
+        # Se crea al primer uso (mide el desfase de reloj con el servidor) y se comparte entre bots de la misma cuenta
+        if self._signer is None:
+            self._signer = get_signer(self.api_key, self.secret_key, self.passphrase, self.client)
+        return self._signer
+
+    def orden_ejecutada(self, orden):
+        self.posiciones.aplicar_apertura("long" if orden.side == "buy" else "short", orden.size, orden.precio,
+                                         self.leverage)
+
+    @property
+    def orders_count(self):
+        return self.posiciones.total_ordenes()
+
+    @property
+    def orden_en_ejecucion(self):
+        return self.pipeline.ocupado()
+
+    def cerrarOperaciones(self, holdSide):
+        endpoint = "/api/v2/mix/order/close-positions"
+
+        params = {
+            "symbol": self.simbolo,
+            "holdSide": holdSide,
+            "productType": self.product_type,
+        }
+
+        response = self.peticion_firmada("POST", endpoint, params)
+        if response is None:
+            self.log_text.insert(END, f"No se cerro ninguna operacion en {holdSide}\n")
+            return False
+        response_data = response.json()
+        self.order_log_text.insert(END, f"Cierre {holdSide}: {response_data}\n")
+        if response.status_code == 200 or response_data['code'] == '22002':
+            if response_data['code'] == '00000':
+                self.posiciones.aplicar_cierre(holdSide)
+                self.log_text.insert(END, f"Las operaciones en {holdSide} se han cerrado con exito.\n")
+                return True
+            else:
+                self.posiciones.sin_posicion(holdSide)
+                self.log_text.insert(END, f"No hay operaciones en {holdSide}\n")
+                return True
+        else:
+            self.log_text.insert(END, f"No se cerro ninguna operacion en {holdSide}\n")
+            return False
+
+    def set_leverage_value(self, leverage, holdSide):
+        endpoint = "/api/v2/mix/account/set-leverage"
+
+        params = {
+            "symbol": self.simbolo,
+            "productType": self.product_type,
+            "marginCoin": self.margin_coin,
+            "leverage": leverage,
+            "holdSide": holdSide,
+        }
+
+        response = self.peticion_firmada("POST", endpoint, params)
+        if response is None:
+            return None
+        if response.status_code == 200:
+            response_data = response.json()
+            if 'data' in response_data:
+                self.log_text.insert(END, f"Apalancamiento {holdSide} cambiado a {leverage}x\n")
+                data_values = response_data['data']
+                return data_values
+            else:
+                self.log_text.insert(END, f"Respuesta inesperada al cambiar el apalancamiento: {response.text}\n")
+                return None
+        else:
+            self.log_text.insert(END, f"No se pudo cambiar el apalancamiento en {holdSide}: {response.text}\n")
+            return None
+
+    def get_margin_coin(self, productType):
+        if productType == "usdt-futures":
+            return "USDT"
+
+        if productType == "usdc-futures":
+            return "USDC"
+
+        if productType == "susdt-futures":
+            return "SUSDT"
+
+        if productType == "susdc-futures":
+            return "SUSDC"
+
+    def get_asking_price(self, symbol, _productType):
+        if self.feed is not None:
+            precio = self.feed.ask_price(symbol, _productType)
+            if precio is not None:
+                return precio
+
+        return get_asking_price(symbol, _productType, client=self.client)
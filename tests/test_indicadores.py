@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from BMSBIndicators import StreamingEMA, StreamingSMA, ema_array, ema_matrix, sma_array, sma_matrix
+
+# Serie fija y salidas de talib.SMA / talib.EMA sobre ella, generadas una vez con talib (version en el fichero).
+# Las medias en streaming y ema_matrix replican la aritmetica de talib y deben coincidir bit a bit; las versiones
+# por series completas suman con cumsum o ewm y pueden diferir en los ultimos bits.
+with open(os.path.join(os.path.dirname(__file__), "referencia_talib.json")) as f:
+    REFERENCIA = json.load(f)
+CIERRES = np.array(REFERENCIA["cierres"])
+PERIODOS = [int(periodo) for periodo in REFERENCIA["sma"]]
+TOLERANCIA_SERIE = 1e-12
+
+
+def referencia(media, periodo):
+    return np.array([np.nan if valor is None else valor for valor in REFERENCIA[media][str(periodo)]])
+
+
+def assert_calentamiento(valores, periodo):
+    # talib devuelve NaN en las primeras periodo - 1 velas y un valor en todas las demas
+    assert np.isnan(valores[:periodo - 1]).all()
+    assert not np.isnan(valores[periodo - 1:]).any()
+
+
+@pytest.mark.parametrize("periodo", PERIODOS)
+def test_streaming_igual_que_talib(periodo):
+    sma, ema = StreamingSMA(periodo), StreamingEMA(periodo)
+    valores_sma = np.array([sma.update(x) for x in CIERRES])
+    valores_ema = np.array([ema.update(x) for x in CIERRES])
+    assert_calentamiento(valores_sma, periodo)
+    assert_calentamiento(valores_ema, periodo)
+    np.testing.assert_array_equal(valores_sma, referencia("sma", periodo))
+    np.testing.assert_array_equal(valores_ema, referencia("ema", periodo))
+
+
+@pytest.mark.parametrize("periodo", PERIODOS)
+def test_series_como_talib(periodo):
+    for funcion, media in ((sma_array, "sma"), (ema_array, "ema")):
+        valores = funcion(CIERRES, periodo)
+        assert_calentamiento(valores, periodo)
+        np.testing.assert_allclose(valores, referencia(media, periodo), rtol=TOLERANCIA_SERIE)
+
+
+@pytest.mark.parametrize("periodo", PERIODOS)
+def test_matriz_como_talib(periodo):
+    # Una columna con todo el historial y otra con menos velas (NaN al principio), alineadas por abajo
+    relleno = 30
+    cierres = np.column_stack([CIERRES, np.r_[np.full(relleno, np.nan), CIERRES[:-relleno]]])
+    sma, ema = sma_matrix(cierres, periodo), ema_matrix(cierres, periodo)
+
+    assert_calentamiento(sma[:, 0], periodo)
+    np.testing.assert_allclose(sma[:, 0], referencia("sma", periodo), rtol=TOLERANCIA_SERIE)
+    np.testing.assert_array_equal(ema[:, 0], referencia("ema", periodo))
+
+    assert np.isnan(sma[:relleno, 1]).all() and np.isnan(ema[:relleno, 1]).all()
+    assert_calentamiento(sma[relleno:, 1], periodo)
+    np.testing.assert_allclose(sma[relleno:, 1], referencia("sma", periodo)[:-relleno], rtol=TOLERANCIA_SERIE)
+    np.testing.assert_array_equal(ema[relleno:, 1], referencia("ema", periodo)[:-relleno])
+
+
+def test_historial_menor_que_el_periodo():
+    periodo = 50
+    cierres = CIERRES[:periodo - 1]
+    assert np.isnan(sma_array(cierres, periodo)).all()
+    assert np.isnan(ema_array(cierres, periodo)).all()
+    assert np.isnan(sma_matrix(cierres[:, None], periodo)).all()
+    assert np.isnan(ema_matrix(cierres[:, None], periodo)).all()
+
+
+def test_referencia_al_dia_con_talib():
+    # Si talib esta instalado, el fichero de referencia tiene que seguir siendo lo que devuelve
+    talib = pytest.importorskip("talib")
+    for periodo in PERIODOS:
+        np.testing.assert_array_equal(talib.SMA(CIERRES, periodo), referencia("sma", periodo))
+        np.testing.assert_array_equal(talib.EMA(CIERRES, periodo), referencia("ema", periodo))
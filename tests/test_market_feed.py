@@ -0,0 +1,140 @@
+import time
+from threading import Thread
+
+import pytest
+
+pytest.importorskip("websocket")
+
+from BitgetClient import VelasRecibidas
+from CandleCache import CandleCache
+from MarketFeed import LOTE_SUSCRIPCION, MarketFeed
+from MockWebSocket import MockWebSocket
+
+SIMBOLO = "BTCUSDT"
+CLAVE = (SIMBOLO, "1m", "usdt-futures")
+HISTORIAL = [(i * 60_000, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0, 100.0) for i in range(3)]
+
+
+def vela(apertura, cierre=103.0):
+    return (apertura, cierre, cierre, cierre, cierre, 0.1, 10.3)
+
+
+def esperar(condicion, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        if time.monotonic() > limite:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def mock():
+    servidor = MockWebSocket().start()
+    yield servidor
+    servidor.stop()
+
+
+@pytest.fixture
+def cache():
+    # El cache solo acepta velas del feed cuando ya tiene historial: se carga el mismo que luego da el snapshot
+    cache = CandleCache(fetcher=lambda *args, **kwargs: VelasRecibidas.desde_json(
+        [[str(valor) for valor in fila] for fila in HISTORIAL]))
+    cache.get_rows(*CLAVE)
+    return cache
+
+
+@pytest.fixture
+def feed(mock, cache):
+    feed = MarketFeed(cache, url=mock.url, reconnect_delay=0.1)
+    feed.cerradas = []
+    feed.add_listener(lambda symbol, granularity, product_type, tiempo: feed.cerradas.append((symbol, tiempo)))
+    feed.subscribe_candles(*CLAVE)
+    feed.subscribe_ticker(SIMBOLO, "usdt-futures")
+    feed.start()
+    assert mock.esperar_suscripcion("USDT-FUTURES", "candle1m", SIMBOLO)
+    assert mock.esperar_suscripcion("USDT-FUTURES", "ticker", SIMBOLO)
+    yield feed
+    feed.stop()
+
+
+def enviar_snapshot(mock, feed, filas=HISTORIAL):
+    mock.enviar_velas(SIMBOLO, "candle1m", "usdt-futures", filas, accion="snapshot")
+    assert esperar(lambda: feed.last_candle_time.get(CLAVE) == filas[-1][0])
+
+
+def test_ticker_actualiza_el_libro(mock, feed):
+    mock.enviar_ticker(SIMBOLO, "usdt-futures", 100.0, 100.5, 99.5)
+    assert esperar(lambda: feed.ask_price(SIMBOLO, "usdt-futures") == "100.5")
+    assert feed.bid_price(SIMBOLO, "usdt-futures") == "99.5"
+    assert feed.last_price(SIMBOLO, "usdt-futures") == "100.0"
+
+
+def test_cierre_de_vela(mock, feed, cache):
+    # El snapshot solo fija la vela de referencia
+    enviar_snapshot(mock, feed)
+    assert feed.cerradas == []
+
+    resultado = {}
+    espera = Thread(target=lambda: resultado.setdefault("cierre", feed.wait_candle_close(*CLAVE, timeout=5)))
+    espera.start()
+    time.sleep(0.05)
+    # Actualizar la vela en formacion no la cierra
+    mock.enviar_velas(SIMBOLO, "candle1m", "usdt-futures", [(120_000, 102.0, 104.0, 101.0, 103.0, 2.0, 200.0)])
+    time.sleep(0.1)
+    assert espera.is_alive()
+    # La primera vela con un tiempo nuevo cierra la anterior
+    mock.enviar_velas(SIMBOLO, "candle1m", "usdt-futures", [vela(180_000)])
+    espera.join(5)
+    assert resultado.get("cierre") is True
+    assert feed.cerradas == [(SIMBOLO, 120_000)]
+
+    filas = cache.get_rows(*CLAVE, refresh=False)
+    assert filas[-2] == (120_000, 102.0, 104.0, 101.0, 103.0, 2.0, 200.0)
+    assert filas[-1][0] == 180_000
+
+
+def test_wait_candle_close_caduca_sin_cierre(mock, feed):
+    enviar_snapshot(mock, feed)
+    assert feed.wait_candle_close(*CLAVE, timeout=0.1) is False
+
+
+def test_reconexion_con_snapshot(mock, feed):
+    enviar_snapshot(mock, feed)
+    mock.cerrar_conexiones()
+    assert esperar(lambda: not feed.connected)
+    # Al reconectar se vuelve a suscribir y el snapshot trae las velas perdidas durante el corte: las que ya se
+    # conocian no cuentan y cada vela nueva cierra la anterior
+    assert mock.esperar_suscripcion("USDT-FUTURES", "candle1m", SIMBOLO)
+    assert esperar(lambda: feed.connected)
+    enviar_snapshot(mock, feed, HISTORIAL + [vela(180_000), vela(240_000)])
+    assert esperar(lambda: len(feed.cerradas) == 2)
+    assert feed.cerradas == [(SIMBOLO, 120_000), (SIMBOLO, 180_000)]
+
+
+def test_suscripcion_por_lotes(mock, feed):
+    simbolos = [f"S{i}USDT" for i in range(2 * LOTE_SUSCRIPCION + 50)]
+    antes = len(mock.mensajes_suscripcion)
+    feed.subscribe_candles_batch(simbolos, "1m", "usdt-futures")
+    assert mock.esperar_suscripcion("USDT-FUTURES", "candle1m", simbolos[-1])
+    assert mock.mensajes_suscripcion[antes:] == [LOTE_SUSCRIPCION, LOTE_SUSCRIPCION, 50]
+
+    # Repetir la suscripcion no manda nada
+    feed.subscribe_candles_batch(simbolos, "1m", "usdt-futures")
+    time.sleep(0.1)
+    assert len(mock.mensajes_suscripcion) == antes + 3
+
+
+def test_reconexion_resuscribe_por_lotes(mock, feed):
+    simbolos = [f"S{i}USDT" for i in range(LOTE_SUSCRIPCION + 10)]
+    feed.subscribe_candles_batch(simbolos, "1m", "usdt-futures")
+    assert mock.esperar_suscripcion("USDT-FUTURES", "candle1m", simbolos[-1])
+    antes = len(mock.mensajes_suscripcion)
+    mock.cerrar_conexiones()
+    assert esperar(lambda: not feed.connected)
+    assert esperar(lambda: feed.connected)
+    assert mock.esperar_suscripcion("USDT-FUTURES", "candle1m", simbolos[-1])
+    # Las dos suscripciones iniciales (velas y ticker) mas los simbolos del lote, en mensajes de como mucho un lote
+    recibidos = mock.mensajes_suscripcion[antes:]
+    assert sum(recibidos) == len(simbolos) + 2
+    assert max(recibidos) <= LOTE_SUSCRIPCION
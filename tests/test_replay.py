@@ -0,0 +1,38 @@
+import numpy as np
+
+from BMSBIndicators import BMSBEngine
+from Replay import Replay
+
+
+def velas(n, semilla=1):
+    rng = np.random.default_rng(semilla)
+    cierres = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+    aperturas = np.r_[cierres[0], cierres[:-1]]
+    return [(i * 60_000, float(aperturas[i]), float(max(aperturas[i], cierres[i])),
+             float(min(aperturas[i], cierres[i])), float(cierres[i]), 1.0, 1.0) for i in range(n)]
+
+
+def test_replay_es_determinista():
+    filas = velas(1500)
+    assert Replay(filas).ejecutar()["aperturas"] > 0
+    primero, segundo = Replay(filas).ejecutar(), Replay(filas).ejecutar()
+    primero.pop("duracion_s")
+    segundo.pop("duracion_s")
+    assert primero == segundo
+
+
+def test_confirmacion_con_el_reloj_simulado():
+    # La BMSB de la granularidad mayor sigue a las velas grabadas agregadas hasta el final de la reproduccion
+    replay = Replay(velas(4000), confirmacion=["1h"], calentamiento=1500)
+    replay.ejecutar()
+    engine = replay.bot.multi.engines["1h"]
+    assert replay.bot.multi.resampler.marcos["1h"].hasta == 1500 * 60_000
+
+    referencia = BMSBEngine(20, 21)
+    for vela in replay.mercado.agregadas["1h"][1]:
+        if vela[0] <= engine.last_time:
+            referencia.update(vela[4], vela[0])
+    # 4000 velas de 1m llegan hasta la hora 66, que no llega a cerrar
+    assert engine.last_time == 65 * 3_600_000
+    assert (engine.close, engine.bmsb_mayor, engine.bmsb_menor) == \
+        (referencia.close, referencia.bmsb_mayor, referencia.bmsb_menor)
@@ -0,0 +1,32 @@
+from Resampler import Resampler
+
+HORA_MS = 3_600_000
+
+
+def velas_base(n, inicio=0):
+    return [(inicio + i * 60_000, 1.0 + i, 2.0 + i, 0.5 + i, 1.5 + i, 1.0, 1.0) for i in range(n)]
+
+
+def en_formacion(fila):
+    # Como la devuelve la API al abrir: solo se conoce la apertura
+    return (fila[0], fila[1], fila[1], fila[1], fila[1], 0.0, 0.0)
+
+
+def test_sembrar_usa_el_reloj_del_resampler():
+    resampler = Resampler(["1h"], "1m", reloj=lambda: 7200.5)
+    resampler.sembrar("1h", [(0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0), (HORA_MS, 2.0, 2.0, 2.0, 2.0, 1.0, 1.0)])
+    assert resampler.marcos["1h"].hasta == 7_200_500
+
+
+def test_historial_anterior_no_cierra_la_vela_sembrada():
+    base = velas_base(130)
+    resampler = Resampler(["1h"], "1m", reloj=lambda: HORA_MS / 1000)
+    resampler.sembrar("1h", [(0, 1.0, 60.0, 0.5, 60.5, 60.0, 60.0), en_formacion(base[60])])
+    # La primera actualizacion trae todo el historial de la serie base, anterior a la vela sembrada
+    assert resampler.actualizar(base[:60] + [en_formacion(base[60])]) == []
+
+    cerradas = []
+    for k in range(61, 130):
+        cerradas += resampler.actualizar(base[k - 5:k] + [en_formacion(base[k])])
+    assert cerradas == [("1h", (HORA_MS, 61.0, 121.0, 60.5, 120.5, 60.0, 60.0))]
+    assert resampler.filas("1h")[0] == (0, 1.0, 60.0, 0.5, 60.5, 60.0, 60.0)